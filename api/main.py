@@ -1,16 +1,61 @@
-from fastapi import FastAPI, BackgroundTasks
-from pipeline import downloader, transcriber, translator, podcaster
+from fastapi import FastAPI, HTTPException, Query
+from pipeline import jobs, llm_cache, metrics, podcaster, translator
+from pipeline.runner import artifact_cache
 
 app = FastAPI()
+queue = jobs.get_queue()
 
 @app.post("/process/")
-def process_video(url: str, target_lang: str, background_tasks: BackgroundTasks):
-    background_tasks.add_task(run_pipeline, url, target_lang)
-    return {"status": "processing started"}
-
-def run_pipeline(url: str, lang: str):
-    audio_path = downloader.download_audio(url)
-    transcript = transcriber.transcribe(audio_path)
-    translated = translator.translate(transcript, lang)
-    podcast_path = podcaster.generate_audio(translated)
-    # Save podcast or notify user
+def process_video(url: str, target_lang: list[str] = Query(...)):
+    # Several languages as ?target_lang=vi&target_lang=fr or ?target_lang=vi,fr
+    langs = list(dict.fromkeys(lang.strip() for value in target_lang for lang in value.split(",") if lang.strip()))
+    if not langs:
+        raise HTTPException(status_code=422, detail="target_lang is empty")
+    # Fail now rather than after download, transcription and translation.
+    for lang in langs:
+        try:
+            podcaster.voices_for(lang)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    payload = {"url": url, "target_lang": langs[0]}
+    if len(langs) > 1:
+        payload["target_langs"] = langs
+    job_id = queue.enqueue(payload)
+    return {"status": jobs.QUEUED, "job_id": job_id}
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    # While running, result holds progress such as the partial transcript.
+    result = job.pop("result")
+    job["progress"] = result if job["status"] == jobs.RUNNING else None
+    return job
+
+@app.get("/jobs/{job_id}/result")
+def job_result(job_id: str):
+    job = queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == jobs.FAILED:
+        raise HTTPException(status_code=500, detail=job["error"])
+    if job["status"] != jobs.DONE:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return job["result"]
+
+@app.get("/cache/stats")
+def cache_stats():
+    return artifact_cache.stats()
+
+@app.get("/cache/llm/stats")
+def llm_cache_stats():
+    return llm_cache.shared().stats()
+
+@app.get("/cache/translation/stats")
+def translation_memory_stats():
+    return translator.shared_memory().stats()
+
+@app.get("/stats")
+def stats():
+    return {"jobs": queue.counts(), "metrics": metrics.snapshot()}
@@ -0,0 +1,197 @@
+"""Shared asyncio HTTP layer for the LLM clients.
+
+One keep-alive connection pool per event loop, a cap on in-flight requests,
+retries with exponential backoff and full jitter (honouring Retry-After), and
+an overall deadline per request that covers every retry.
+"""
+
+import asyncio
+import email.utils
+import random
+import threading
+import time
+
+import httpx
+
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class APIError(Exception):
+    """A request that failed for good, after any retries."""
+
+    def __init__(self, status_code: int | None, message: str):
+        super().__init__(f"API request failed with status code {status_code}: {message}")
+        self.status_code = status_code
+
+
+def retry_after_seconds(value: str | None) -> float | None:
+    """Parse a Retry-After header given either as seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AsyncHTTPClient:
+    """Pooled, bounded, retrying JSON-over-HTTP client.
+
+    Args:
+        max_connections (int): Size of the keep-alive connection pool
+        max_concurrency (int): Requests allowed in flight at once
+        timeout (float): Per-attempt timeout in seconds
+        retries (int): Extra attempts after the first one
+        backoff_base (float): First backoff step in seconds
+        backoff_max (float): Upper bound for a single backoff
+    """
+
+    def __init__(self, max_connections: int = 10, max_concurrency: int = 4, timeout: float = 60,
+                 retries: int = 4, backoff_base: float = 0.5, backoff_max: float = 30):
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._loop = None
+        self._client: httpx.AsyncClient | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+
+    def _bind(self) -> tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        # Pools and semaphores belong to one event loop; rebuild them if the loop changed.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client, self._semaphore
+
+    def _backoff(self, attempt: int, retry_after: float | None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _attempt_timeout(self, give_up_at: float | None, deadline: float | None) -> float:
+        if give_up_at is None:
+            return self.timeout
+        remaining = give_up_at - time.monotonic()
+        if remaining <= 0:
+            raise APIError(None, f"deadline of {deadline}s exceeded")
+        return min(self.timeout, remaining)
+
+    async def _wait_before_retry(self, attempt: int, retry_after: float | None,
+                                 give_up_at: float | None, deadline: float | None) -> None:
+        delay = self._backoff(attempt, retry_after)
+        if give_up_at and time.monotonic() + delay >= give_up_at:
+            raise APIError(None, f"deadline of {deadline}s exceeded while backing off")
+        await asyncio.sleep(delay)
+
+    async def request(self, method: str, url: str, deadline: float | None = None, **kwargs) -> httpx.Response:
+        """Send a request, retrying transient failures until it succeeds or `deadline` seconds pass."""
+        client, semaphore = self._bind()
+        give_up_at = time.monotonic() + deadline if deadline else None
+        attempt = 0
+        while True:
+            timeout = self._attempt_timeout(give_up_at, deadline)
+            retry_after = None
+            try:
+                async with semaphore:
+                    response = await client.request(method, url, timeout=timeout, **kwargs)
+                if response.status_code < 400:
+                    return response
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    raise APIError(response.status_code, response.text)
+                retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+            except httpx.TransportError as e:
+                if attempt >= self.retries:
+                    raise APIError(None, f"{type(e).__name__}: {e}") from e
+            await self._wait_before_retry(attempt, retry_after, give_up_at, deadline)
+            attempt += 1
+
+    async def stream_lines(self, method: str, url: str, deadline: float | None = None, **kwargs):
+        """Yield the response body line by line as it arrives.
+
+        Failures are retried like `request` until the response starts; `deadline`
+        bounds only that part, since a long generation may legitimately stream
+        for a while. Once lines have been yielded, errors are raised as they are.
+        """
+        client, semaphore = self._bind()
+        give_up_at = time.monotonic() + deadline if deadline else None
+        attempt = 0
+        while True:
+            timeout = self._attempt_timeout(give_up_at, deadline)
+            retry_after = None
+            try:
+                async with semaphore:
+                    async with client.stream(method, url, timeout=timeout, **kwargs) as response:
+                        if response.status_code < 400:
+                            async for line in response.aiter_lines():
+                                yield line
+                            return
+                        body = (await response.aread()).decode("utf-8", "replace")
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    raise APIError(response.status_code, body)
+                retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+            except httpx.TransportError as e:
+                if attempt >= self.retries:
+                    raise APIError(None, f"{type(e).__name__}: {e}") from e
+            await self._wait_before_retry(attempt, retry_after, give_up_at, deadline)
+            attempt += 1
+
+    async def post_json(self, url: str, payload: dict, deadline: float | None = None, **kwargs) -> dict:
+        response = await self.request("POST", url, json=payload, deadline=deadline, **kwargs)
+        return response.json()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._loop = None
+
+
+class _BackgroundLoop:
+    """An event loop on a daemon thread, so sync callers share one pool across calls."""
+
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def run(self, coro):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+
+background = _BackgroundLoop()
+
+
+def run_sync(coro):
+    """Run `coro` to completion from synchronous code on the shared background loop."""
+    return background.run(coro)
+
+
+def iter_sync(agen):
+    """Iterate an async generator from synchronous code on the shared background loop."""
+    try:
+        while True:
+            try:
+                yield background.run(agen.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        background.run(agen.aclose())
+
+
+def sse_data(line: str) -> str | None:
+    """Payload of a server-sent-events `data:` line; None for other lines and the [DONE] marker."""
+    if not line.startswith("data:"):
+        return None
+    data = line[5:].strip()
+    return None if not data or data == "[DONE]" else data
@@ -0,0 +1,166 @@
+"""Benchmarks for the pipeline stages.
+
+    $ python -m pipeline.benchmarks chunks --minutes 20 --chunks 1 2 4 8
+    $ python -m pipeline.benchmarks threads --source clip.mp3 --threads 1 2 4 8 --concurrent 1 2
+    $ python -m pipeline.benchmarks tts --turns 40 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline import podcaster, transcriber, utils
+from pipeline.cache import ArtifactCache
+
+
+def make_synthetic_audio(dest: str, seconds: int, source: str | None = None) -> str:
+    """Write a long 16 kHz mono WAV to `dest`.
+
+    With `source`, the clip is looped to the requested length, which gives
+    whisper real speech to work on. Without it, a tone that goes quiet for two
+    seconds out of every ten is generated so silence detection has cut points.
+    """
+    if source:
+        inputs = ["-stream_loop", "-1", "-i", source]
+    else:
+        inputs = ["-f", "lavfi", "-i", f"sine=frequency=220:duration={seconds}",
+                  "-af", "volume='if(lt(mod(t,10),8),1,0)':eval=frame"]
+    subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", *inputs,
+         "-t", str(seconds), "-ar", "16000", "-ac", "1", dest],
+        check=True,
+    )
+    return dest
+
+
+def bench_chunks(audio_path: str, chunk_counts: list[int], model_dir: str) -> list[dict]:
+    """Time transcribe_chunked for each chunk count (one whisper worker per chunk)."""
+    duration = transcriber.probe_duration(audio_path)
+    rows = []
+    for count in chunk_counts:
+        started = time.perf_counter()
+        transcriber.transcribe_chunked(audio_path, model_dir, chunk_seconds=duration / count, workers=count)
+        elapsed = time.perf_counter() - started
+        rows.append({"chunks": count, "seconds": elapsed, "realtime_factor": elapsed / duration})
+    return rows
+
+
+def bench_threads(audio_path: str, thread_counts: list[int], concurrency: list[int], model_dir: str,
+                  processors: list[int] | None = None) -> list[dict]:
+    """Whisper throughput for each (-t, -p, transcriptions at once) combination on one clip.
+
+    `audio_x` is seconds of audio transcribed per wall-clock second across
+    all concurrent runs, i.e. the host's throughput with that setting.
+    """
+    model_path = os.path.join(model_dir, transcriber.MODEL_NAME)
+    duration = transcriber.probe_duration(audio_path)
+    cores = utils.physical_cores()
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        wav_path = transcriber.to_whisper_pcm(audio_path, tmp)
+        for concurrent in concurrency:
+            for threads in thread_counts:
+                for procs in processors or [1]:
+                    if threads * procs * concurrent > cores * 2:
+                        continue  # hopelessly oversubscribed
+                    started = time.perf_counter()
+                    with ThreadPoolExecutor(max_workers=concurrent) as pool:
+                        list(pool.map(lambda _: transcriber.transcribe_segments(wav_path, model_path, threads, procs),
+                                      range(concurrent)))
+                    elapsed = time.perf_counter() - started
+                    rows.append({"concurrent": concurrent, "threads": threads, "processors": procs,
+                                 "seconds": elapsed, "audio_x": duration * concurrent / elapsed})
+    return rows
+
+
+def make_dialogue(turns: int) -> str:
+    """A two-speaker dialogue of `turns` turns of a few sentences each, all different."""
+    lines = []
+    for i in range(turns):
+        speaker = "Alex (curious)" if i % 2 == 0 else "Ben (thoughtful)"
+        lines.append(f"{speaker}: This is turn number {i + 1}. We keep each line a little different, "
+                     f"so nothing comes from the segment cache. The point of turn {i + 1} is timing.")
+    return "\n".join(lines)
+
+
+def bench_tts(turns: int, worker_counts: list[int], lang: str = "en") -> list[dict]:
+    """Time podcaster.generate_audio for each worker count, with an empty segment cache every time."""
+    dialogue = make_dialogue(turns)
+    rows = []
+    for count in worker_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ArtifactCache(os.path.join(tmp, "segments"), podcaster.CACHE_MAX_BYTES,
+                                  metric_prefix="bench.segment_cache")
+            output = os.path.join(tmp, "podcast.wav")
+            started = time.perf_counter()
+            podcaster.generate_audio(dialogue, lang, workers=count, output_path=output, cache=cache)
+            elapsed = time.perf_counter() - started
+            with wave.open(output, "rb") as w:
+                duration = w.getnframes() / w.getframerate()
+        rows.append({"workers": count, "seconds": elapsed, "audio_seconds": duration,
+                     "realtime_factor": elapsed / duration})
+    return rows
+
+
+def _print_table(rows: list[dict]) -> None:
+    headers = list(rows[0])
+    print("  ".join(f"{h:>16}" for h in headers))
+    for row in rows:
+        print("  ".join(f"{row[h]:>16.3f}" if isinstance(row[h], float) else f"{row[h]:>16}" for h in headers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="vid2pod pipeline benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    chunks = sub.add_parser("chunks", help="Chunked transcription wall time vs. chunk count")
+    chunks.add_argument("--minutes", type=float, default=20, help="Length of the synthetic file (default: 20)")
+    chunks.add_argument("--source", type=str, default=None, help="Speech clip to loop instead of a tone")
+    chunks.add_argument("--chunks", type=int, nargs="+", default=[1, 2, 4, 8], help="Chunk counts to try")
+    chunks.add_argument("--model-dir", type=str, default="./models")
+
+    threads = sub.add_parser("threads", help="Whisper throughput vs. -t/-p and concurrent transcriptions")
+    # whisper decodes next to nothing from a tone, so only real speech gives meaningful -t/-p timings.
+    threads.add_argument("--source", type=str, required=True, help="Speech clip to transcribe, e.g. a minute of a talk")
+    threads.add_argument("--seconds", type=int, default=None,
+                         help="Loop or cut the clip to this many seconds (default: its own length)")
+    threads.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8], help="-t values to try")
+    threads.add_argument("--processors", type=int, nargs="+", default=[1], help="-p values to try")
+    threads.add_argument("--concurrent", type=int, nargs="+", default=[1], help="Transcriptions at once")
+    threads.add_argument("--model-dir", type=str, default="./models")
+
+    tts = sub.add_parser("tts", help="Podcast synthesis real-time factor vs. worker count")
+    tts.add_argument("--turns", type=int, default=40, help="Dialogue turns to synthesise (default: 40)")
+    tts.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="Worker counts to try")
+    tts.add_argument("--lang", type=str, default="en", help="Language whose voices to use (default: en)")
+
+    args = parser.parse_args()
+
+    if args.bench == "chunks":
+        with tempfile.TemporaryDirectory() as tmp:
+            audio = make_synthetic_audio(os.path.join(tmp, "long.wav"), int(args.minutes * 60), args.source)
+            _print_table(bench_chunks(audio, args.chunks, args.model_dir))
+    elif args.bench == "threads":
+        with tempfile.TemporaryDirectory() as tmp:
+            audio = args.source
+            if args.seconds:
+                audio = make_synthetic_audio(os.path.join(tmp, "clip.wav"), args.seconds, args.source)
+            rows = bench_threads(audio, args.threads, args.concurrent, args.model_dir, args.processors)
+        _print_table(rows)
+        for concurrent in args.concurrent:
+            best = max((row for row in rows if row["concurrent"] == concurrent), key=lambda row: row["audio_x"],
+                       default=None)
+            if best is None:
+                continue
+            print(f"Best with {concurrent} at once: WHISPER_THREADS={best['threads']} "
+                  f"WHISPER_PROCESSORS={best['processors']} ({best['audio_x']:.1f}x real time)")
+    elif args.bench == "tts":
+        _print_table(bench_tts(args.turns, args.workers, args.lang))
+
+
+if __name__ == "__main__":
+    main()
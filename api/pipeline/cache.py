@@ -0,0 +1,201 @@
+"""On-disk, content-addressed cache for pipeline stage artifacts.
+
+Each stage's key is derived from the previous stage's key plus the stage's
+own effective parameters, so a change anywhere upstream invalidates every
+stage after it while leaving earlier artifacts reusable.
+"""
+
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from pipeline import metrics, utils
+
+DEFAULT_MAX_BYTES = 10 * 1024 ** 3  # 10 GiB
+# A pin older than this belongs to a job that died without releasing it.
+PIN_SECONDS = float(os.getenv("VID2POD_CACHE_PIN_SECONDS", 6 * 3600))
+
+_COUNTER_FIELDS = {"hit": "hits", "miss": "misses", "evicted": "evictions"}
+
+
+class ArtifactCache:
+    """Stage artifacts stored under `storage/cache` with size-based LRU eviction.
+
+    Hits, misses and evictions are counted as `<metric_prefix>.hit` etc., so
+    caches that share the metrics database keep their figures apart.
+    """
+
+    def __init__(self, root: str | None = None, max_bytes: int | None = None, metric_prefix: str = "cache"):
+        self.root = root or os.path.join(utils.STORAGE_DIR, "cache")
+        if max_bytes is None:
+            max_bytes = int(os.getenv("VID2POD_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self.max_bytes = max_bytes
+        self.metric_prefix = metric_prefix
+        self.index_path = os.path.join(self.root, "index.db")
+        self._local = threading.local()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.index_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " stage TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " path TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_access REAL NOT NULL,"
+                " PRIMARY KEY (stage, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pins ("
+                " owner TEXT NOT NULL,"
+                " stage TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " pinned_at REAL NOT NULL,"
+                " PRIMARY KEY (owner, stage, key))"
+            )
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(stage: str, params: dict, parent: str) -> str:
+        return utils.stable_hash({"stage": stage, "parent": parent, "params": params})
+
+    def chain_keys(self, video_id: str, stages: list[tuple[str, dict]]) -> list[str]:
+        """Return one key per (stage, params) pair, each chained to the one before it."""
+        keys = []
+        parent = video_id
+        for stage, params in stages:
+            parent = self.make_key(stage, params, parent)
+            keys.append(parent)
+        return keys
+
+    def get(self, stage: str, key: str, count: bool = True) -> str | None:
+        """Return the cached artifact path for (stage, key), or None on a miss.
+
+        With `count=False` the lookup is left out of the hit/miss counters.
+        """
+        db = self._db()
+        row = db.execute(
+            "SELECT path FROM entries WHERE stage = ? AND key = ?", (stage, key)
+        ).fetchone()
+        if row and os.path.exists(row[0]):
+            db.execute(
+                "UPDATE entries SET last_access = ? WHERE stage = ? AND key = ?",
+                (time.time(), stage, key),
+            )
+            if count:
+                metrics.incr(f"{self.metric_prefix}.hit", stage)
+            return row[0]
+        if row:
+            db.execute("DELETE FROM entries WHERE stage = ? AND key = ?", (stage, key))
+        if count:
+            metrics.incr(f"{self.metric_prefix}.miss", stage)
+        return None
+
+    def pin(self, owner: str, entries: list[tuple[str, str]]) -> None:
+        """Keep (stage, key) entries from eviction until `owner` releases them (or PIN_SECONDS pass)."""
+        now = time.time()
+        self._db().executemany(
+            "INSERT OR REPLACE INTO pins (owner, stage, key, pinned_at) VALUES (?, ?, ?, ?)",
+            [(owner, stage, key, now) for stage, key in entries],
+        )
+
+    def release(self, owner: str) -> None:
+        """Drop the pins of `owner`, and any left behind by jobs that never released theirs."""
+        self._db().execute("DELETE FROM pins WHERE owner = ? OR pinned_at <= ?",
+                           (owner, time.time() - PIN_SECONDS))
+
+    def put(self, stage: str, key: str, src_path: str) -> str:
+        """Move `src_path` into the cache and return its new location."""
+        dest = self._dest(stage, key, os.path.splitext(src_path)[1])
+        shutil.move(src_path, dest)
+        return self._record(stage, key, dest)
+
+    def put_text(self, stage: str, key: str, text: str) -> str:
+        """Store `text` as the artifact for (stage, key) and return its path."""
+        dest = self._dest(stage, key, ".txt")
+        tmp = f"{dest}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, dest)
+        return self._record(stage, key, dest)
+
+    def _dest(self, stage: str, key: str, ext: str) -> str:
+        stage_dir = os.path.join(self.root, stage)
+        os.makedirs(stage_dir, exist_ok=True)
+        return os.path.join(stage_dir, key + ext)
+
+    def _record(self, stage: str, key: str, path: str) -> str:
+        self._db().execute(
+            "INSERT OR REPLACE INTO entries (stage, key, path, size, last_access) VALUES (?, ?, ?, ?, ?)",
+            (stage, key, path, os.path.getsize(path), time.time()),
+        )
+        self.evict(keep=(stage, key))
+        return path
+
+    def evict(self, keep: tuple[str, str] | None = None) -> int:
+        """Drop least-recently-used entries until the cache fits in `max_bytes`.
+
+        Returns the number of bytes freed.
+        """
+        db = self._db()
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        freed = 0
+        if total <= self.max_bytes:
+            return freed
+        # Artifacts a running job still reads (e.g. the audio being transcribed) are pinned.
+        rows = db.execute(
+            "SELECT stage, key, path, size FROM entries e WHERE NOT EXISTS ("
+            " SELECT 1 FROM pins p WHERE p.stage = e.stage AND p.key = e.key AND p.pinned_at > ?)"
+            " ORDER BY last_access",
+            (time.time() - PIN_SECONDS,),
+        ).fetchall()
+        for stage, key, path, size in rows:
+            if total - freed <= self.max_bytes:
+                break
+            if (stage, key) == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            db.execute("DELETE FROM entries WHERE stage = ? AND key = ?", (stage, key))
+            metrics.incr(f"{self.metric_prefix}.evicted", stage)
+            freed += size
+        return freed
+
+    def stats(self) -> dict:
+        """Entry counts, sizes and hit/miss counters per stage, and the pins of running jobs."""
+        prefix = self.metric_prefix + "."
+        counters = metrics.snapshot(prefix)
+        stages: dict = {}
+        for stage, entries, size in self._db().execute(
+            "SELECT stage, COUNT(*), SUM(size) FROM entries GROUP BY stage"
+        ):
+            stages[stage] = {"entries": entries, "bytes": size}
+        for name, by_stage in counters.items():
+            field = _COUNTER_FIELDS.get(name[len(prefix):])
+            if field is None:
+                continue
+            for stage, value in by_stage.items():
+                stages.setdefault(stage, {"entries": 0, "bytes": 0})[field] = value
+        for stage in stages.values():
+            stage.setdefault("evictions", 0)
+            hits, misses = stage.setdefault("hits", 0), stage.setdefault("misses", 0)
+            stage["hit_rate"] = hits / (hits + misses) if hits + misses else 0.0
+        pins = self._db().execute(
+            "SELECT COUNT(*) FROM pins WHERE pinned_at > ?", (time.time() - PIN_SECONDS,)
+        ).fetchone()[0]
+        return {
+            "max_bytes": self.max_bytes,
+            "bytes": sum(s["bytes"] for s in stages.values()),
+            "pins": pins,
+            "stages": stages,
+        }
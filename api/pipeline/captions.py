@@ -0,0 +1,47 @@
+"""Caption fast path: use a video's existing YouTube captions instead of running whisper."""
+
+import os
+
+import requests
+from youtube_transcript_api import YouTubeTranscriptApi
+from youtube_transcript_api._errors import CouldNotRetrieveTranscript, NoTranscriptFound
+
+from pipeline import utils
+from pipeline.transcript import Transcript
+
+# "manual" accepts only human-made captions, "auto" also accepts YouTube's
+# auto-generated ones, "off" always downloads and runs whisper.
+POLICY = os.getenv("CAPTIONS_POLICY", "manual")
+LANGUAGES = [lang.strip() for lang in os.getenv("CAPTIONS_LANGUAGES", "en").split(",") if lang.strip()]
+
+
+def fetch_captions(video_id: str, languages: list[str] | None = None,
+                   policy: str | None = None) -> tuple[Transcript, str] | None:
+    """Return (transcript, kind) for the best acceptable caption track, or None.
+
+    `kind` is "manual" or "auto". Languages are tried in the given order, and
+    a manual track in any of them beats an auto-generated one.
+    """
+    languages = languages or LANGUAGES
+    policy = policy or POLICY
+    if policy == "off" or not utils.is_youtube_id(video_id):
+        return None
+
+    try:
+        listing = YouTubeTranscriptApi().list(video_id)
+        try:
+            transcript, kind = listing.find_manually_created_transcript(languages), "manual"
+        except NoTranscriptFound:
+            if policy != "auto":
+                return None
+            transcript, kind = listing.find_generated_transcript(languages), "auto"
+        fetched = transcript.fetch()
+    except CouldNotRetrieveTranscript:
+        # Also covers NoTranscriptFound for the auto-generated lookup.
+        return None
+    except requests.RequestException:
+        # Captions are only a shortcut; a network error falls back to whisper.
+        return None
+
+    transcript = Transcript.from_snippets(fetched)
+    return (transcript, kind) if len(transcript) else None
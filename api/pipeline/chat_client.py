@@ -0,0 +1,139 @@
+"""Dialogue client for OpenAI-style /chat/completions APIs (DeepSeek, Mistral).
+
+Same interface as GeminiClient (`agenerate_dialogue` / `generate_dialogue`,
+each filling an optional `usage` dict), so the provider router can treat
+every backend alike.
+"""
+
+import os
+import time
+
+from pipeline import dialogue_prompt, llm_cache, mapreduce, token_budget
+from pipeline.async_http import AsyncHTTPClient, run_sync
+
+# name -> (default API root, API key variable, default model)
+PROVIDERS = {
+    "deepseek": ("https://api.deepseek.com/v1", "DEEPSEEK_APIKEY", "deepseek-chat"),
+    "mistral": ("https://api.mistral.ai/v1", "MISTRAL_API_KEY", "mistral-large-latest"),
+}
+
+_shared_http = {}
+
+
+def shared_http(provider: str) -> AsyncHTTPClient:
+    """The connection pool every client of `provider` uses unless given its own."""
+    if provider not in _shared_http:
+        prefix = provider.upper()
+        _shared_http[provider] = AsyncHTTPClient(
+            max_connections=int(os.getenv(f"{prefix}_MAX_CONNECTIONS", "10")),
+            max_concurrency=int(os.getenv(f"{prefix}_MAX_CONCURRENCY", "4")),
+        )
+    return _shared_http[provider]
+
+
+class ChatClient:
+    """Podcast dialogue from a chat/completions provider.
+
+    Args:
+        provider (str): "deepseek" or "mistral"
+        api_base_url (str): API root (default: $<PROVIDER>_API_BASE or the provider's)
+        model (str): Model name (default: $<PROVIDER>_MODEL or the provider's flagship chat model)
+        http (AsyncHTTPClient): Connection pool to use (default: one shared per provider)
+        deadline (float): Seconds a request may take including retries (default: $<PROVIDER>_DEADLINE or 180)
+        input_tokens (int): Input token budget; a transcript over its share of it is condensed
+            with map-reduce, anything still over is trimmed (default: $<PROVIDER>_INPUT_TOKENS or 48000)
+        chunk_tokens (int): Token budget of each map-reduce chunk (default: $<PROVIDER>_CHUNK_TOKENS or 12000)
+        max_output_tokens (int): Output limit of the dialogue (default: $<PROVIDER>_MAX_OUTPUT_TOKENS or 2048)
+        cache (ResponseCache): Response cache (default: the one shared by all clients)
+    """
+
+    def __init__(self, provider: str, api_base_url: str | None = None, model: str | None = None,
+                 http: AsyncHTTPClient | None = None, deadline: float | None = None,
+                 input_tokens: int | None = None, chunk_tokens: int | None = None,
+                 max_output_tokens: int | None = None, cache: llm_cache.ResponseCache | None = None):
+        default_base, key_var, default_model = PROVIDERS[provider]
+        prefix = provider.upper()
+        self.provider = provider
+        self.api_key = os.getenv(key_var)
+        if not self.api_key:
+            raise ValueError(f"{key_var} not set")
+        self.api_base_url = (api_base_url or os.getenv(f"{prefix}_API_BASE", default_base)).rstrip("/")
+        self.model = model or os.getenv(f"{prefix}_MODEL", default_model)
+        self.http = http or shared_http(provider)
+        self.deadline = deadline or float(os.getenv(f"{prefix}_DEADLINE", "180"))
+        self.budget = token_budget.Budget(
+            provider, self.model,
+            input_tokens=input_tokens or int(os.getenv(f"{prefix}_INPUT_TOKENS", "48000")),
+            output_tokens=max_output_tokens or int(os.getenv(f"{prefix}_MAX_OUTPUT_TOKENS", "2048")),
+        )
+        self.chunk_tokens = chunk_tokens or int(os.getenv(f"{prefix}_CHUNK_TOKENS", "12000"))
+        self.cache = cache or llm_cache.shared()
+
+    def generate_dialogue(self, transcription, comments, host_name="Alex", guest_name="Dr. Expert", language="english",
+                          usage=None):
+        """Synchronous wrapper around `agenerate_dialogue` for the CLI."""
+        return run_sync(self.agenerate_dialogue(transcription, comments, host_name, guest_name, language, usage))
+
+    async def agenerate_dialogue(self, transcription, comments, host_name="Alex", guest_name="Dr. Expert", language="english",
+                                 usage=None):
+        """Generate the dialogue; arguments as for `GeminiClient.generate_dialogue`."""
+        started = time.monotonic()
+        totals = token_budget.new_usage(usage=usage)
+        instructions = dialogue_prompt.INSTRUCTIONS
+        if self.budget.over("transcript", instructions, transcription, comments):
+            totals["mode"] = "map_reduce"
+            transcription, comments = await mapreduce.acondense(
+                lambda prompt: self._extract(prompt, totals), transcription, comments, self.chunk_tokens, self.provider
+            )
+        transcription, comments = self.budget.fit(instructions, transcription, comments)
+        prompt = dialogue_prompt.request_prompt(transcription, comments, host_name, guest_name, language)
+        text = await self._complete({
+            "model": self.model,
+            "temperature": 0.7,
+            "max_tokens": self.budget.output_tokens,
+            "top_p": 0.95,
+            # Static instructions first, so the provider's prefix cache can reuse them.
+            "messages": [
+                {"role": "system", "content": instructions},
+                {"role": "user", "content": prompt},
+            ],
+        }, totals)
+        totals["seconds"] = time.monotonic() - started
+        return text
+
+    async def _extract(self, prompt, totals):
+        # Greedy, like GeminiClient._extract, so repeated runs hit the response cache.
+        return await self._complete({
+            "model": self.model,
+            "temperature": 0,
+            "max_tokens": self.budget.output_limit(mapreduce.NOTES_TOKENS),
+            "messages": [{"role": "user", "content": prompt}],
+        }, totals)
+
+    async def _complete(self, payload, totals):
+        params = {name: value for name, value in payload.items() if name not in ("model", "messages")}
+        key = self.cache.key_for(self.provider, self.model, payload["messages"], params)
+        cached = self.cache.get(self.provider, key)
+        if cached is not None:
+            totals["cache_hits"] += 1
+            return cached
+
+        data = await self.http.post_json(
+            f"{self.api_base_url}/chat/completions", payload, deadline=self.deadline,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+        )
+        text = data["choices"][0]["message"]["content"]
+        usage = data.get("usage") or {}
+        estimated = self.budget.estimate("".join(message["content"] for message in payload["messages"]))
+        if "prompt_tokens" in usage:
+            token_budget.record(self.provider, estimated, usage["prompt_tokens"])
+        totals["calls"] += 1
+        totals["estimated_prompt_tokens"] += estimated
+        totals["prompt_tokens"] += usage.get("prompt_tokens", estimated)
+        totals["output_tokens"] += usage.get("completion_tokens", self.budget.estimate(text))
+        # DeepSeek reports prefix-cache hits directly; others in OpenAI's prompt_tokens_details.
+        totals["cached_tokens"] += usage.get(
+            "prompt_cache_hit_tokens", (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+        )
+        self.cache.put(self.provider, key, text)
+        return text
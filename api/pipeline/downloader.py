@@ -1,20 +1,109 @@
+import os
+import subprocess
+import sys
+import time
+
 import yt_dlp
 
-def download_audio(url: str, output_dir: str = "storage") -> str:
+from pipeline import metrics
+
+YDL_FORMAT = "bestaudio/best"
+AUDIO_CODEC = "mp3"
+# "pcm" transcodes the native stream straight to the 16 kHz mono WAV whisper.cpp reads,
+# "mp3" keeps the old lossy re-encode, "stream" never writes the audio to disk and
+# transcribes it window by window while it downloads (see stream_pcm).
+MODE = os.getenv("DOWNLOAD_MODE", "pcm")
+# Keep the native audio stream next to the converted file for archival.
+KEEP_ORIGINAL = os.getenv("DOWNLOAD_KEEP_ORIGINAL", "") == "1"
+
+def _postprocessor(mode: str) -> dict:
+    if mode == "pcm":
+        return {'key': 'FFmpegExtractAudio', 'preferredcodec': 'wav'}
+    return {'key': 'FFmpegExtractAudio', 'preferredcodec': AUDIO_CODEC}
+
+def download_audio(url: str, output_dir: str = "storage", mode: str | None = None,
+                   keep_original: bool | None = None) -> str:
+    mode = mode or MODE
+    keep_original = KEEP_ORIGINAL if keep_original is None else keep_original
+    native = {}
+
+    def on_progress(d):
+        if d["status"] == "finished":
+            native["bytes"] = d.get("total_bytes") or d.get("downloaded_bytes") or 0
+            native["done_at"] = time.monotonic()
+
     ydl_opts = {
-        'format': 'bestaudio/best',
+        'format': YDL_FORMAT,
         'outtmpl': f'{output_dir}/%(title)s.%(ext)s',
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-        }],
+        'postprocessors': [_postprocessor(mode)],
+        'keepvideo': keep_original,
+        'progress_hooks': [on_progress],
     }
+    if mode == "pcm":
+        # Resample in the same ffmpeg pass that extracts the audio.
+        ydl_opts['postprocessor_args'] = {'extractaudio+ffmpeg_o': ['-ar', '16000', '-ac', '1']}
+
+    started = time.monotonic()
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
         info = ydl.extract_info(url, download=True)
-        filename = ydl.prepare_filename(info).replace(".webm", ".mp3")
+    finished = time.monotonic()
+    # The post-processed path, whatever container the source came in.
+    filename = info['requested_downloads'][0]['filepath']
+
+    output_bytes = os.path.getsize(filename)
+    download_seconds = native.get("done_at", finished) - started
+    transcode_seconds = finished - started - download_seconds
+    metrics.incr("download.jobs", mode)
+    metrics.incr("download.seconds", mode, finished - started)
+    metrics.incr("download.transcode_seconds", mode, transcode_seconds)
+    metrics.incr("download.native_bytes", mode, native.get("bytes", 0))
+    metrics.incr("download.output_bytes", mode, output_bytes)
+    print(f"Downloaded {native.get('bytes', 0)} bytes in {download_seconds:.1f}s, "
+          f"transcoded to {output_bytes} bytes ({mode}) in {transcode_seconds:.1f}s")
     return filename
 
+PCM_RATE = 16000
+PCM_BYTES_PER_SECOND = PCM_RATE * 2  # mono, 16-bit
+
+def stream_pcm(url: str, window_seconds: float = 30):
+    """Yield the audio of `url` as consecutive 16 kHz mono s16le windows while it downloads.
+
+    yt-dlp writes the native stream to a pipe, ffmpeg decodes it from the pipe,
+    and only one window is ever held in memory, so nothing touches the disk.
+    The last window may be shorter than `window_seconds`.
+    """
+    window_bytes = int(window_seconds * PCM_BYTES_PER_SECOND)
+    ydl = subprocess.Popen(
+        [sys.executable, "-m", "yt_dlp", "--quiet", "-f", YDL_FORMAT, "-o", "-", url],
+        stdout=subprocess.PIPE,
+    )
+    ffmpeg = subprocess.Popen(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+         "-f", "s16le", "-ar", str(PCM_RATE), "-ac", "1", "pipe:1"],
+        stdin=ydl.stdout, stdout=subprocess.PIPE,
+    )
+    ydl.stdout.close()  # ffmpeg owns the read end now
+    started = time.monotonic()
+    total = 0
+    try:
+        while True:
+            window = ffmpeg.stdout.read(window_bytes)
+            if not window:
+                break
+            total += len(window)
+            yield window
+        if ffmpeg.wait() != 0 or ydl.wait() != 0:
+            raise RuntimeError(f"Streaming {url} failed (yt-dlp {ydl.returncode}, ffmpeg {ffmpeg.returncode})")
+    finally:
+        for proc in (ffmpeg, ydl):
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+    metrics.incr("download.jobs", "stream")
+    metrics.incr("download.seconds", "stream", time.monotonic() - started)
+    metrics.incr("download.output_bytes", "stream", total)
+
 if __name__ == "__main__":
     test_url = "https://www.youtube.com/watch?v=SA7bKo4HRTg"
     path = download_audio(test_url)
-    print(f"Downloaded audio to: {path}")
\ No newline at end of file
+    print(f"Downloaded audio to: {path}")
@@ -1,6 +1,10 @@
 import os
 import json
-import requests
+import time
+
+from pipeline import dialogue_prompt, llm_cache, mapreduce, token_budget
+from pipeline.dialogue_prompt import INSTRUCTIONS
+from pipeline.async_http import AsyncHTTPClient, iter_sync, run_sync, sse_data
 
 # Try to import dotenv, but handle case where it's not available
 try:
@@ -30,19 +34,56 @@ except ImportError:
 # Load environment variables from .env file
 load_dotenv()
 
+_shared_http = None
+
+def shared_http() -> AsyncHTTPClient:
+    """The connection pool every GeminiClient uses unless given its own."""
+    global _shared_http
+    if _shared_http is None:
+        _shared_http = AsyncHTTPClient(
+            max_connections=int(os.getenv("GEMINI_MAX_CONNECTIONS", "10")),
+            max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "4")),
+        )
+    return _shared_http
+
 class GeminiClient:
     """Client for interacting with Google's Gemini API."""
     
-    def __init__(self):
+    def __init__(self, api_base_url=None, model=None, http=None, deadline=None,
+                 input_tokens=None, chunk_tokens=None, max_output_tokens=None, cache=None):
+        """
+        Args:
+            api_base_url (str): API root, e.g. a local stand-in server (default: $GEMINI_API_BASE or Google)
+            model (str): Model resource name (default: "models/gemini-1.5-pro")
+            http (AsyncHTTPClient): Connection pool to use (default: one shared by all clients)
+            deadline (float): Seconds a request may take including retries (default: $GEMINI_DEADLINE or 180)
+            input_tokens (int): Input token budget; a transcript over its share of it is condensed
+                with map-reduce, anything still over is trimmed (default: $GEMINI_INPUT_TOKENS or 100000)
+            chunk_tokens (int): Token budget of each map-reduce chunk (default: $GEMINI_CHUNK_TOKENS or 16000)
+            max_output_tokens (int): Output limit of the dialogue (default: $GEMINI_MAX_OUTPUT_TOKENS or 2048)
+            cache (ResponseCache): Response cache (default: the one shared by all clients)
+        """
         self.api_key = os.getenv("GEMINI_API_KEY")
         if not self.api_key:
             raise ValueError("Gemini API key not found in .env file")
         
-        self.api_base_url = "https://generativelanguage.googleapis.com/v1beta"
-        self.model = "models/gemini-1.5-pro"
+        self.api_base_url = (api_base_url or os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")).rstrip("/")
+        self.model = model or "models/gemini-1.5-pro"
+        self.http = http or shared_http()
+        self.cache = cache or llm_cache.shared()
+        self.deadline = deadline or float(os.getenv("GEMINI_DEADLINE", "180"))
+        self.budget = token_budget.Budget(
+            "gemini", self.model,
+            input_tokens=input_tokens or int(os.getenv("GEMINI_INPUT_TOKENS", "100000")),
+            output_tokens=max_output_tokens or int(os.getenv("GEMINI_MAX_OUTPUT_TOKENS", "2048")),
+        )
+        self.chunk_tokens = chunk_tokens or int(os.getenv("GEMINI_CHUNK_TOKENS", "16000"))
     
-    def generate_dialogue(self, transcription, comments, host_name="Alex", guest_name="Dr. Expert", language="english"):
+    def generate_dialogue(self, transcription, comments, host_name="Alex", guest_name="Dr. Expert", language="english",
+                          usage=None):
         """Generate dialogue based on transcription and audience comments/questions.
+
+        Synchronous wrapper around `agenerate_dialogue` for the CLI.
         
         Args:
             transcription (str): The transcript to base dialogue on
@@ -50,128 +91,142 @@ class GeminiClient:
             host_name (str): Name of the host (default: "Alex")
             guest_name (str): Name of the guest expert (default: "Dr. Expert")
             language (str): Target language for the dialogue (default: "english")
+            usage (dict): Filled with the mode ("single" or "map_reduce"), calls, seconds
+                and token counts of this generation
         """
+        return run_sync(self.agenerate_dialogue(transcription, comments, host_name, guest_name, language, usage))
+
+    async def agenerate_dialogue(self, transcription, comments, host_name="Alex", guest_name="Dr. Expert", language="english",
+                                 usage=None):
+        """Async version of `generate_dialogue`; takes the same arguments."""
         
+        started = time.monotonic()
+        totals = token_budget.new_usage(usage=usage)
+        transcription, comments = await self._fit(transcription, comments, totals)
         prompt = self._create_prompt(transcription, comments, host_name, guest_name, language)
-        
-        url = f"{self.api_base_url}/{self.model}:generateContent?key={self.api_key}"
-        
+        text = await self._complete(self._payload(prompt), totals)
+        totals["seconds"] = time.monotonic() - started
+        return text
+
+    async def _fit(self, transcription, comments, totals):
+        """Condense the inputs with map-reduce if the transcript is over its budget, then trim to fit."""
+        if self.budget.over("transcript", INSTRUCTIONS, transcription, comments):
+            totals["mode"] = "map_reduce"
+            transcription, comments = await mapreduce.acondense(
+                lambda prompt: self._extract(prompt, totals), transcription, comments, self.chunk_tokens, "gemini"
+            )
+        return self.budget.fit(INSTRUCTIONS, transcription, comments)
+
+    async def _extract(self, prompt, totals):
+        # Key points should be faithful, not creative; greedy decoding also lets the response cache keep them.
         payload = {
             "contents": [{"parts": [{"text": prompt}]}],
+            "generationConfig": {"temperature": 0, "maxOutputTokens": self.budget.output_limit(mapreduce.NOTES_TOKENS)},
+        }
+        return await self._complete(payload, totals)
+
+    async def _complete(self, payload, totals):
+        key = self._cache_key(payload)
+        cached = self.cache.get("gemini", key)
+        if cached is not None:
+            totals["cache_hits"] += 1
+            return cached
+
+        url = f"{self.api_base_url}/{self.model}:generateContent"
+        
+        # The key goes in a header so the URL (and connection) can be reused across requests.
+        response_json = await self.http.post_json(
+            url, payload, deadline=self.deadline, headers={"x-goog-api-key": self.api_key}
+        )
+        
+        # Parse the response to get the generated text
+        text = response_json["candidates"][0]["content"]["parts"][0]["text"]
+        self._count_usage(response_json.get("usageMetadata"), payload, text, totals)
+        self.cache.put("gemini", key, text)
+        return text
+
+    def _cache_key(self, payload):
+        # Generation settings plus any other top-level fields, such as a system instruction.
+        params = dict(payload.get("generationConfig", {}))
+        params.update((name, value) for name, value in payload.items() if name not in ("contents", "generationConfig"))
+        return self.cache.key_for("gemini", self.model, payload["contents"], params)
+
+    def _count_usage(self, usage, payload, text, totals):
+        """Add a call's usage metadata to `totals`, estimating when the API sent none."""
+        usage = usage or {}
+        contents = payload.get("systemInstruction", {}).get("parts", []) + payload["contents"][-1]["parts"]
+        estimated = self.budget.estimate("".join(part["text"] for part in contents))
+        if "promptTokenCount" in usage:
+            token_budget.record("gemini", estimated, usage["promptTokenCount"])
+        totals["calls"] += 1
+        totals["estimated_prompt_tokens"] += estimated
+        totals["prompt_tokens"] += usage.get("promptTokenCount", estimated)
+        totals["output_tokens"] += usage.get("candidatesTokenCount", self.budget.estimate(text))
+        # Tokens served from Gemini's implicit prefix cache.
+        totals["cached_tokens"] += usage.get("cachedContentTokenCount", 0)
+
+    def stream_dialogue(self, transcription, comments, host_name="Alex", guest_name="Dr. Expert", language="english",
+                        usage=None):
+        """Iterate over the dialogue text as it is generated (sync wrapper of `astream_dialogue`)."""
+        return iter_sync(self.astream_dialogue(transcription, comments, host_name, guest_name, language, usage))
+
+    async def astream_dialogue(self, transcription, comments, host_name="Alex", guest_name="Dr. Expert", language="english",
+                               usage=None):
+        """Yield text deltas from `streamGenerateContent` as they arrive.
+
+        Sets `usage["ttft"]` to the seconds between sending the request and the first text.
+        With map-reduce that includes the map step, since nothing can stream before it ends.
+        """
+        started = time.monotonic()
+        totals = token_budget.new_usage(usage=usage)
+        transcription, comments = await self._fit(transcription, comments, totals)
+        prompt = self._create_prompt(transcription, comments, host_name, guest_name, language)
+        payload = self._payload(prompt)
+        key = self._cache_key(payload)
+        cached = self.cache.get("gemini", key)
+        if cached is not None:
+            totals["cache_hits"] += 1
+            totals["ttft"] = totals["seconds"] = time.monotonic() - started
+            yield cached
+            return
+
+        url = f"{self.api_base_url}/{self.model}:streamGenerateContent?alt=sse"
+        lines = self.http.stream_lines(
+            "POST", url, json=payload, deadline=self.deadline,
+            headers={"x-goog-api-key": self.api_key},
+        )
+        metadata, text = None, []
+        async for line in lines:
+            data = sse_data(line)
+            if data is None:
+                continue
+            event = json.loads(data)
+            # Every event carries the running totals; the last one has the final counts.
+            metadata = event.get("usageMetadata", metadata)
+            for candidate in event.get("candidates", [])[:1]:
+                for part in candidate.get("content", {}).get("parts", []):
+                    if part.get("text"):
+                        if "ttft" not in totals:
+                            totals["ttft"] = time.monotonic() - started
+                        text.append(part["text"])
+                        yield part["text"]
+        self._count_usage(metadata, payload, "".join(text), totals)
+        self.cache.put("gemini", key, "".join(text))
+        totals["seconds"] = time.monotonic() - started
+
+    def _payload(self, prompt):
+        return {
+            # Static instructions first, request-specific text after, so the prefix can be cached.
+            "systemInstruction": {"parts": [{"text": INSTRUCTIONS}]},
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
             "generationConfig": {
                 "temperature": 0.7,
-                "maxOutputTokens": 2048,
+                "maxOutputTokens": self.budget.output_tokens,
                 "topP": 0.95,
                 "topK": 40
             }
         }
-        
-        response = requests.post(url, json=payload)
-        
-        if response.status_code != 200:
-            raise Exception(f"API request failed with status code {response.status_code}: {response.text}")
-        
-        # Parse the response to get the generated text
-        response_json = response.json()
-        return response_json["candidates"][0]["content"]["parts"][0]["text"]
-    
-    def _create_prompt(self, transcription, comments, host_name, guest_name, language="english"):
-        """Create a prompt for Gemini based on transcription and audience comments/questions.
-        
-        Args:
-            transcription (str): The transcript to base dialogue on
-            comments (str): Audience comments/questions to address in the dialogue
-            host_name (str): Name of the host
-            guest_name (str): Name of the guest expert
-            language (str): Target language for the dialogue
-        """
-        
-        language_instruction = ""
-        if language.lower() != "english":
-            language_instruction = f"Generate the dialogue in {language}. Ensure it sounds natural for native {language} speakers."
-        
-        return f"""
-You are an expert on writing clear and illuminating content. Your primary function is to take complex information and distill it into a precise, engaging, and human-sounding podcast dialogue. You will adhere to the following principles in every response.
-
-Your Core Writing Principles:
-
-    Clarity First: Say exactly what you mean.
-
-    Be Direct: Drop every unnecessary word.
-
-    Use Plain English: Prefer short, simple sentences and common words.
-
-    Cut the Fluff: Skip extra adjectives and adverbs.
-
-    Skip the Hype: You will not use empty buzzwords or over-the-top enthusiasm.
-
-    Stay Honest: No exaggeration or forced cheer. Maintain a grounded, trustworthy tone.
-
-    Sound Natural: Your output must sound like it was written by a thoughtful human. Conversational beats formal.
-
-    Relaxed Grammar: Minor informalities are acceptable if they improve flow. Semicolons are forbidden.
-
-    Avoid AI Tell-Tales: You must avoid common AI phrases like "let's dive in," "in conclusion," "it's important to note that," or similar robotic constructions.
-
-    Mix Sentence Lengths: Create a natural rhythm by varying sentence structure.
 
-    Talk to "You" (in spirit): While the hosts talk to each other, the dialogue should feel like it respects the listener's intelligence and time.
-
-    Prefer Active Voice: Write in the active voice.
-
-    Delete Fillers: Remove phrases like "in order to" and "the fact that."
-
-    Drop Jargon & Clichés: No industry jargon, hashtags, or emojis.
-
-    Speak Confidently: State facts and positions directly.
-
-    Remove Repetition: Say it once, clearly.
-{language_instruction}
-
-### Context:
-TRANSCRIPTION:
-{transcription}
-
-AUDIENCE COMMENTS/QUESTIONS:
-{comments}
-
-### Format:
-Follow EXACTLY this format:
-1. Start with "🎙️ Episode Title: [Catchy Title]"
-2. Add "Hosts:" section with descriptions:
-   {host_name} – curious, engaging interviewer
-   {guest_name} – [brief description based on topic]
-3. Structure the dialogue into these parts:
-   - Intro (spoken lightly)
-   - 3-4 content segments with specific topics and descriptive titles
-   - Wrap
-
-### Speaker Format:
-- For the host: "{host_name} (emotional tone):" followed by dialogue
-- For the guest: "{guest_name} (emotional tone):" followed by dialogue
-- Include varied emotional cues in parentheses like (curious), (thoughtful), (excited), (interjecting), (soft gasp), (reflective)
-- Make sure host and guest reference each other by name throughout the dialogue
-
-### Style:
-- Write natural conversational dialogue with contractions ("I'm", "you're")
-- Include hesitations ("um", "hmm") and pauses ("...")
-- Mix short and long sentences for natural rhythm
-- Include speech mannerisms like corrections or interjections
-- {host_name} MUST address {guest_name} by name multiple times throughout the conversation
-- {guest_name} MUST address {host_name} by name multiple times throughout the conversation
-- Add frequent parenthetical descriptions of tone/actions (soft), (eager), (laughing), (on point, excited), (warm chuckle)
-- Create detailed and descriptive segment titles that capture the specific topic of each segment
-
-### Content:
-- Base all information strictly on the transcription content
-- Address key points from audience comments/questions
-- Keep each segment focused on a specific aspect of the topic
-- The host should ask natural questions that draw out the guest's expertise
-- Aim for a conversational, engaging tone throughout
-
-### Length:
-300-500 words total for the entire dialogue
-
-### Output:
-A podcast-style dialogue that follows the exact format shown above.
-"""
+    def _create_prompt(self, transcription, comments, host_name, guest_name, language="english"):
+        """Create the request-specific part of the prompt; the fixed rules are in `INSTRUCTIONS`."""
+        return dialogue_prompt.request_prompt(transcription, comments, host_name, guest_name, language)
@@ -0,0 +1,297 @@
+"""Durable job queue shared by the API and the worker processes.
+
+The default backend is a SQLite file under `storage/`, which is enough for a
+single host. Set `VID2POD_QUEUE_URL=redis://host:6379/0` to share one queue
+between several nodes.
+"""
+
+import json
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+import uuid
+
+from pipeline import utils
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+DEFAULT_LEASE_SECONDS = 600
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+class JobQueue(ABC):
+    """Interface every queue backend implements.
+
+    Jobs are plain dicts with the keys: id, status, payload, result, error,
+    attempts, worker, created_at, started_at, finished_at.
+    """
+
+    @abstractmethod
+    def enqueue(self, payload: dict) -> str:
+        ...
+
+    @abstractmethod
+    def claim(self, worker_id: str) -> dict | None:
+        """Atomically take the oldest runnable job, or return None if there is none."""
+
+    @abstractmethod
+    def heartbeat(self, job_id: str) -> None:
+        """Extend the lease of a running job so it is not handed to another worker."""
+
+    @abstractmethod
+    def update(self, job_id: str, result: dict) -> None:
+        """Store partial results of a running job without finishing it."""
+
+    @abstractmethod
+    def complete(self, job_id: str, result: dict) -> None:
+        ...
+
+    @abstractmethod
+    def fail(self, job_id: str, error: str) -> None:
+        """Record a failure; the job is retried until it runs out of attempts."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> dict | None:
+        ...
+
+    @abstractmethod
+    def counts(self) -> dict:
+        """Number of jobs per status."""
+
+
+class SQLiteJobQueue(JobQueue):
+    def __init__(self, path: str | None = None, lease_seconds: int = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.path = path or os.path.join(utils.STORAGE_DIR, "jobs.db")
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._db()
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " status TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " result TEXT,"
+                " error TEXT,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " worker TEXT,"
+                " created_at REAL NOT NULL,"
+                " started_at REAL,"
+                " finished_at REAL,"
+                " lease_until REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, payload: dict) -> str:
+        job_id = uuid.uuid4().hex
+        self._db().execute(
+            "INSERT INTO jobs (id, status, payload, created_at) VALUES (?, ?, ?, ?)",
+            (job_id, QUEUED, json.dumps(payload), time.time()),
+        )
+        return job_id
+
+    def claim(self, worker_id: str) -> dict | None:
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            # Running jobs whose lease expired belonged to a worker that died.
+            row = db.execute(
+                "SELECT id FROM jobs WHERE status = ? OR (status = ? AND lease_until < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (QUEUED, RUNNING, now),
+            ).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            db.execute(
+                "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1,"
+                " started_at = ?, lease_until = ? WHERE id = ?",
+                (RUNNING, worker_id, now, now + self.lease_seconds, row["id"]),
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return self.get(row["id"])
+
+    def heartbeat(self, job_id: str) -> None:
+        self._db().execute(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = ?",
+            (time.time() + self.lease_seconds, job_id, RUNNING),
+        )
+
+    def update(self, job_id: str, result: dict) -> None:
+        self._db().execute(
+            "UPDATE jobs SET result = ? WHERE id = ? AND status = ?",
+            (json.dumps(result), job_id, RUNNING),
+        )
+
+    def complete(self, job_id: str, result: dict) -> None:
+        self._db().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = NULL, finished_at = ?, lease_until = NULL WHERE id = ?",
+            (DONE, json.dumps(result), time.time(), job_id),
+        )
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._db().execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END,"
+            " error = ?, finished_at = ?, lease_until = NULL WHERE id = ?",
+            (self.max_attempts, FAILED, QUEUED, error, time.time(), job_id),
+        )
+
+    def get(self, job_id: str) -> dict | None:
+        row = self._db().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job.pop("lease_until")
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def counts(self) -> dict:
+        rows = self._db().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+        return {status: count for status, count in rows}
+
+
+# KEYS: queued list, running list, leases zset; ARGV: job key prefix, worker id, now, lease end, RUNNING.
+_CLAIM_SCRIPT = """
+local job_id = redis.call('LMOVE', KEYS[1], KEYS[2], 'LEFT', 'RIGHT')
+if not job_id then
+    return nil
+end
+local job = ARGV[1] .. job_id
+redis.call('HSET', job, 'status', ARGV[5], 'worker', ARGV[2], 'started_at', ARGV[3])
+redis.call('HINCRBY', job, 'attempts', 1)
+redis.call('ZADD', KEYS[3], ARGV[4], job_id)
+return job_id
+"""
+
+
+class RedisJobQueue(JobQueue):
+    """Queue backed by Redis so workers on several nodes can share it.
+
+    Requires the optional `redis` package.
+    """
+
+    def __init__(self, url: str, prefix: str = "vid2pod", lease_seconds: int = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("The redis package is required for a redis:// queue URL") from e
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._claim_script = self.redis.register_script(_CLAIM_SCRIPT)
+
+    def _key(self, *parts: str) -> str:
+        return ":".join((self.prefix,) + parts)
+
+    def enqueue(self, payload: dict) -> str:
+        job_id = uuid.uuid4().hex
+        pipe = self.redis.pipeline()
+        pipe.hset(self._key("job", job_id), mapping={
+            "id": job_id, "status": QUEUED, "payload": json.dumps(payload),
+            "attempts": 0, "created_at": time.time(),
+        })
+        pipe.rpush(self._key("queued"), job_id)
+        pipe.execute()
+        return job_id
+
+    def claim(self, worker_id: str) -> dict | None:
+        self._requeue_expired()
+        now = time.time()
+        # One script, so a worker dying mid-claim cannot leave a running job without a lease.
+        job_id = self._claim_script(
+            keys=[self._key("queued"), self._key("running"), self._key("leases")],
+            args=[self._key("job", ""), worker_id, now, now + self.lease_seconds, RUNNING],
+        )
+        if job_id is None:
+            return None
+        return self.get(job_id)
+
+    def _requeue_expired(self) -> None:
+        for job_id in self.redis.zrangebyscore(self._key("leases"), 0, time.time()):
+            # Only the worker that wins the ZREM puts the job back.
+            if self.redis.zrem(self._key("leases"), job_id):
+                pipe = self.redis.pipeline()
+                pipe.lrem(self._key("running"), 0, job_id)
+                pipe.hset(self._key("job", job_id), "status", QUEUED)
+                pipe.lpush(self._key("queued"), job_id)
+                pipe.execute()
+
+    def heartbeat(self, job_id: str) -> None:
+        self.redis.zadd(self._key("leases"), {job_id: time.time() + self.lease_seconds}, xx=True)
+
+    def update(self, job_id: str, result: dict) -> None:
+        self.redis.hset(self._key("job", job_id), "result", json.dumps(result))
+
+    def _finish(self, job_id: str, mapping: dict) -> None:
+        pipe = self.redis.pipeline()
+        pipe.zrem(self._key("leases"), job_id)
+        pipe.lrem(self._key("running"), 0, job_id)
+        pipe.hset(self._key("job", job_id), mapping=mapping)
+        pipe.execute()
+
+    def complete(self, job_id: str, result: dict) -> None:
+        self._finish(job_id, {"status": DONE, "result": json.dumps(result), "error": "",
+                              "finished_at": time.time()})
+
+    def fail(self, job_id: str, error: str) -> None:
+        attempts = int(self.redis.hget(self._key("job", job_id), "attempts") or 0)
+        status = FAILED if attempts >= self.max_attempts else QUEUED
+        self._finish(job_id, {"status": status, "error": error, "finished_at": time.time()})
+        if status == QUEUED:
+            self.redis.rpush(self._key("queued"), job_id)
+
+    def get(self, job_id: str) -> dict | None:
+        data = self.redis.hgetall(self._key("job", job_id))
+        if not data:
+            return None
+        return {
+            "id": data["id"],
+            "status": data["status"],
+            "payload": json.loads(data["payload"]),
+            "result": json.loads(data["result"]) if data.get("result") else None,
+            "error": data.get("error") or None,
+            "attempts": int(data.get("attempts", 0)),
+            "worker": data.get("worker"),
+            "created_at": float(data["created_at"]),
+            "started_at": float(data["started_at"]) if data.get("started_at") else None,
+            "finished_at": float(data["finished_at"]) if data.get("finished_at") else None,
+        }
+
+    def counts(self) -> dict:
+        counts = {}
+        for key in self.redis.scan_iter(self._key("job", "*")):
+            status = self.redis.hget(key, "status")
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+
+def get_queue(url: str | None = None) -> JobQueue:
+    """Build the queue named by `url` or `VID2POD_QUEUE_URL` (default: SQLite under storage/)."""
+    url = url or os.getenv("VID2POD_QUEUE_URL", "")
+    if url.startswith(("redis://", "rediss://")):
+        return RedisJobQueue(url)
+    if url.startswith("sqlite:///"):
+        return SQLiteJobQueue(url[len("sqlite:///"):])
+    if url:
+        raise ValueError(f"Unsupported queue URL: {url}")
+    return SQLiteJobQueue()
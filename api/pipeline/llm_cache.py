@@ -0,0 +1,168 @@
+"""On-disk cache of LLM responses, shared by the Gemini and DeepSeek clients.
+
+Responses are keyed on (provider, model, messages, generation parameters) and
+kept zlib-compressed in one SQLite file, with a TTL and size-bounded LRU
+eviction. WAL mode lets the API, the workers and the CLI scripts share it.
+
+Sampled requests (temperature > 0) are only cached when explicitly allowed,
+since a rerun of them is normally meant to produce a different answer.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from pipeline import metrics, utils
+
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2  # 256 MiB
+DEFAULT_TTL = 7 * 24 * 3600  # a week
+
+_COUNTER_FIELDS = {"llm_cache.hit": "hits", "llm_cache.miss": "misses", "llm_cache.evicted": "evictions"}
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "").lower() in ("1", "true", "yes")
+
+
+class ResponseCache:
+    """LLM responses stored in `storage/llm_cache.db`.
+
+    Args:
+        path (str): SQLite file (default: $VID2POD_STORAGE/llm_cache.db)
+        max_bytes (int): Compressed size budget (default: $LLM_CACHE_MAX_BYTES or 256 MiB)
+        ttl (float): Seconds an entry stays valid (default: $LLM_CACHE_TTL or a week)
+        bypass (bool): Skip lookups but still store fresh responses (default: $LLM_CACHE_BYPASS)
+        allow_sampled (bool): Also cache requests with temperature > 0 (default: $LLM_CACHE_SAMPLED)
+    """
+
+    def __init__(self, path: str | None = None, max_bytes: int | None = None, ttl: float | None = None,
+                 bypass: bool | None = None, allow_sampled: bool | None = None):
+        self.path = path or os.path.join(utils.STORAGE_DIR, "llm_cache.db")
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("LLM_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self.ttl = ttl if ttl is not None else float(os.getenv("LLM_CACHE_TTL", DEFAULT_TTL))
+        self.bypass = bypass if bypass is not None else _env_flag("LLM_CACHE_BYPASS")
+        self.allow_sampled = allow_sampled if allow_sampled is not None else _env_flag("LLM_CACHE_SAMPLED")
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " provider TEXT NOT NULL,"
+                " body BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(provider: str, model: str, messages, params: dict) -> str:
+        return utils.stable_hash({"provider": provider, "model": model, "messages": messages, "params": params})
+
+    def key_for(self, provider: str, model: str, messages, params: dict) -> str | None:
+        """Key for a request, or None if it may not be cached (sampled without opt-in)."""
+        # Both providers default to temperature 1 when none is sent.
+        if params.get("temperature", 1.0) > 0 and not self.allow_sampled:
+            return None
+        return self.make_key(provider, model, messages, params)
+
+    def get(self, provider: str, key: str | None) -> str | None:
+        """Return the cached response text, or None on a miss, bypass or uncacheable key."""
+        if key is None or self.bypass:
+            return None
+        db = self._db()
+        now = time.time()
+        row = db.execute(
+            "SELECT body FROM responses WHERE key = ? AND created > ?", (key, now - self.ttl)
+        ).fetchone()
+        if row is None:
+            metrics.incr("llm_cache.miss", provider)
+            return None
+        db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        metrics.incr("llm_cache.hit", provider)
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, provider: str, key: str | None, text: str) -> None:
+        if key is None:
+            return
+        body = zlib.compress(text.encode("utf-8"))
+        now = time.time()
+        self._db().execute(
+            "INSERT OR REPLACE INTO responses (key, provider, body, size, created, last_access)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (key, provider, body, len(body), now, now),
+        )
+        self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries, then least-recently-used ones until under `max_bytes`.
+
+        Returns the number of entries removed.
+        """
+        db = self._db()
+        cutoff = time.time() - self.ttl
+        removed = 0
+        for provider, count in db.execute(
+            "SELECT provider, COUNT(*) FROM responses WHERE created <= ? GROUP BY provider", (cutoff,)
+        ).fetchall():
+            metrics.incr("llm_cache.evicted", provider, count)
+            removed += count
+        db.execute("DELETE FROM responses WHERE created <= ?", (cutoff,))
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return removed
+        for key, provider, size in db.execute(
+            "SELECT key, provider, size FROM responses ORDER BY last_access"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            metrics.incr("llm_cache.evicted", provider)
+            total -= size
+            removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        """Entry counts, sizes and hit/miss counters per provider."""
+        providers: dict = {}
+        for provider, entries, size in self._db().execute(
+            "SELECT provider, COUNT(*), SUM(size) FROM responses GROUP BY provider"
+        ):
+            providers[provider] = {"entries": entries, "bytes": size}
+        for name, by_provider in metrics.snapshot("llm_cache.").items():
+            field = _COUNTER_FIELDS.get(name)
+            if field is None:
+                continue
+            for provider, value in by_provider.items():
+                providers.setdefault(provider, {"entries": 0, "bytes": 0})[field] = value
+        for provider in providers.values():
+            provider.setdefault("evictions", 0)
+            hits, misses = provider.setdefault("hits", 0), provider.setdefault("misses", 0)
+            provider["hit_rate"] = hits / (hits + misses) if hits + misses else 0.0
+        return {
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "bytes": sum(p["bytes"] for p in providers.values()),
+            "providers": providers,
+        }
+
+
+_shared = None
+
+
+def shared() -> ResponseCache:
+    """The cache every client uses unless given its own."""
+    global _shared
+    if _shared is None:
+        _shared = ResponseCache()
+    return _shared
@@ -0,0 +1,109 @@
+"""Map-reduce generation for inputs too large for one prompt.
+
+When a transcript is over its share of the token budget (see
+`token_budget.Budget`), it (and the comments, if they are large too) is
+split into token-sized chunks, key points are extracted from the chunks concurrently
+(map), and the caller runs its usual dialogue/questions prompt over the
+condensed notes (reduce). Used by GeminiClient and the DeepSeek scripts.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline.token_budget import estimate_tokens
+
+# Output limit of each map call; the notes of all chunks make up the reduce prompt.
+NOTES_TOKENS = 1024
+
+MAP_INSTRUCTIONS = {
+    "transcript": (
+        "Below is one part of a video transcript. Extract its key points as "
+        "concise bullet notes: main claims, arguments, examples, numbers and names. Keep the "
+        "speaker's meaning, drop filler. Output only the bullets."
+    ),
+    "comments": (
+        "Below is one part of the audience comments on a video. List the "
+        "distinct questions, objections and recurring opinions as concise bullets, most common "
+        "first. Drop spam and near-duplicates. Output only the bullets."
+    ),
+}
+
+
+def split_by_tokens(text: str, max_tokens: int, provider: str = "") -> list[str]:
+    """Split `text` into chunks of at most ~`max_tokens`, breaking between lines where possible.
+
+    Sizes are `estimate_tokens` for `provider`, the same estimate the budget
+    checks the chunks against.
+    """
+    chunks, current, size = [], [], 0
+    for line in text.splitlines():
+        # A single line longer than a chunk is cut between words.
+        tokens = estimate_tokens(line + "\n", provider)
+        while tokens > max_tokens:
+            if current:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            max_chars = max(1, len(line) * max_tokens // tokens)
+            cut = line.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            chunks.append(line[:cut])
+            line = line[cut:].lstrip()
+            tokens = estimate_tokens(line + "\n", provider)
+        if size + tokens > max_tokens and current:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += tokens
+    if current and any(part.strip() for part in current):
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def map_prompts(kind: str, text: str, chunk_tokens: int, provider: str = "") -> list[str]:
+    chunks = split_by_tokens(text, chunk_tokens, provider)
+    # The instruction comes first and never varies, so providers can cache it as a prefix.
+    return [
+        f"{MAP_INSTRUCTIONS[kind]}\n\nPart {i + 1} of {len(chunks)}:\n{chunk}"
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+def _plan(transcript: str, comments: str, chunk_tokens: int, provider: str) -> list[tuple[str, str]]:
+    """(kind, prompt) pairs to map. Comments that fit in one chunk are passed through as is."""
+    jobs = [("transcript", p) for p in map_prompts("transcript", transcript, chunk_tokens, provider)]
+    if estimate_tokens(comments, provider) > chunk_tokens:
+        jobs += [("comments", p) for p in map_prompts("comments", comments, chunk_tokens, provider)]
+    return jobs
+
+
+def _reduce_inputs(jobs, notes, comments) -> tuple[str, str]:
+    transcript_notes = [n for (kind, _), n in zip(jobs, notes) if kind == "transcript"]
+    comment_notes = [n for (kind, _), n in zip(jobs, notes) if kind == "comments"]
+    return "\n\n".join(transcript_notes), ("\n\n".join(comment_notes) if comment_notes else comments)
+
+
+def condense(chat, transcript: str, comments: str, chunk_tokens: int, workers: int = 4,
+             provider: str = "") -> tuple[str, str]:
+    """Map step for synchronous clients.
+
+    Args:
+        chat (callable): Sends one prompt and returns the completion text
+        chunk_tokens (int): Token budget of each chunk
+        workers (int): Chunks summarised at the same time
+        provider (str): Whose tokenizer the chunk sizes are estimated for
+
+    Returns:
+        (transcript_notes, comments_or_comment_notes)
+    """
+    jobs = _plan(transcript, comments, chunk_tokens, provider)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        notes = list(pool.map(chat, [prompt for _, prompt in jobs]))
+    return _reduce_inputs(jobs, notes, comments)
+
+
+async def acondense(achat, transcript: str, comments: str, chunk_tokens: int,
+                    provider: str = "") -> tuple[str, str]:
+    """Map step for asyncio clients; concurrency is bounded by the client's own pool."""
+    jobs = _plan(transcript, comments, chunk_tokens, provider)
+    notes = await asyncio.gather(*(achat(prompt) for _, prompt in jobs))
+    return _reduce_inputs(jobs, notes, comments)
@@ -0,0 +1,52 @@
+"""Counters persisted in SQLite so the API and every worker process see the same numbers."""
+
+import os
+import sqlite3
+import threading
+
+from pipeline import utils
+
+DB_PATH = os.path.join(utils.STORAGE_DIR, "metrics.db")
+
+_local = threading.local()
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(db_path)
+    if conn is None:
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS counters ("
+            " name TEXT NOT NULL,"
+            " label TEXT NOT NULL DEFAULT '',"
+            " value REAL NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (name, label))"
+        )
+        conns[db_path] = conn
+    return conn
+
+
+def incr(name: str, label: str = "", amount: float = 1, db_path: str | None = None) -> None:
+    """Add `amount` to the counter `name{label}`."""
+    _connect(db_path or DB_PATH).execute(
+        "INSERT INTO counters (name, label, value) VALUES (?, ?, ?) "
+        "ON CONFLICT(name, label) DO UPDATE SET value = value + excluded.value",
+        (name, label, amount),
+    )
+
+
+def snapshot(prefix: str = "", db_path: str | None = None) -> dict:
+    """Return {name: {label: value}} for every counter whose name starts with `prefix`."""
+    rows = _connect(db_path or DB_PATH).execute(
+        "SELECT name, label, value FROM counters WHERE substr(name, 1, ?) = ? ORDER BY name, label",
+        (len(prefix), prefix),
+    )
+    result: dict = {}
+    for name, label, value in rows:
+        result.setdefault(name, {})[label] = int(value) if float(value).is_integer() else value
+    return result
@@ -0,0 +1,311 @@
+"""Podcast audio from a dialogue script, synthesised offline with piper.
+
+The dialogue is split into speaker turns ("Alex (curious): ..."), each
+speaker gets a voice for the episode's language, and the turns are
+synthesised in parallel on a pool of piper processes. Text without speaker
+turns, such as a plain transcript, is read by one narrator voice in
+paragraph-sized parts. Each process loads its voice once and reads a batch
+of turns. Segments are cached on disk by hash of (voice, text), in an
+`ArtifactCache` with its own size limit, so re-rendering an edited dialogue
+only synthesises the turns that changed, and they are copied into the output
+WAV block by block, in order, as soon as they are ready, so the episode is
+never held in memory.
+"""
+
+import json
+import math
+import os
+import re
+import subprocess
+import tempfile
+import time
+import uuid
+import wave
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from pipeline import metrics, utils
+from pipeline.cache import ArtifactCache
+from pipeline.translator import split_sentences
+
+PIPER_BIN = os.getenv("PIPER_BIN", "piper")
+VOICE_DIR = os.getenv("PIPER_VOICE_DIR", "./voices")
+# Voices per language, handed to speakers in order of first appearance.
+VOICES = json.loads(os.getenv("PODCAST_VOICES", "null")) or {
+    "en": ["en_US-lessac-medium", "en_US-ryan-medium"],
+    "de": ["de_DE-thorsten-medium", "de_DE-eva_k-x_low"],
+    "es": ["es_ES-davefx-medium", "es_MX-claude-high"],
+    "fr": ["fr_FR-siwis-medium", "fr_FR-tom-medium"],
+    "vi": ["vi_VN-vais1000-medium", "vi_VN-25hours_single-low"],
+}
+DEFAULT_LANGUAGE = "en"
+SAMPLE_RATE = 22050  # every segment is stored at this rate so they can be concatenated as is
+PAUSE_SECONDS = float(os.getenv("PODCAST_PAUSE", "0.35"))
+WORKERS = int(os.getenv("PODCAST_WORKERS", "0")) or utils.physical_cores()
+SEGMENT_DIR = os.path.join(utils.STORAGE_DIR, "tts")
+CACHE_MAX_BYTES = int(os.getenv("PODCAST_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+# Longest part the narrator reads as one segment when the text has no speaker turns.
+NARRATION_CHARS = int(os.getenv("PODCAST_NARRATION_CHARS", "600"))
+NARRATOR = "Narrator"
+
+_segment_cache = None
+
+_SPEAKER_LINE = re.compile(r"^[\s*_]*([^\W\d_][\w .'’-]{0,40}?)[\s*_]*(?:\([^)]*\))?[\s*_]*:\s*(\S.*)$")
+_STAGE_DIRECTIONS = re.compile(r"\([^)]*\)|\[[^\]]*\]|[*_#]+")
+_SPACES = re.compile(r"\s+")
+_MARKDOWN_HEADING = re.compile(r"^\s*(#{1,6}\s|[-*_]{3,}\s*$|\*\*[^*]+\*\*:?\s*$|🎙)")
+_COPY_FRAMES = 1 << 16
+
+
+def _clean(text: str) -> str:
+    """What the speaker actually says: no (tone) cues, [actions] or markdown."""
+    return _SPACES.sub(" ", _STAGE_DIRECTIONS.sub(" ", text)).strip()
+
+
+def _is_heading(line: str) -> bool:
+    """Markdown headings, rules and whole-line bold titles, plus the "🎙️ Episode Title" line."""
+    return bool(_MARKDOWN_HEADING.match(line))
+
+
+def parse_turns(dialogue: str) -> list[tuple[str, str]]:
+    """(speaker, text) turns of a dialogue in the format of `dialogue_prompt.INSTRUCTIONS`.
+
+    A speaker is a name that opens a line with a colon and either carries a
+    tone cue or speaks more than once, so one-off "Intro:" or "Segment 1:"
+    labels are not mistaken for people (and are not read out). Lines without
+    a speaker continue the current turn unless they are headings.
+    """
+    lines = dialogue.splitlines()
+    candidates = [(_SPEAKER_LINE.match(line), line) for line in lines]
+    counts: dict = {}
+    for match, line in candidates:
+        if match:
+            name = match.group(1).strip()
+            counts[name] = counts.get(name, 0) + (2 if "(" in line.split(":", 1)[0] else 1)
+
+    turns: list[list] = []
+    for match, line in candidates:
+        if match and counts[match.group(1).strip()] >= 2:
+            turns.append([match.group(1).strip(), match.group(2)])
+        elif turns and line.strip() and not match and not _is_heading(line):
+            turns[-1][1] += " " + line.strip()
+    return [(speaker, _clean(text)) for speaker, text in turns if _clean(text)]
+
+
+def _pieces(text: str, max_chars: int):
+    """Sentences of `text`, any longer than `max_chars` (unpunctuated captions) cut between words."""
+    for sentence in split_sentences(text):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            yield sentence[:cut]
+            sentence = sentence[cut:].lstrip()
+        if sentence:
+            yield sentence
+
+
+def narration(text: str, max_chars: int = NARRATION_CHARS) -> list[tuple[str, str]]:
+    """Turns of one narrator reading `text`: its paragraphs, long ones cut between sentences."""
+    turns = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        lines = [line for line in paragraph.splitlines() if line.strip() and not _is_heading(line)]
+        part = ""
+        for piece in _pieces(_clean(" ".join(lines)), max_chars):
+            if part and len(part) + 1 + len(piece) > max_chars:
+                turns.append((NARRATOR, part))
+                part = ""
+            part = f"{part} {piece}" if part else piece
+        if part:
+            turns.append((NARRATOR, part))
+    return turns
+
+
+def voices_for(lang: str) -> list[str]:
+    """Voices of `lang` (e.g. "en", "vi-VN", "french"); ValueError if VOICES has none for it."""
+    code = utils.language_code(lang)
+    voices = VOICES.get(code) or VOICES.get(lang.strip().lower())
+    if not voices:
+        raise ValueError(f"No piper voices for language {lang!r}; set PODCAST_VOICES "
+                         f"(configured: {', '.join(sorted(VOICES))})")
+    return voices
+
+
+def assign_voices(speakers: list[str], lang: str) -> dict:
+    """Voice per speaker, in order of first appearance, for `lang`."""
+    voices = voices_for(lang)
+    order = list(dict.fromkeys(speakers))
+    return {speaker: voices[i % len(voices)] for i, speaker in enumerate(order)}
+
+
+def segment_key(voice: str, text: str) -> str:
+    return utils.stable_hash({"voice": voice, "text": text, "rate": SAMPLE_RATE})
+
+
+def _voice_rate(model_path: str) -> int:
+    with open(model_path + ".json", "r", encoding="utf-8") as f:
+        return json.load(f)["audio"]["sample_rate"]
+
+
+def _synthesize_batch(args: tuple) -> tuple[float, list[tuple[str, str]]]:
+    """Run one piper process over a batch of turns of one voice.
+
+    Every turn is written to its own file in `staging`, resampled to
+    SAMPLE_RATE first if the voice differs. Returns the audio seconds produced
+    and the (segment key, file) pairs, which the caller moves into the cache.
+    """
+    piper_bin, model_path, staging, items = args
+    rate = _voice_rate(model_path)
+    pending = [(text, key, os.path.join(staging, f"{key}.{os.getpid()}.wav")) for text, key in items]
+    lines = "".join(json.dumps({"text": text, "output_file": tmp}) + "\n" for text, _, tmp in pending)
+    subprocess.run(
+        [piper_bin, "--model", model_path, "--json-input", "--quiet"],
+        input=lines, text=True, check=True, stdout=subprocess.DEVNULL,
+    )
+    seconds = 0.0
+    for _, _, tmp in pending:
+        if rate != SAMPLE_RATE:
+            resampled = tmp + ".rs.wav"
+            subprocess.run(
+                ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", tmp,
+                 "-ar", str(SAMPLE_RATE), "-ac", "1", "-c:a", "pcm_s16le", resampled],
+                check=True,
+            )
+            os.replace(resampled, tmp)
+        with wave.open(tmp, "rb") as w:
+            seconds += w.getnframes() / w.getframerate()
+    return seconds, [(key, tmp) for _, key, tmp in pending]
+
+
+def _plan_batches(missing: list[tuple[int, str, str]], workers: int, model_paths: dict,
+                  staging: str) -> list[tuple]:
+    """Group the turns still to synthesise into about `workers` single-voice batches, earliest turns first."""
+    size = max(1, math.ceil(len(missing) / workers))
+    by_voice: dict = {}
+    for index, voice, text in missing:
+        by_voice.setdefault(voice, []).append((index, text))
+    batches = []
+    for voice, items in by_voice.items():
+        for start in range(0, len(items), size):
+            chunk = items[start:start + size]
+            batches.append((chunk[0][0], (PIPER_BIN, model_paths[voice], staging,
+                                          [(text, segment_key(voice, text)) for _, text in chunk])))
+    return [job for _, job in sorted(batches, key=lambda batch: batch[0])]
+
+
+class _Writer:
+    """Appends cached segments to the output WAV in turn order, streaming each one block by block."""
+
+    def __init__(self, path: str, keys: list[str]):
+        self.keys = keys
+        self.next = 0
+        self.out = wave.open(path, "wb")
+        self.out.setnchannels(1)
+        self.out.setsampwidth(2)
+        self.out.setframerate(SAMPLE_RATE)
+        self.pause = b"\0\0" * int(PAUSE_SECONDS * SAMPLE_RATE)
+
+    def flush_ready(self, ready: dict) -> None:
+        """Write the segments in `ready` ({segment key: path}) that are next in order."""
+        while self.next < len(self.keys) and self.keys[self.next] in ready:
+            if self.next:
+                self.out.writeframes(self.pause)
+            with wave.open(ready[self.keys[self.next]], "rb") as segment:
+                while True:
+                    frames = segment.readframes(_COPY_FRAMES)
+                    if not frames:
+                        break
+                    self.out.writeframes(frames)
+            self.next += 1
+
+    def close(self) -> None:
+        self.out.close()
+
+
+def segment_cache() -> ArtifactCache:
+    """The cache of synthesised turns, created on first use so importing this module writes nothing."""
+    global _segment_cache
+    if _segment_cache is None:
+        _segment_cache = ArtifactCache(SEGMENT_DIR, CACHE_MAX_BYTES, metric_prefix="podcast.segment_cache")
+    return _segment_cache
+
+
+def generate_audio(dialogue: str, lang: str = DEFAULT_LANGUAGE, workers: int | None = None,
+                   output_path: str | None = None, cache: ArtifactCache | None = None) -> str:
+    """Render `dialogue` to a WAV file and return its path.
+
+    Args:
+        dialogue (str): Dialogue script, one "Name (tone): text" turn per line, or plain
+            text (e.g. a transcript), which one narrator reads
+        lang (str): Language of the dialogue, to pick voices (default: "en")
+        workers (int): Concurrent piper processes (default: $PODCAST_WORKERS or the physical cores)
+        output_path (str): Where to write the WAV (default: a new file under storage/)
+        cache (ArtifactCache): Segment cache to use (default: `segment_cache()`)
+    """
+    cache = cache or segment_cache()
+    turns = parse_turns(dialogue) or narration(dialogue)
+    if not turns:
+        raise ValueError("Nothing to read: the dialogue is empty")
+    voices = assign_voices([speaker for speaker, _ in turns], lang)
+    model_paths = {voice: os.path.join(VOICE_DIR, voice + ".onnx") for voice in set(voices.values())}
+    for path in model_paths.values():
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Piper voice not found: {path}")
+
+    keys = [segment_key(voices[speaker], text) for speaker, text in turns]
+    # Segments of this episode must survive other renders' evictions until they are written out.
+    owner = uuid.uuid4().hex
+    cache.pin(owner, [("segment", key) for key in keys])
+    ready = {}
+    for key in dict.fromkeys(keys):
+        path = cache.get("segment", key, count=False)
+        if path:
+            ready[key] = path
+    # The same line said twice by the same voice is synthesised once.
+    first_of = {}
+    for i, (speaker, text) in enumerate(turns):
+        if keys[i] not in ready:
+            first_of.setdefault(keys[i], (i, voices[speaker], text))
+    missing = list(first_of.values())
+    metrics.incr("podcast.segments_cached", amount=len(turns) - len(missing))
+    metrics.incr("podcast.segments_synthesized", amount=len(missing))
+
+    if output_path is None:
+        os.makedirs(utils.STORAGE_DIR, exist_ok=True)
+        fd, output_path = tempfile.mkstemp(prefix="podcast-", suffix=".wav", dir=utils.STORAGE_DIR)
+        os.close(fd)
+    writer = _Writer(output_path, keys)
+    started = time.monotonic()
+    audio_seconds = 0.0
+    try:
+        writer.flush_ready(ready)
+        if missing:
+            workers = workers or WORKERS
+            with tempfile.TemporaryDirectory(dir=cache.root) as staging:
+                batches = _plan_batches(missing, workers, model_paths, staging)
+                print(f"Synthesising {len(missing)} of {len(turns)} turns in {len(batches)} batch(es) "
+                      f"on {workers} worker(s)")
+                with ProcessPoolExecutor(max_workers=min(workers, len(batches))) as pool:
+                    running = {pool.submit(_synthesize_batch, job) for job in batches}
+                    while running:
+                        done, running = wait(running, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            seconds, produced = future.result()
+                            audio_seconds += seconds
+                            for key, tmp in produced:
+                                ready[key] = cache.put("segment", key, tmp)
+                        writer.flush_ready(ready)
+        writer.close()
+    except BaseException:
+        writer.close()
+        os.remove(output_path)
+        raise
+    finally:
+        cache.release(owner)
+        # Segments were pinned while the episode was written; trim to the limit now.
+        cache.evict()
+    if missing:
+        elapsed = time.monotonic() - started
+        metrics.incr("podcast.synth_seconds", amount=elapsed)
+        metrics.incr("podcast.audio_seconds", amount=audio_seconds)
+        print(f"Synthesised {audio_seconds:.1f}s of audio in {elapsed:.1f}s "
+              f"(real-time factor {elapsed / max(audio_seconds, 1e-9):.3f})")
+    return output_path
@@ -0,0 +1,197 @@
+"""Route dialogue generation across LLM providers with hedging and failover.
+
+Each provider's recent latencies and errors are kept in a rolling window.
+A request goes to the best-ranked provider first; if it has not answered by
+that provider's p95 latency, a hedged duplicate goes to the next one and
+whichever finishes first wins, the other being cancelled. Rate limits, 5xx
+and transport errors fail over to the next provider straight away.
+
+    router = Router({"gemini": GeminiClient(), "deepseek": ChatClient("deepseek")})
+    usage = {}
+    dialogue = router.generate_dialogue(transcript, comments, usage=usage)
+    print(usage["provider"], usage["prompt_tokens"])
+"""
+
+import asyncio
+import os
+import statistics
+import time
+from collections import deque
+
+from pipeline import metrics
+from pipeline.async_http import APIError, run_sync
+
+PROVIDERS = [name.strip() for name in os.getenv("ROUTER_PROVIDERS", "gemini,deepseek,mistral").split(",") if name.strip()]
+WINDOW = int(os.getenv("ROUTER_WINDOW", "100"))
+# Samples needed before a provider's own p95 is trusted as its hedge delay.
+MIN_SAMPLES = int(os.getenv("ROUTER_MIN_SAMPLES", "5"))
+DEFAULT_HEDGE_AFTER = float(os.getenv("ROUTER_HEDGE_AFTER", "20"))
+
+
+def is_retryable(error: Exception) -> bool:
+    """Errors worth sending to another provider: rate limits, 5xx, timeouts and transport failures."""
+    if isinstance(error, APIError):
+        return error.status_code is None or error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, (asyncio.TimeoutError, ConnectionError))
+
+
+class ProviderStats:
+    """Rolling latency and error record of one provider."""
+
+    def __init__(self, window: int = WINDOW):
+        self.latencies: deque = deque(maxlen=window)
+        self.outcomes: deque = deque(maxlen=window)  # True for success
+
+    def record(self, seconds: float | None, ok: bool) -> None:
+        if seconds is not None:
+            self.latencies.append(seconds)
+        self.outcomes.append(ok)
+
+    def percentile(self, q: float) -> float | None:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def hedge_after(self) -> float:
+        if len(self.latencies) < MIN_SAMPLES:
+            return DEFAULT_HEDGE_AFTER
+        return self.percentile(0.95)
+
+    def summary(self) -> dict:
+        return {
+            "samples": len(self.outcomes),
+            "error_rate": self.error_rate,
+            "p50": statistics.median(self.latencies) if self.latencies else None,
+            "p95": self.percentile(0.95),
+        }
+
+
+class Router:
+    """Dialogue client that spreads requests over several providers.
+
+    Args:
+        providers (dict): Name -> client with `agenerate_dialogue`, in order of preference
+        hedge (bool): Send a duplicate to the next provider once the first passes its p95
+    """
+
+    def __init__(self, providers: dict, hedge: bool = True):
+        if not providers:
+            raise ValueError("Router needs at least one provider")
+        self.providers = dict(providers)
+        self.hedge = hedge
+        self.stats = {name: ProviderStats() for name in self.providers}
+
+    def ranked(self) -> list[str]:
+        """Providers by recent error rate, then median latency; untried ones keep their given order first."""
+        def rank(name):
+            stats = self.stats[name]
+            p50 = statistics.median(stats.latencies) if stats.latencies else 0.0
+            return round(stats.error_rate, 1), p50
+        return sorted(self.providers, key=rank)
+
+    def generate_dialogue(self, transcription, comments, host_name="Alex", guest_name="Dr. Expert", language="english",
+                          usage=None):
+        """Synchronous wrapper around `agenerate_dialogue`."""
+        return run_sync(self.agenerate_dialogue(transcription, comments, host_name, guest_name, language, usage))
+
+    async def agenerate_dialogue(self, transcription, comments, host_name="Alex", guest_name="Dr. Expert", language="english",
+                                 usage=None):
+        return await self.route(
+            lambda client, totals: client.agenerate_dialogue(transcription, comments, host_name, guest_name, language,
+                                                             usage=totals),
+            usage,
+        )
+
+    async def _timed(self, name: str, call):
+        started = time.monotonic()
+        totals = {}  # each attempt, hedges included, records into its own dict
+        try:
+            result = await call(self.providers[name], totals)
+        except asyncio.CancelledError:
+            # The loser of a hedge: a cut-short latency is neither a success nor an
+            # error, so it stays out of the stats that rank and hedge the providers.
+            metrics.incr("router.cancelled", name)
+            raise
+        except Exception:
+            self.stats[name].record(None, False)
+            metrics.incr("router.errors", name)
+            raise
+        self.stats[name].record(time.monotonic() - started, True)
+        return result, totals
+
+    async def route(self, call, usage: dict | None = None):
+        """Run `call(client, usage)` on the providers until one succeeds.
+
+        Returns the first successful result and fills `usage`, when given,
+        with the winning call's usage plus the `provider` that answered.
+        Raises the last error once every provider has failed, or straight
+        away for an error another provider would not fix (e.g. a 400 for a
+        malformed request).
+        """
+        waiting = self.ranked()
+        running: dict = {}
+        errors: list = []
+
+        def launch():
+            name = waiting.pop(0)
+            running[asyncio.create_task(self._timed(name, call))] = name
+            metrics.incr("router.requests", name)
+            return name
+
+        first = launch()
+        hedge_at = time.monotonic() + self.stats[first].hedge_after()
+        try:
+            while running:
+                timeout = None
+                if self.hedge and waiting and len(running) == 1:
+                    timeout = max(0.0, hedge_at - time.monotonic())
+                done, _ = await asyncio.wait(set(running), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    metrics.incr("router.hedged", launch())
+                    continue
+                for task in done:
+                    name = running.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        metrics.incr("router.wins", name)
+                        result, totals = task.result()
+                        if usage is not None:
+                            usage.clear()
+                            usage.update(totals, provider=name)
+                        return result
+                    if not is_retryable(error):
+                        raise error
+                    print(f"Provider {name} failed, failing over: {error}")
+                    errors.append(error)
+                if not running and waiting:
+                    hedge_at = time.monotonic() + self.stats[launch()].hedge_after()
+        finally:
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+        raise errors[-1]
+
+    def summary(self) -> dict:
+        """Rolling latency and error figures per provider."""
+        return {name: stats.summary() for name, stats in self.stats.items()}
+
+
+def from_env(names: list[str] | None = None) -> Router:
+    """Router over the providers in `names` (default: $ROUTER_PROVIDERS) that have an API key set."""
+    from pipeline.chat_client import PROVIDERS as CHAT_PROVIDERS, ChatClient
+    from pipeline.gemini_client import GeminiClient
+
+    providers = {}
+    for name in names or PROVIDERS:
+        try:
+            providers[name] = GeminiClient() if name == "gemini" else ChatClient(name)
+        except ValueError as e:
+            print(f"Skipping provider {name}: {e}")
+        except KeyError:
+            raise ValueError(f"Unknown provider {name!r}; expected gemini or one of {sorted(CHAT_PROVIDERS)}")
+    return Router(providers)
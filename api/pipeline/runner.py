@@ -0,0 +1,293 @@
+"""The video-to-podcast pipeline shared by the API and the workers."""
+
+import os
+import tempfile
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from pipeline import captions, downloader, transcriber, translator, podcaster
+from pipeline import metrics, utils
+from pipeline.cache import ArtifactCache
+from pipeline.transcript import EXTENSION, Transcript, read_text
+
+artifact_cache = ArtifactCache()
+# Languages of one job translated (or synthesised) at the same time.
+LANGUAGE_WORKERS = int(os.getenv("LANGUAGE_WORKERS", "3"))
+# Seconds between updates of the partial transcript of a streaming transcription.
+PARTIAL_INTERVAL = float(os.getenv("PARTIAL_INTERVAL", "2"))
+
+
+def stage_params(lang: str) -> list[tuple[str, dict]]:
+    """Effective parameters of each stage; changing any of them invalidates that stage onwards."""
+    return [
+        ("download", {"format": downloader.YDL_FORMAT, "mode": downloader.MODE, "codec": downloader.AUDIO_CODEC}),
+        ("transcribe", {
+            "model": transcriber.MODEL_NAME,
+            "captions": captions.POLICY,
+            "caption_languages": captions.LANGUAGES,
+        }),
+        ("translate", {
+            "lang": lang,
+            "model": translator.MODEL,
+            "prompt": utils.sha256_text(translator.PROMPT),
+        }),
+        ("podcast", {
+            "voices": podcaster.VOICES,
+            "pause": podcaster.PAUSE_SECONDS,
+            "narration_chars": podcaster.NARRATION_CHARS,
+            "sample_rate": podcaster.SAMPLE_RATE,
+        }),
+    ]
+
+
+def _put_transcript(key: str, transcript: Transcript) -> str:
+    """Store a timestamped transcript as the transcribe artifact."""
+    os.makedirs(utils.STORAGE_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=EXTENSION, dir=utils.STORAGE_DIR)
+    os.close(fd)
+    return artifact_cache.put("transcribe", key, transcript.save(path))
+
+
+def plan(url: str, lang: str) -> dict:
+    """Compute stage keys and find the furthest stage that already has a cached artifact.
+
+    The returned context dict is passed through the stage functions below.
+    """
+    params = stage_params(lang)
+    stages = [name for name, _ in params]
+    video_id = utils.extract_video_id(url)
+    keys = artifact_cache.chain_keys(video_id, params)
+
+    # Every artifact of the chain stays pinned while the job runs, so another
+    # job's eviction cannot remove one this job is about to read.
+    owner = uuid.uuid4().hex
+    artifact_cache.pin(owner, list(zip(stages, keys)))
+
+    # Only the lookups that decide where the job resumes count as hits or misses.
+    start, artifact = 0, None
+    for i in reversed(range(len(stages))):
+        artifact = artifact_cache.get(stages[i], keys[i], count=False)
+        if artifact:
+            start = i + 1
+            break
+    if start:
+        metrics.incr("cache.hit", stages[start - 1])
+    if start < len(stages):
+        metrics.incr("cache.miss", stages[start])
+    source = None
+    if start >= 2:
+        source = "cache"
+        metrics.incr("pipeline.transcript_source", source)
+    return {"url": url, "lang": lang, "video_id": video_id, "stages": stages, "keys": keys, "pin": owner,
+            "start": start, "cached": start, "artifact": artifact, "transcript_source": source}
+
+
+def _use_transcript(ctx: dict, source: str) -> None:
+    ctx["transcript_source"] = source
+    metrics.incr("pipeline.transcript_source", source)
+
+
+def download_stage(ctx: dict) -> dict:
+    if ctx["start"] <= 1:
+        # Existing captions make both the download and whisper unnecessary.
+        found = captions.fetch_captions(ctx["video_id"])
+        if found:
+            transcript, kind = found
+            ctx["artifact"] = _put_transcript(ctx["keys"][1], transcript)
+            ctx["start"] = 2
+            _use_transcript(ctx, f"captions_{kind}")
+            return ctx
+    # In stream mode the audio never lands on disk; transcribe_stage pulls it directly.
+    if ctx["start"] <= 0 and downloader.MODE != "stream":
+        ctx["artifact"] = artifact_cache.put("download", ctx["keys"][0], downloader.download_audio(ctx["url"]))
+    return ctx
+
+
+def _transcribe_streaming(ctx: dict) -> Transcript:
+    """Transcribe while downloading, publishing the partial transcript as it grows.
+
+    Each segment is appended to storage/partial/<key>.txt, and the text so far
+    is handed to ctx["on_partial"] (the worker stores it on the job) at most
+    every PARTIAL_INTERVAL seconds. The file is removed however the
+    transcription ends.
+    """
+    partial_dir = os.path.join(utils.STORAGE_DIR, "partial")
+    os.makedirs(partial_dir, exist_ok=True)
+    partial_path = os.path.join(partial_dir, ctx["keys"][1] + ".txt")
+    ctx["partial_path"] = partial_path
+    on_partial = ctx.get("on_partial")
+    segments, published, sent, last = [], "", 0, 0.0
+    try:
+        with open(partial_path, "w", encoding="utf-8") as partial:
+            for segment in transcriber.transcribe_stream(downloader.stream_pcm(ctx["url"])):
+                segments.append(segment)
+                partial.write(segment[2] + "\n")
+                partial.flush()
+                now = time.monotonic()
+                if on_partial and now - last >= PARTIAL_INTERVAL:
+                    # Only the segments since the last update are joined onto the running text.
+                    new = "\n".join(s[2] for s in segments[sent:])
+                    published = f"{published}\n{new}" if published else new
+                    sent, last = len(segments), now
+                    on_partial(published)
+    finally:
+        try:
+            os.remove(partial_path)
+        except FileNotFoundError:
+            pass
+    return Transcript.from_segments(segments)
+
+
+def transcribe_stage(ctx: dict) -> dict:
+    if ctx["start"] <= 1:
+        if ctx["artifact"] is None and downloader.MODE == "stream":
+            transcript = _transcribe_streaming(ctx)
+        else:
+            transcript = transcriber.transcribe(ctx["artifact"])
+        _use_transcript(ctx, "whisper")
+        ctx["artifact"] = _put_transcript(ctx["keys"][1], transcript)
+    return ctx
+
+
+def translate_stage(ctx: dict) -> dict:
+    if ctx["start"] <= 2:
+        translated = translator.translate(read_text(ctx["artifact"]), ctx["lang"])
+        ctx["artifact"] = artifact_cache.put_text("translate", ctx["keys"][2], translated)
+    return ctx
+
+
+def podcast_stage(ctx: dict) -> dict:
+    if ctx["start"] <= 3:
+        # Languages synthesised side by side share the TTS workers between them.
+        workers = max(1, podcaster.WORKERS // ctx.get("parallel_languages", 1))
+        podcast_path = podcaster.generate_audio(read_text(ctx["artifact"]), ctx["lang"], workers=workers)
+        ctx["artifact"] = artifact_cache.put("podcast", ctx["keys"][3], podcast_path)
+    return ctx
+
+
+STAGES = ("download", "transcribe", "translate", "podcast")
+STAGE_FUNCS = (download_stage, transcribe_stage, translate_stage, podcast_stage)
+
+
+def plan_languages(url: str, langs: list[str]) -> dict:
+    """Plan one job in several languages: a `plan` per language under ctx["languages"].
+
+    Download and transcription do not depend on the language, so
+    LANGUAGE_STAGE_FUNCS run them once and share the transcript; translation
+    and audio then run per language, LANGUAGE_WORKERS at a time.
+    """
+    return {"url": url, "languages": {lang: plan(url, lang) for lang in dict.fromkeys(langs)},
+            "errors": {}, "on_partial": None, "on_language": None}
+
+
+def _shared(stage_fn):
+    """Run an upstream stage once for every language still missing its output."""
+    def run(multi: dict) -> dict:
+        behind = [ctx for ctx in multi["languages"].values() if ctx["start"] <= 1]
+        if behind:
+            lead = behind[0]
+            lead["on_partial"] = multi["on_partial"]
+            stage_fn(lead)
+            for ctx in behind[1:]:
+                ctx.update(artifact=lead["artifact"], start=lead["start"],
+                           transcript_source=lead["transcript_source"])
+        return multi
+    return run
+
+
+def _per_language(stage_fn, status: str):
+    """Run a stage for every language that has not failed, in parallel.
+
+    A language that fails is recorded in multi["errors"] and left out of the
+    later stages; the job as a whole only fails if every language did.
+    """
+    def run(multi: dict) -> dict:
+        todo = {lang: ctx for lang, ctx in multi["languages"].items() if lang not in multi["errors"]}
+        workers = max(1, min(LANGUAGE_WORKERS, len(todo)))
+        on_language = multi["on_language"] or (lambda lang, status, detail: None)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {}
+            for lang, ctx in todo.items():
+                ctx["parallel_languages"] = workers
+                futures[pool.submit(stage_fn, ctx)] = lang
+            for future in as_completed(futures):
+                lang = futures[future]
+                try:
+                    ctx = future.result()
+                except Exception as e:
+                    traceback.print_exc()
+                    multi["errors"][lang] = f"{type(e).__name__}: {e}"
+                    on_language(lang, "failed", {"error": multi["errors"][lang]})
+                    continue
+                on_language(lang, status, result(ctx) if status == "done" else {})
+        if len(multi["errors"]) == len(multi["languages"]):
+            raise RuntimeError("Every language failed: " + "; ".join(
+                f"{lang}: {error}" for lang, error in multi["errors"].items()))
+        return multi
+    return run
+
+
+LANGUAGE_STAGE_FUNCS = (
+    _shared(download_stage),
+    _shared(transcribe_stage),
+    _per_language(translate_stage, "translated"),
+    _per_language(podcast_stage, "done"),
+)
+
+
+def release(ctx: dict) -> None:
+    """Unpin the artifacts of a finished (or failed) job planned with `plan` or `plan_languages`."""
+    for lang_ctx in ctx["languages"].values() if "languages" in ctx else (ctx,):
+        artifact_cache.release(lang_ctx["pin"])
+
+
+def result(ctx: dict) -> dict:
+    if "languages" in ctx:
+        languages = {}
+        for lang, lang_ctx in ctx["languages"].items():
+            if lang in ctx["errors"]:
+                languages[lang] = {"status": "failed", "error": ctx["errors"][lang]}
+            else:
+                languages[lang] = {"status": "done", **result(lang_ctx)}
+        return {"languages": languages}
+    return {
+        "podcast_path": ctx["artifact"],
+        "cached_stages": ctx["stages"][:ctx["cached"]],
+        "transcript_source": ctx["transcript_source"],
+    }
+
+
+def run_pipeline(url: str, lang: str, on_partial=None) -> dict:
+    """Run every stage not already cached and return the artifact paths.
+
+    `on_partial` is called with the transcript so far while a streaming
+    transcription is in progress.
+    """
+    ctx = plan(url, lang)
+    ctx["on_partial"] = on_partial
+    try:
+        for stage_fn in STAGE_FUNCS:
+            ctx = stage_fn(ctx)
+        return result(ctx)
+    finally:
+        release(ctx)
+
+
+def run_languages(url: str, langs: list[str], on_partial=None, on_language=None) -> dict:
+    """Like `run_pipeline` for several languages, downloading and transcribing once.
+
+    `on_language(lang, status, detail)` is called as each language is
+    translated ("translated"), finished ("done", with its result) or fails
+    ("failed", with the error).
+    """
+    multi = plan_languages(url, langs)
+    multi["on_partial"] = on_partial
+    multi["on_language"] = on_language
+    try:
+        for stage_fn in LANGUAGE_STAGE_FUNCS:
+            multi = stage_fn(multi)
+        return result(multi)
+    finally:
+        release(multi)
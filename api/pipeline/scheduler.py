@@ -0,0 +1,131 @@
+"""Pipelined executor: each stage has its own bounded worker pool.
+
+Stages are connected by bounded queues, so a slow stage pushes back on the
+ones before it instead of letting work pile up in memory. While one job is
+transcribing, the next can download and the previous can wait on the LLM.
+"""
+
+import queue
+import threading
+import time
+import traceback
+from typing import Callable
+
+_STOP = object()
+
+
+class Stage:
+    """One step of the pipeline.
+
+    Args:
+        name (str): Stage name used in stats
+        fn (callable): Takes an item and returns the item for the next stage
+        workers (int): Number of items processed at the same time
+        queue_size (int): Items allowed to wait for this stage (default: workers)
+    """
+
+    def __init__(self, name: str, fn: Callable, workers: int = 1, queue_size: int | None = None):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.inbox: queue.Queue = queue.Queue(maxsize=queue_size or self.workers)
+        self.busy = 0
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.exited = 0
+        self.lock = threading.Lock()
+        self.threads: list[threading.Thread] = []
+
+
+class StagePipeline:
+    """Run items through `stages` in order, each stage on its own pool.
+
+    Args:
+        stages (list[Stage]): Stages in execution order
+        on_done (callable): Called with the item returned by the last stage
+        on_error (callable): Called with (item, exception) when a stage raises;
+            the item does not continue to later stages
+    """
+
+    def __init__(self, stages: list[Stage], on_done: Callable | None = None,
+                 on_error: Callable | None = None):
+        self.stages = stages
+        self.on_done = on_done or (lambda item: None)
+        self.on_error = on_error or (lambda item, exc: traceback.print_exc())
+
+    def start(self) -> "StagePipeline":
+        for index, stage in enumerate(self.stages):
+            for i in range(stage.workers):
+                t = threading.Thread(target=self._run_stage, args=(index,),
+                                     name=f"{stage.name}-{i}", daemon=True)
+                t.start()
+                stage.threads.append(t)
+        return self
+
+    def submit(self, item) -> None:
+        """Queue `item` for the first stage, blocking while that stage is full."""
+        self.stages[0].inbox.put(item)
+
+    def has_capacity(self) -> bool:
+        """True when the first stage can accept an item without blocking."""
+        return not self.stages[0].inbox.full()
+
+    def close(self) -> None:
+        """Stop accepting items; workers exit once everything queued has drained."""
+        for _ in range(self.stages[0].workers):
+            self.stages[0].inbox.put(_STOP)
+
+    def join(self) -> None:
+        for stage in self.stages:
+            for t in stage.threads:
+                t.join()
+
+    def _run_stage(self, index: int) -> None:
+        stage = self.stages[index]
+        next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            item = stage.inbox.get()
+            if item is _STOP:
+                break
+            with stage.lock:
+                stage.busy += 1
+            started = time.monotonic()
+            try:
+                result = stage.fn(item)
+            except Exception as e:
+                with stage.lock:
+                    stage.failed += 1
+                self.on_error(item, e)
+                continue
+            finally:
+                with stage.lock:
+                    stage.busy -= 1
+                    stage.busy_seconds += time.monotonic() - started
+            with stage.lock:
+                stage.processed += 1
+            if next_stage is None:
+                self.on_done(result)
+            else:
+                next_stage.inbox.put(result)
+
+        # The last worker of this stage to exit tells the next stage to stop.
+        with stage.lock:
+            stage.exited += 1
+            last = stage.exited == stage.workers
+        if last and next_stage is not None:
+            for _ in range(next_stage.workers):
+                next_stage.inbox.put(_STOP)
+
+    def stats(self) -> dict:
+        return {
+            stage.name: {
+                "workers": stage.workers,
+                "busy": stage.busy,
+                "queued": stage.inbox.qsize(),
+                "processed": stage.processed,
+                "failed": stage.failed,
+                "busy_seconds": round(stage.busy_seconds, 3),
+            }
+            for stage in self.stages
+        }
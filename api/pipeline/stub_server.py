@@ -0,0 +1,180 @@
+"""Local stand-in for the LLM provider APIs, for exercising the clients offline.
+
+It answers Gemini `generateContent` / `streamGenerateContent` and
+OpenAI-style `/chat/completions` calls (DeepSeek) with canned text, and can
+inject latency and failures:
+
+    $ python -m pipeline.stub_server --port 8765 --latency 0.5 --fail 2 --status 429
+    $ GEMINI_API_BASE=http://127.0.0.1:8765/v1beta GEMINI_API_KEY=x python ...
+
+or in-process:
+
+    server = StubServer(latency=0.2).start()
+    client = GeminiClient(api_base_url=server.url + "/v1beta")
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "StubServer"
+    protocol_version = "HTTP/1.1"  # keep-alive, so clients can reuse connections
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, body: dict, headers: dict | None = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        stub = self.server
+        with stub.lock:
+            stub.requests.append((self.path, payload))
+            failing = stub.fail > 0
+            if failing:
+                stub.fail -= 1
+        if stub.latency:
+            time.sleep(stub.latency)
+        if failing:
+            headers = {"Retry-After": str(stub.retry_after)} if stub.retry_after is not None else None
+            self._send_json(stub.status, {"error": {"code": stub.status, "message": "injected failure"}}, headers)
+            return
+        path = self.path.split("?")[0]
+        # Rough token counts (4 characters each), so usage reporting has numbers to show.
+        reply_tokens = len(stub.reply) // 4
+        if path.endswith(":generateContent") or path.endswith(":streamGenerateContent"):
+            prompt_tokens = len(json.dumps([payload.get("systemInstruction"), payload.get("contents")])) // 4
+            usage = {"promptTokenCount": prompt_tokens, "candidatesTokenCount": reply_tokens}
+            if path.endswith(":generateContent"):
+                self._send_json(200, {
+                    "candidates": [{"content": {"parts": [{"text": stub.reply}], "role": "model"}}],
+                    "usageMetadata": usage,
+                })
+            else:
+                self._send_events(
+                    {"candidates": [{"content": {"parts": [{"text": piece}], "role": "model"}}], "usageMetadata": usage}
+                    for piece in stub.pieces()
+                )
+            return
+        if path.endswith("/chat/completions"):
+            prompt = json.dumps(payload.get("messages", ""))
+            usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": reply_tokens,
+                     "prompt_cache_hit_tokens": stub.prefix_hit_tokens(prompt)}
+            if payload.get("stream"):
+                events = [{"choices": [{"index": 0, "delta": {"content": piece}}]} for piece in stub.pieces()]
+                if payload.get("stream_options", {}).get("include_usage"):
+                    events.append({"choices": [], "usage": usage})
+                self._send_events(events, done=True)
+            else:
+                self._send_json(200, {
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": stub.reply},
+                                 "finish_reason": "stop"}],
+                    "usage": usage,
+                })
+            return
+        self._send_json(404, {"error": {"code": 404, "message": f"no stub for {self.path}"}})
+
+    def _send_events(self, events, done: bool = False) -> None:
+        """Send server-sent events, pausing `stream_delay` between them."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        for event in events:
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(self.server.stream_delay)
+        if done:
+            self.wfile.write(b"data: [DONE]\n\n")
+
+
+class StubServer(ThreadingHTTPServer):
+    """Threaded stand-in server on 127.0.0.1.
+
+    Args:
+        port (int): Port to bind (default: any free port)
+        latency (float): Seconds to wait before answering each request
+        fail (int): Number of requests to fail before answering normally
+        status (int): HTTP status used for injected failures
+        retry_after (float): Retry-After header sent with injected failures
+        reply (str): Text returned as the completion
+        stream_delay (float): Seconds between streamed pieces of the reply
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency: float = 0.0, fail: int = 0, status: int = 503,
+                 retry_after: float | None = None, reply: str = "Alex (curious): Hello!",
+                 stream_delay: float = 0.05, verbose: bool = False):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.fail = fail
+        self.status = status
+        self.retry_after = retry_after
+        self.reply = reply
+        self.stream_delay = stream_delay
+        self.verbose = verbose
+        self.requests: list = []
+        self.seen_prompts: list = []
+        self.lock = threading.Lock()
+
+    def prefix_hit_tokens(self, prompt: str) -> int:
+        """Mimic DeepSeek's prefix cache: the longest prefix shared with an earlier prompt, in 64-token units."""
+        with self.lock:
+            best = max((len(os.path.commonprefix([prompt, seen])) for seen in self.seen_prompts), default=0)
+            self.seen_prompts.append(prompt)
+        return best // 4 // 64 * 64
+
+    def pieces(self) -> list[str]:
+        """The reply split into word-sized pieces for streaming."""
+        words = self.reply.split(" ")
+        return [word + (" " if i < len(words) - 1 else "") for i, word in enumerate(words)]
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "StubServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in LLM API server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--fail", type=int, default=0, help="Fail this many requests first")
+    parser.add_argument("--status", type=int, default=503, help="Status code of injected failures")
+    parser.add_argument("--retry-after", type=float, default=None, help="Retry-After sent with failures")
+    args = parser.parse_args()
+
+    server = StubServer(args.port, args.latency, args.fail, args.status, args.retry_after, verbose=True)
+    print(f"Stub LLM server on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Token budgets: size a request's parts to fit the model's context window.
+
+Token counts are estimated locally from character counts, with a ratio per
+provider's tokenizer, so every request can be sized before it is sent. A
+`Budget` takes the model's context window minus its output limit (or a
+smaller configured input budget), reserves what the instructions need, and
+shares the rest between transcript and comments; whatever one part does not
+use goes to the other. Clients condense a transcript that is over its share
+with map-reduce and trim whatever is still over.
+
+    budget = Budget("deepseek", "deepseek-chat", input_tokens=48000, output_tokens=2048)
+    if budget.over("transcript", INSTRUCTIONS, transcript, comments):
+        transcript, comments = mapreduce.condense(...)
+    transcript, comments = budget.fit(INSTRUCTIONS, transcript, comments)
+"""
+
+import os
+
+from pipeline import metrics
+
+# Characters per token of mostly-ASCII (English) text for each provider's tokenizer.
+CHARS_PER_TOKEN = {"gemini": 4.0, "deepseek": 3.6, "mistral": 3.4}
+# Tokens per character of other scripts (CJK, Cyrillic, Vietnamese diacritics...).
+NON_ASCII_TOKENS = {"gemini": 0.6, "deepseek": 0.7, "mistral": 0.9}
+DEFAULT_CHARS_PER_TOKEN = 4.0
+DEFAULT_NON_ASCII_TOKENS = 1.0
+
+# model -> (context window, maximum output tokens)
+MODELS = {
+    "gemini-1.5-pro": (2_097_152, 8192),
+    "gemini-1.5-flash": (1_048_576, 8192),
+    "deepseek-chat": (65_536, 8192),
+    "mistral-large-latest": (131_072, 8192),
+}
+DEFAULT_MODEL_LIMITS = (32_768, 4096)
+
+# Share of the input budget (after instructions) the transcript gets before comments.
+TRANSCRIPT_SHARE = float(os.getenv("TOKEN_BUDGET_TRANSCRIPT_SHARE", "0.75"))
+# Slack for estimation error and the request's own framing (headings, roles).
+SAFETY_MARGIN = float(os.getenv("TOKEN_BUDGET_MARGIN", "0.05"))
+
+
+def estimate_tokens(text: str, provider: str = "") -> int:
+    """Estimated tokens of `text` with `provider`'s tokenizer, without running it."""
+    non_ascii = len(text) - len(text.encode("ascii", "ignore"))
+    ascii_chars = len(text) - non_ascii
+    return int(
+        ascii_chars / CHARS_PER_TOKEN.get(provider, DEFAULT_CHARS_PER_TOKEN)
+        + non_ascii * NON_ASCII_TOKENS.get(provider, DEFAULT_NON_ASCII_TOKENS)
+    ) + 1
+
+
+def model_limits(model: str) -> tuple[int, int]:
+    """(context window, maximum output tokens) of `model`; accepts "models/..." resource names."""
+    return MODELS.get(model.rsplit("/", 1)[-1], DEFAULT_MODEL_LIMITS)
+
+
+def trim(text: str, max_tokens: int, provider: str = "") -> str:
+    """Cut `text` to about `max_tokens`, at a paragraph, line or word boundary, in that order."""
+    tokens = estimate_tokens(text, provider)
+    if tokens <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    limit = int(len(text) * max_tokens / tokens)
+    for separator in ("\n\n", "\n", " "):
+        # Only back up to a boundary if that keeps most of what fits.
+        cut = text.rfind(separator, 0, limit)
+        if cut > limit // 2:
+            return text[:cut].rstrip()
+    return text[:limit]
+
+
+def record(provider: str, estimated: int, actual: int) -> None:
+    """Count estimated against reported prompt tokens, to keep an eye on the estimator's error."""
+    metrics.incr("token_budget.estimated", provider, estimated)
+    metrics.incr("token_budget.actual", provider, actual)
+
+
+def new_usage(mode: str = "single", usage: dict | None = None) -> dict:
+    """Totals of one generation: mode ("single" or "map_reduce"), calls and token counts.
+
+    A caller's `usage` dict is cleared and filled in place, so each call
+    reports into a record of its own rather than into shared client state.
+    """
+    totals = {} if usage is None else usage
+    totals.clear()
+    totals.update(mode=mode, calls=0, cache_hits=0, prompt_tokens=0,
+                  estimated_prompt_tokens=0, cached_tokens=0, output_tokens=0)
+    return totals
+
+
+class Budget:
+    """Input and output token limits of requests to one model.
+
+    Args:
+        provider (str): "gemini", "deepseek" or "mistral"; picks the estimation ratio
+        model (str): Model name, for its context window and output limit
+        input_tokens (int): Configured input budget (default and maximum: what the context window leaves)
+        output_tokens (int): Output tokens to ask for (capped at the model's maximum)
+        transcript_share (float): Share of the input, after instructions, reserved for the transcript
+    """
+
+    def __init__(self, provider: str, model: str, input_tokens: int | None = None,
+                 output_tokens: int | None = None, transcript_share: float = TRANSCRIPT_SHARE):
+        context, max_output = model_limits(model)
+        self.provider = provider
+        self.output_tokens = min(output_tokens or max_output, max_output)
+        window = int((context - self.output_tokens) * (1 - SAFETY_MARGIN))
+        self.input_tokens = min(input_tokens or window, window)
+        self.transcript_share = transcript_share
+
+    def estimate(self, text: str) -> int:
+        return estimate_tokens(text, self.provider)
+
+    def output_limit(self, requested: int | None = None) -> int:
+        """`requested` output tokens capped at the budget's, which is also the default."""
+        return min(requested or self.output_tokens, self.output_tokens)
+
+    def allocate(self, instructions: str, transcript: str, comments: str) -> dict:
+        """Tokens each part may use, and what each needs.
+
+        The instructions are sent whole. The transcript gets `transcript_share`
+        of what is left and comments the rest, but a part needing less than
+        its share leaves the difference to the other.
+
+        Returns:
+            {"instructions", "transcript", "comments": allowed tokens,
+             "needed": {"instructions", "transcript", "comments": estimated tokens}}
+        """
+        needed = {
+            "instructions": self.estimate(instructions),
+            "transcript": self.estimate(transcript),
+            "comments": self.estimate(comments),
+        }
+        available = max(0, self.input_tokens - needed["instructions"])
+        transcript_tokens = min(
+            needed["transcript"],
+            max(int(available * self.transcript_share), available - needed["comments"]),
+        )
+        return {
+            "instructions": needed["instructions"],
+            "transcript": transcript_tokens,
+            "comments": min(needed["comments"], available - transcript_tokens),
+            "needed": needed,
+        }
+
+    def over(self, part: str, instructions: str, transcript: str, comments: str) -> bool:
+        """Whether `part` ("transcript" or "comments") needs more than it is allowed."""
+        allocation = self.allocate(instructions, transcript, comments)
+        return allocation["needed"][part] > allocation[part]
+
+    def fit(self, instructions: str, transcript: str, comments: str) -> tuple[str, str]:
+        """(transcript, comments), each trimmed to its allocation.
+
+        Comments are cut from the end, which after `reduce_comments` or the
+        map step holds the least representative ones.
+        """
+        allocation = self.allocate(instructions, transcript, comments)
+        for part in ("transcript", "comments"):
+            if allocation["needed"][part] > allocation[part]:
+                print(f"Trimming {part} from ~{allocation['needed'][part]} to {allocation[part]} tokens "
+                      f"to fit the {self.provider} input budget of {self.input_tokens}")
+                metrics.incr("token_budget.trimmed", f"{self.provider}:{part}")
+        return (
+            trim(transcript, allocation["transcript"], self.provider),
+            trim(comments, allocation["comments"], self.provider),
+        )
@@ -1,33 +1,332 @@
-import subprocess
+import atexit
 import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from pipeline import metrics, utils
+from pipeline.transcript import Transcript
 
 WHISPER_CPP_PATH = "/app/whisper.cpp"
 MODEL_NAME = "ggml-base.en.bin"  # or "ggml-base.bin" for multilingual
+# Explicit whisper.cpp -t / -p; left unset, thread_plan picks them per run from the physical cores.
+THREADS_OVERRIDE = int(os.getenv("WHISPER_THREADS", "0"))
+PROCESSORS_OVERRIDE = int(os.getenv("WHISPER_PROCESSORS", "0"))
+THREADS = THREADS_OVERRIDE or 4  # threads per transcription assumed when sizing pools
+# One whisper.cpp processor stops scaling around here; a larger share of cores is split over -p.
+MAX_THREADS = int(os.getenv("WHISPER_MAX_THREADS", "8"))
+# Transcriptions expected at once on this host; the workers raise it to their pool size.
+CONCURRENCY = int(os.getenv("WHISPER_CONCURRENCY", "0"))
+# Audio longer than 1.5x this many seconds is split and transcribed in parallel (0 = off).
+CHUNK_SECONDS = int(os.getenv("WHISPER_CHUNK_SECONDS", "0"))
+CHUNK_OVERLAP = 2.0  # seconds of audio shared by neighbouring chunks
+# "server" keeps warm whisper.cpp servers with the model loaded; "subprocess" runs main per file.
+ENGINE = os.getenv("WHISPER_ENGINE", "server")
+ENGINE_POOL_SIZE = int(os.getenv("WHISPER_ENGINE_POOL", "0")) or max(1, utils.physical_cores() // THREADS)
+
+_engine = None
+_engine_error = None
+_engine_lock = threading.Lock()
+_active = 0
+_active_lock = threading.Lock()
+
+def thread_plan(concurrent: int = 1) -> tuple[int, int]:
+    """(-t, -p) for one of `concurrent` transcriptions sharing this host's physical cores."""
+    if THREADS_OVERRIDE:
+        return THREADS_OVERRIDE, PROCESSORS_OVERRIDE or 1
+    share = max(1, utils.physical_cores() // max(1, concurrent))
+    processors = PROCESSORS_OVERRIDE or max(1, share // MAX_THREADS)
+    return max(1, min(MAX_THREADS, share // processors)), processors
+
+@contextmanager
+def _running():
+    """Count a transcription in progress; yields how many share the host, this one included."""
+    global _active
+    with _active_lock:
+        _active += 1
+        concurrent = max(_active, CONCURRENCY)
+    try:
+        yield concurrent
+    finally:
+        with _active_lock:
+            _active -= 1
 
-def transcribe(audio_path: str, model_dir: str = "./models") -> str:
+def _get_engine(model_path: str):
+    """Start the resident engine on first use; later calls reuse it (or its start-up error)."""
+    global _engine, _engine_error
+    with _engine_lock:
+        if _engine is None and _engine_error is None:
+            try:
+                from pipeline.whisper_engine import WhisperEngine
+                server_bin = os.path.join(WHISPER_CPP_PATH, "server")
+                if not os.path.exists(server_bin):
+                    raise FileNotFoundError(f"whisper.cpp server not found: {server_bin}")
+                threads, _ = thread_plan(ENGINE_POOL_SIZE)
+                _engine = WhisperEngine(server_bin, model_path, ENGINE_POOL_SIZE, threads).start()
+                atexit.register(_engine.close)
+            except Exception as e:
+                _engine_error = e
+        if _engine is None:
+            raise RuntimeError(f"whisper engine unavailable: {_engine_error}")
+        return _engine
+
+def transcribe(audio_path: str, model_dir: str = "./models") -> Transcript:
+    """Transcribe an audio file into timestamped segments."""
     model_path = os.path.join(model_dir, MODEL_NAME)
     
     if not os.path.exists(model_path):
         raise FileNotFoundError(f"Model not found: {model_path}")
-    
-    command = [
-        os.path.join(WHISPER_CPP_PATH, "main"),
-        "-m", model_path,
-        "-f", audio_path,
-        "-otxt",  # Output .txt file
-    ]
 
-    print("Running:", " ".join(command))
-    subprocess.run(command, check=True)
+    if CHUNK_SECONDS and probe_duration(audio_path) > CHUNK_SECONDS * 1.5:
+        return transcribe_chunked(audio_path, model_dir, chunk_seconds=CHUNK_SECONDS)
+
+    with tempfile.TemporaryDirectory(prefix="whisper-") as workdir:
+        wav_path = to_whisper_pcm(audio_path, workdir)
+
+        if ENGINE == "server":
+            try:
+                return Transcript.from_segments(_get_engine(model_path).transcribe_segments(wav_path))
+            except Exception as e:
+                print(f"{e}; falling back to whisper.cpp subprocess")
+
+        return Transcript.from_segments(transcribe_segments(wav_path, model_path))
+
+def is_whisper_pcm(audio_path: str) -> bool:
+    """True if `audio_path` is already the 16 kHz mono 16-bit WAV whisper.cpp reads."""
+    try:
+        with wave.open(audio_path, "rb") as w:
+            return w.getframerate() == 16000 and w.getnchannels() == 1 and w.getsampwidth() == 2
+    except (wave.Error, EOFError, OSError):
+        return False
+
+def to_whisper_pcm(audio_path: str, workdir: str) -> str:
+    """Return `audio_path` if whisper.cpp can read it as is, else a 16 kHz WAV copy in `workdir`."""
+    if is_whisper_pcm(audio_path):
+        return audio_path
+    started = time.monotonic()
+    wav_path = os.path.join(workdir, "input.wav")
+    subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", audio_path,
+         "-ar", "16000", "-ac", "1", "-c:a", "pcm_s16le", wav_path],
+        check=True,
+    )
+    metrics.incr("transcribe.convert_jobs")
+    metrics.incr("transcribe.convert_seconds", amount=time.monotonic() - started)
+    metrics.incr("transcribe.convert_bytes", amount=os.path.getsize(wav_path))
+    return wav_path
+
+def probe_duration(audio_path: str) -> float:
+    """Duration of `audio_path` in seconds, read with ffprobe."""
+    out = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", audio_path],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return float(out.strip())
+
+_SILENCE_RE = re.compile(r"silence_(start|end): (-?[0-9.]+)")
+
+def detect_silences(audio_path: str, noise_db: int = -35, min_silence: float = 0.4) -> list[tuple[float, float]]:
+    """Return (start, end) pairs of the silent stretches ffmpeg finds in `audio_path`."""
+    stderr = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-nostats", "-i", audio_path,
+         "-af", f"silencedetect=noise={noise_db}dB:d={min_silence}", "-f", "null", "-"],
+        check=True, capture_output=True, text=True,
+    ).stderr
+    silences, start = [], None
+    for kind, value in _SILENCE_RE.findall(stderr):
+        if kind == "start":
+            start = max(0.0, float(value))
+        elif start is not None:
+            silences.append((start, float(value)))
+            start = None
+    return silences
+
+def plan_chunks(duration: float, silences: list[tuple[float, float]], chunk_seconds: float) -> list[float]:
+    """Pick cut points near every `chunk_seconds`, snapped to the middle of the closest silence.
+
+    Returns the boundaries [0, cut1, ..., duration].
+    """
+    midpoints = [(start + end) / 2 for start, end in silences]
+    cuts = [0.0]
+    target = chunk_seconds
+    while target < duration - chunk_seconds / 2:
+        # Only snap to silences in the middle half of the window so chunks stay balanced.
+        window = [m for m in midpoints if abs(m - target) <= chunk_seconds / 4 and m > cuts[-1]]
+        cut = min(window, key=lambda m: abs(m - target)) if window else target
+        cuts.append(cut)
+        target = cut + chunk_seconds
+    cuts.append(duration)
+    return cuts
+
+def extract_chunk(audio_path: str, start: float, end: float, dest: str) -> str:
+    """Cut [start, end) out of `audio_path` as the 16 kHz mono WAV whisper.cpp expects."""
+    subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+         "-ss", f"{start:.3f}", "-to", f"{end:.3f}", "-i", audio_path,
+         "-ar", "16000", "-ac", "1", "-c:a", "pcm_s16le", dest],
+        check=True,
+    )
+    return dest
+
+# "[00:01:02.340 --> 00:01:05.120]   text", one line per segment on whisper.cpp's stdout.
+_SEGMENT_LINE = re.compile(r"^\[(\d+):(\d\d):(\d\d)[.,](\d{3}) --> (\d+):(\d\d):(\d\d)[.,](\d{3})\]\s*(.*)$")
+
+def _seconds(hours: str, minutes: str, seconds: str, millis: str) -> float:
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds) + int(millis) / 1000
+
+def parse_segments(stdout: str) -> list[tuple[float, float, str]]:
+    """(start, end, text) segments from whisper.cpp's timestamped stdout."""
+    segments = []
+    for line in stdout.splitlines():
+        match = _SEGMENT_LINE.match(line.strip())
+        if match and match.group(9).strip():
+            groups = match.groups()
+            segments.append((_seconds(*groups[0:4]), _seconds(*groups[4:8]), groups[8].strip()))
+    return segments
+
+def transcribe_segments(wav_path: str, model_path: str, threads: int | None = None,
+                        processors: int | None = None) -> list[tuple[float, float, str]]:
+    """Run whisper.cpp on one WAV file and return (start, end, text) segments in seconds.
+
+    The segments are read from the process's stdout, so nothing is written
+    next to the audio. Without `threads`, -t and -p come from `thread_plan`
+    for the transcriptions running at the time.
+    """
+    with _running() as concurrent:
+        if threads is None:
+            threads, processors = thread_plan(concurrent)
+        stdout = subprocess.run(
+            [os.path.join(WHISPER_CPP_PATH, "main"), "-m", model_path, "-f", wav_path,
+             "-t", str(threads), "-p", str(processors or 1), "-np"],
+            check=True, capture_output=True, text=True, encoding="utf-8", errors="replace",
+        ).stdout
+    return parse_segments(stdout)
+
+def _normalise(text: str) -> str:
+    return re.sub(r"[^a-z0-9 ]", "", text.lower()).strip()
+
+def stitch_segments(chunks: list[tuple[float, float, list]]) -> list[tuple[float, float, str]]:
+    """Merge per-chunk segments into one ordered list with absolute timestamps.
+
+    Each chunk is (offset, core_end, segments): `offset` is where the chunk's
+    audio starts and `core_end` is the cut where the next chunk takes over. A segment
+    centred past core_end is left to the next chunk, one centred inside what was
+    already emitted is dropped, and so is one that repeats the previous segment
+    word for word across the seam.
+    """
+    merged: list[tuple[float, float, str]] = []
+    for offset, core_end, segments in chunks:
+        merged.extend(_stitch_chunk(merged[-1] if merged else None, offset, core_end, segments))
+    return merged
+
+def _stitch_chunk(last, offset: float, core_end: float, segments: list) -> list[tuple[float, float, str]]:
+    """The segments of one chunk that stitch_segments keeps, given the last segment kept so far."""
+    kept = []
+    for start, end, text in segments:
+        start, end = start + offset, end + offset
+        midpoint = (start + end) / 2
+        if midpoint >= core_end or (last and midpoint <= last[1]):
+            continue
+        if last and _normalise(last[2]) == _normalise(text):
+            continue
+        last = (start, end, text)
+        kept.append(last)
+    return kept
+
+def _transcribe_chunk(args: tuple) -> list[tuple[float, float, str]]:
+    audio_path, start, end, model_path, threads, processors, workdir, index = args
+    wav_path = extract_chunk(audio_path, start, end, os.path.join(workdir, f"chunk{index:04d}.wav"))
+    return transcribe_segments(wav_path, model_path, threads, processors)
+
+def transcribe_chunked(audio_path: str, model_dir: str = "./models", chunk_seconds: float = 300,
+                       overlap: float = CHUNK_OVERLAP, workers: int | None = None) -> Transcript:
+    """Transcribe long audio as silence-aligned chunks on a pool of whisper.cpp processes.
+
+    Args:
+        audio_path (str): Audio file in any format ffmpeg can read
+        model_dir (str): Directory holding MODEL_NAME
+        chunk_seconds (float): Target chunk length
+        overlap (float): Seconds of audio added on each side of a chunk so words at a cut are not lost
+        workers (int): Concurrent whisper processes (default: physical cores // THREADS)
+    """
+    model_path = os.path.join(model_dir, MODEL_NAME)
+    duration = probe_duration(audio_path)
+    cuts = plan_chunks(duration, detect_silences(audio_path), chunk_seconds)
+    workers = workers or max(1, utils.physical_cores() // THREADS)
+    threads, processors = thread_plan(max(workers, CONCURRENCY))
+
+    with tempfile.TemporaryDirectory(prefix="chunks-") as workdir:
+        jobs = [
+            (audio_path, max(0.0, cuts[i] - overlap), min(duration, cuts[i + 1] + overlap),
+             model_path, threads, processors, workdir, i)
+            for i in range(len(cuts) - 1)
+        ]
+        print(f"Transcribing {len(jobs)} chunk(s) of {audio_path} on {workers} worker(s)")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_transcribe_chunk, jobs))
+
+    chunks = [(job[1], cuts[i + 1], segments) for i, (job, segments) in enumerate(zip(jobs, results))]
+    return Transcript.from_segments(stitch_segments(chunks))
+
+def _write_pcm_wav(path: str, pcm: bytes) -> str:
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(16000)
+        w.writeframes(pcm)
+    return path
+
+def transcribe_stream(windows, model_dir: str = "./models", overlap: float = CHUNK_OVERLAP):
+    """Transcribe 16 kHz mono s16le windows (e.g. downloader.stream_pcm) as they arrive.
+
+    Yields (start, end, text) segments with timestamps on the stream's timeline.
+    Each window is transcribed as soon as it has arrived, so callers see the
+    first words long before the audio has finished downloading. The tail of
+    each window is replayed at the start of the next so words cut at a window
+    edge are not lost; the last window's tail is flushed when the stream ends.
+    """
+    model_path = os.path.join(model_dir, MODEL_NAME)
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model not found: {model_path}")
+
+    bytes_per_second = 16000 * 2
+    tail_bytes = int(overlap * bytes_per_second) & ~1
+    tail = b""
+    position = 0.0  # stream time where the current window's new audio starts
+    last = None
+    held = None  # (offset, segments) of the latest window, whose tail the next window may replace
 
-    txt_file = os.path.splitext(audio_path)[0] + ".txt"
-    if not os.path.exists(txt_file):
-        raise RuntimeError("Transcription failed: output file not found.")
+    with tempfile.TemporaryDirectory(prefix="stream-") as workdir:
+        wav_path = os.path.join(workdir, "window.wav")
+        for window in windows:
+            offset = position - len(tail) / bytes_per_second
+            position += len(window) / bytes_per_second
+            audio = tail + window
+            tail = audio[-tail_bytes:] if tail_bytes else b""
+            segments = _transcribe_window(_write_pcm_wav(wav_path, audio), model_path)
+            # Words in the tail are left to the next window, which hears them with more context.
+            for segment in _stitch_chunk(last, offset, position - overlap / 2, segments):
+                last = segment
+                yield segment
+            held = (offset, segments)
+        if held is not None:
+            offset, segments = held
+            yield from _stitch_chunk(last, offset, float("inf"), segments)
 
-    with open(txt_file, "r", encoding="utf-8") as f:
-        return f.read()
+def _transcribe_window(wav_path: str, model_path: str) -> list[tuple[float, float, str]]:
+    if ENGINE == "server":
+        try:
+            return _get_engine(model_path).transcribe_segments(wav_path)
+        except Exception as e:
+            print(f"{e}; falling back to whisper.cpp subprocess")
+    return transcribe_segments(wav_path, model_path)
 
 if __name__ == "__main__":
     audio_file = "/home/mafalda/Projects/video2podcast/storage/Funniest Leadership Speech ever!.mp3"  # replace with your file
     result = transcribe(audio_file)
-    print("Transcription result:\n", result)
+    print("Transcription result:\n", result.text())
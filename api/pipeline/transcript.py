@@ -0,0 +1,203 @@
+"""Timestamped transcripts in a compact, memory-mappable form.
+
+A transcript of n segments is three arrays and one buffer: segment start and
+end times in milliseconds (int32), byte offsets of each segment in the text
+(uint32, n + 1 of them) and the UTF-8 text of every segment followed by a
+newline. The text of the whole transcript is therefore the buffer itself,
+and a multi-hour transcript costs a few bytes per segment on top of its text.
+
+Slices share the arrays and the buffer instead of copying them, time ranges
+are found by binary search, and `save` / `load` use a flat file that `load`
+maps into memory, so a stored transcript is never parsed or copied:
+
+    transcript = Transcript.from_segments(transcriber.transcribe_segments(wav, model))
+    transcript.save("talk.v2pt")
+    minute = Transcript.load("talk.v2pt").between(60, 120).text()
+"""
+
+import bisect
+import mmap
+import struct
+import sys
+from array import array
+from typing import Iterable, NamedTuple
+
+from pipeline import token_budget
+
+MAGIC = b"V2PT"
+VERSION = 1
+EXTENSION = ".v2pt"
+# magic, version, segment count, text bytes; then starts, ends, offsets and text, little-endian.
+_HEADER = struct.Struct("<4sIQQ")  # 24 bytes, so the arrays after it stay aligned
+_LITTLE = sys.byteorder == "little"
+
+
+class Segment(NamedTuple):
+    start: float
+    end: float
+    text: str
+
+
+class Transcript:
+    """Segments with start/end times; build one with `from_segments` or `load`.
+
+    Times are seconds in and out, stored as whole milliseconds. Segments are
+    kept in start order, and a segment running past the start of the next one
+    (as rolling captions do) is cut there, so starts and ends are both sorted.
+    """
+
+    def __init__(self, starts: memoryview, ends: memoryview, offsets: memoryview, buffer: memoryview,
+                 _keep=None):
+        self._starts = starts
+        self._ends = ends
+        self._offsets = offsets
+        self._buffer = buffer
+        self._keep = _keep  # the mmap behind a loaded transcript
+
+    @classmethod
+    def from_segments(cls, segments: Iterable[tuple[float, float, str]]) -> "Transcript":
+        """Build a transcript from (start, end, text) tuples in seconds, e.g. whisper's."""
+        rows = sorted(
+            ((round(start * 1000), round(end * 1000), " ".join(text.split())) for start, end, text in segments),
+            key=lambda row: row[0],
+        )
+        rows = [row for row in rows if row[2]]
+        starts, ends, offsets, parts = array("i"), array("i"), array("I", [0]), []
+        for i, (start, end, text) in enumerate(rows):
+            if i + 1 < len(rows):
+                end = min(end, rows[i + 1][0])
+            starts.append(start)
+            ends.append(max(start, end))
+            encoded = text.encode("utf-8") + b"\n"
+            parts.append(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+        return cls(memoryview(starts), memoryview(ends), memoryview(offsets), memoryview(b"".join(parts)))
+
+    @classmethod
+    def from_snippets(cls, snippets) -> "Transcript":
+        """Build a transcript from youtube_transcript_api snippets (`.text`, `.start`, `.duration`)."""
+        return cls.from_segments((s.start, s.start + s.duration, s.text) for s in snippets)
+
+    @classmethod
+    def from_text(cls, text: str) -> "Transcript":
+        """An untimed transcript, one segment per non-blank line, all at time 0."""
+        return cls.from_segments((0, 0, line) for line in text.splitlines())
+
+    # --- access ---------------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __getitem__(self, i: int) -> Segment:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("segment index out of range")
+        return Segment(self._starts[i] / 1000, self._ends[i] / 1000, self._text(i, i + 1).rstrip("\n"))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def _text(self, lo: int, hi: int) -> str:
+        return bytes(self._buffer[self._offsets[lo]:self._offsets[hi]]).decode("utf-8")
+
+    def text(self) -> str:
+        """All segments, one per line (what the pipeline used to pass around as a string)."""
+        return self._text(0, len(self)).rstrip("\n") if len(self) else ""
+
+    @property
+    def start(self) -> float:
+        return self._starts[0] / 1000 if len(self) else 0.0
+
+    @property
+    def end(self) -> float:
+        return self._ends[-1] / 1000 if len(self) else 0.0
+
+    # --- slicing --------------------------------------------------------------------------
+
+    def slice(self, lo: int, hi: int) -> "Transcript":
+        """Segments lo..hi-1, sharing this transcript's memory."""
+        lo, hi, _ = slice(lo, hi).indices(len(self))
+        hi = max(lo, hi)
+        return Transcript(self._starts[lo:hi], self._ends[lo:hi], self._offsets[lo:hi + 1],
+                          self._buffer, self._keep)
+
+    def index_at(self, seconds: float) -> int:
+        """Index of the segment playing at `seconds` (or the next one), in O(log n)."""
+        return bisect.bisect_right(self._ends, round(seconds * 1000))
+
+    def between(self, start: float, end: float) -> "Transcript":
+        """Segments overlapping [start, end) seconds, in O(log n)."""
+        lo = self.index_at(start)
+        hi = bisect.bisect_left(self._starts, round(end * 1000), lo)
+        return self.slice(lo, hi)
+
+    def chunks(self, max_tokens: int, provider: str = "") -> list["Transcript"]:
+        """Consecutive slices of whole segments, each about `max_tokens` at most.
+
+        A segment larger than the budget on its own becomes a chunk by itself.
+        """
+        chunks, lo, tokens = [], 0, 0
+        for i in range(len(self)):
+            size = token_budget.estimate_tokens(self._text(i, i + 1), provider)
+            if i > lo and tokens + size > max_tokens:
+                chunks.append(self.slice(lo, i))
+                lo, tokens = i, 0
+            tokens += size
+        if lo < len(self):
+            chunks.append(self.slice(lo, len(self)))
+        return chunks
+
+    # --- storage --------------------------------------------------------------------------
+
+    def to_bytes(self) -> bytes:
+        base = self._offsets[0] if len(self) else 0
+        offsets = array("I", (offset - base for offset in self._offsets)) if base else array("I", self._offsets)
+        starts, ends = array("i", self._starts), array("i", self._ends)
+        if not _LITTLE:
+            for values in (starts, ends, offsets):
+                values.byteswap()
+        text = self._buffer[base:self._offsets[-1]] if len(self) else b""
+        return b"".join((_HEADER.pack(MAGIC, VERSION, len(self), len(text)),
+                         starts.tobytes(), ends.tobytes(), offsets.tobytes(), bytes(text)))
+
+    def save(self, path: str) -> str:
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+        return path
+
+    @classmethod
+    def from_bytes(cls, data, _keep=None) -> "Transcript":
+        """Read the `to_bytes` format from a bytes-like object without copying it (on little-endian hosts)."""
+        view = memoryview(data)
+        magic, version, count, size = _HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a vid2pod transcript (or an unsupported version)")
+        pos = _HEADER.size
+        arrays = []
+        for typecode, length in (("i", count), ("i", count), ("I", count + 1)):
+            raw = view[pos:pos + 4 * length]
+            if _LITTLE:
+                arrays.append(raw.cast(typecode))
+            else:
+                values = array(typecode, raw.tobytes())
+                values.byteswap()
+                arrays.append(memoryview(values))
+            pos += 4 * length
+        return cls(*arrays, view[pos:pos + size], _keep or data)
+
+    @classmethod
+    def load(cls, path: str) -> "Transcript":
+        """Map a saved transcript into memory; only the pages actually read are loaded."""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls.from_bytes(mapped)
+
+
+def read_text(path: str) -> str:
+    """Text of a transcript artifact: a saved Transcript, or plain text from before they existed."""
+    if path.endswith(EXTENSION):
+        return Transcript.load(path).text()
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
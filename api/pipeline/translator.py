@@ -0,0 +1,359 @@
+"""Transcript translation in sentence-aligned batches, backed by a translation memory.
+
+The transcript is split into sentences, which may run over line breaks; each
+one's translation goes on the line it starts on, so the line structure is
+kept. Every sentence
+already translated into the target language by the same engine comes from
+the translation memory (one SQLite file under storage/), so intros, sponsor
+reads and recurring phrases are translated once, ever. The rest is grouped
+into batches that never split a sentence and sent to the backend
+concurrently; the results go back into the memory.
+
+Backends translate a list of segments into a list of the same length:
+
+- a chat/completions provider (`TRANSLATE_BACKEND=deepseek`, the default, or `mistral`)
+- `TRANSLATE_BACKEND=argos`, a local Argos Translate model (needs the `argostranslate` package)
+"""
+
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from pipeline import chat_client, metrics, token_budget, utils
+from pipeline.async_http import run_sync
+
+BACKEND = os.getenv("TRANSLATE_BACKEND", "deepseek")
+MODEL = os.getenv("TRANSLATE_MODEL") or (
+    chat_client.PROVIDERS[BACKEND][2] if BACKEND in chat_client.PROVIDERS else BACKEND
+)
+# Language the transcripts are in; translating into it is a no-op.
+SOURCE_LANG = os.getenv("TRANSLATE_SOURCE_LANG", "en")
+WORKERS = int(os.getenv("TRANSLATE_WORKERS", "4"))
+BATCH_SEGMENTS = int(os.getenv("TRANSLATE_BATCH_SEGMENTS", "40"))
+BATCH_TOKENS = int(os.getenv("TRANSLATE_BATCH_TOKENS", "1500"))
+# An unpunctuated transcript never ends a sentence; cut one at a line break once it is this long.
+SEGMENT_CHARS = int(os.getenv("TRANSLATE_SEGMENT_CHARS", "400"))
+
+PROMPT = """You translate video transcript segments into {lang}.
+The user sends a JSON object {{"segments": [...]}}. Reply with a JSON object
+{{"translations": [...]}} holding exactly one translation per segment, in the
+same order. Translate faithfully and naturally, keep names and numbers, and
+never merge, split, add or drop segments."""
+
+# A sentence ends at . ! ? … (or CJK 。！？) followed by space and an upper-case letter, digit or quote.
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+(?=[\"'“‘(\[]?[A-Z0-9À-ÖØ-Þ])|(?<=[。！？])")
+_SPACES = re.compile(r"\s+")
+_ENDS_SENTENCE = re.compile(r"[.!?…。！？][\"'”’)\]]*$")
+
+
+def split_sentences(line: str) -> list[str]:
+    return [s for s in (_SPACES.sub(" ", part).strip() for part in _SENTENCE_END.split(line)) if s]
+
+
+def segment(text: str, max_chars: int = SEGMENT_CHARS) -> list[list[str]]:
+    """Sentences of `text`, listed under the line each one starts on.
+
+    Captions and whisper wrap lines mid-sentence, so a sentence runs on over
+    line breaks until it ends, a blank line follows, or it reaches
+    `max_chars`. Lines with no sentence of their own become empty lists.
+    """
+    lines = text.splitlines()
+    result: list[list[str]] = [[] for _ in lines]
+    open_at, pending = None, ""  # line of the unfinished sentence, and its text so far
+
+    def finished(sentence: str) -> bool:
+        return bool(_ENDS_SENTENCE.search(sentence)) or len(sentence) >= max_chars
+
+    for i, line in enumerate(lines):
+        parts = split_sentences(line)
+        if open_at is not None:
+            if parts:
+                pending = f"{pending} {parts.pop(0)}"
+            # A blank line or the start of another sentence on this line ends it too.
+            if not parts and line.strip() and not finished(pending):
+                continue
+            result[open_at].append(pending)
+            open_at = None
+        for j, part in enumerate(parts):
+            if j == len(parts) - 1 and not finished(part):
+                open_at, pending = i, part
+            else:
+                result[i].append(part)
+    if open_at is not None:
+        result[open_at].append(pending)
+    return result
+
+
+def plan_batches(segments: list[str], max_segments: int = BATCH_SEGMENTS, max_tokens: int = BATCH_TOKENS,
+                 provider: str = "") -> list[list[str]]:
+    """Consecutive runs of whole segments, each within `max_segments` and about `max_tokens`."""
+    batches, current, tokens = [], [], 0
+    for text in segments:
+        size = token_budget.estimate_tokens(text, provider)
+        if current and (len(current) >= max_segments or tokens + size > max_tokens):
+            batches.append(current)
+            current, tokens = [], 0
+        current.append(text)
+        tokens += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _same_language(lang: str, source: str) -> bool:
+    return utils.language_code(lang) == utils.language_code(source)
+
+
+class TranslationMemory:
+    """(source segment, target language, engine) -> translation, in `storage/translation_memory.db`.
+
+    Args:
+        path (str): SQLite file (default: $VID2POD_STORAGE/translation_memory.db)
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path or os.path.join(utils.STORAGE_DIR, "translation_memory.db")
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS segments ("
+                " key TEXT PRIMARY KEY,"
+                " lang TEXT NOT NULL,"
+                " engine TEXT NOT NULL,"
+                " source TEXT NOT NULL,"
+                " target TEXT NOT NULL,"
+                " uses INTEGER NOT NULL DEFAULT 0,"
+                " created REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(source: str, lang: str, engine: str) -> str:
+        return utils.stable_hash({"source": source, "lang": lang, "engine": engine})
+
+    def lookup(self, sources: list[str], lang: str, engine: str) -> dict:
+        """Translations of those of `sources` in the memory, as {source: target}."""
+        keys = {self.make_key(source, lang, engine): source for source in sources}
+        found = {}
+        db = self._db()
+        ordered = list(keys)
+        for start in range(0, len(ordered), 500):
+            chunk = ordered[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            rows = db.execute(f"SELECT key, target FROM segments WHERE key IN ({marks})", chunk).fetchall()
+            for key, target in rows:
+                found[keys[key]] = target
+            if rows:
+                db.execute(f"UPDATE segments SET uses = uses + 1 WHERE key IN ({','.join('?' * len(rows))})",
+                           [key for key, _ in rows])
+        return found
+
+    def store(self, pairs: dict, lang: str, engine: str) -> None:
+        now = time.time()
+        db = self._db()
+        db.execute("BEGIN")
+        try:
+            db.executemany(
+                "INSERT OR REPLACE INTO segments (key, lang, engine, source, target, created) VALUES (?, ?, ?, ?, ?, ?)",
+                [(self.make_key(source, lang, engine), lang, engine, source, target, now)
+                 for source, target in pairs.items()],
+            )
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def stats(self) -> dict:
+        """Stored segments per language and the hit rate of lookups so far."""
+        langs = {lang: {"segments": count, "reused": reused} for lang, count, reused in self._db().execute(
+            "SELECT lang, COUNT(*), SUM(uses > 0) FROM segments GROUP BY lang"
+        )}
+        counters = metrics.snapshot("translator.")
+        hits = sum(counters.get("translator.memory_hits", {}).values())
+        misses = sum(counters.get("translator.memory_misses", {}).values())
+        return {"languages": langs, "hits": hits, "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0}
+
+
+class LLMBackend:
+    """Translates through a chat/completions provider (see `chat_client.PROVIDERS`).
+
+    Args:
+        provider (str): "deepseek" or "mistral"
+        model (str): Model name (default: $TRANSLATE_MODEL or the provider's chat model)
+        deadline (float): Seconds a batch may take including retries (default: $<PROVIDER>_DEADLINE or 180)
+    """
+
+    def __init__(self, provider: str = "deepseek", model: str | None = None, deadline: float | None = None):
+        default_base, key_var, default_model = chat_client.PROVIDERS[provider]
+        prefix = provider.upper()
+        self.provider = provider
+        self.api_key = os.getenv(key_var)
+        if not self.api_key:
+            raise ValueError(f"{key_var} not set")
+        self.api_base_url = os.getenv(f"{prefix}_API_BASE", default_base).rstrip("/")
+        self.model = model or default_model
+        self.http = chat_client.shared_http(provider)
+        self.deadline = deadline or float(os.getenv(f"{prefix}_DEADLINE", "180"))
+        # Part of the memory key, so a new model or prompt does not reuse old translations.
+        self.name = f"{provider}:{self.model}:{utils.sha256_text(PROMPT)[:12]}"
+
+    async def translate_batch(self, segments: list[str], lang: str) -> list[str]:
+        data = await self.http.post_json(
+            f"{self.api_base_url}/chat/completions",
+            {
+                "model": self.model,
+                "temperature": 0.2,
+                "response_format": {"type": "json_object"},
+                "messages": [
+                    {"role": "system", "content": PROMPT.format(lang=lang)},
+                    {"role": "user", "content": json.dumps({"segments": segments}, ensure_ascii=False)},
+                ],
+            },
+            deadline=self.deadline,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+        )
+        try:
+            translations = json.loads(data["choices"][0]["message"]["content"])["translations"]
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            raise ValueError(f"Malformed translation reply: {e}")
+        if len(translations) != len(segments) or not all(isinstance(t, str) for t in translations):
+            raise ValueError(f"Expected {len(segments)} translations, got {len(translations)}")
+        return translations
+
+
+class ArgosBackend:
+    """Translates on this machine with Argos Translate; `lang` must be an installed language code."""
+
+    def __init__(self, source: str = SOURCE_LANG):
+        try:
+            from argostranslate import translate as argos
+        except ImportError:
+            raise ValueError("TRANSLATE_BACKEND=argos needs the argostranslate package")
+        self._translate = argos.translate
+        self.source = source
+        self.name = "argos"
+
+    async def translate_batch(self, segments: list[str], lang: str) -> list[str]:
+        return await asyncio.to_thread(lambda: [self._translate(s, self.source, lang) for s in segments])
+
+
+def get_backend(name: str = BACKEND, model: str = MODEL):
+    if name == "argos":
+        return ArgosBackend()
+    if name not in chat_client.PROVIDERS:
+        raise ValueError(f"Unknown translation backend {name!r}; expected argos or one of {sorted(chat_client.PROVIDERS)}")
+    return LLMBackend(name, model)
+
+
+class Translator:
+    """Translates transcripts with `backend`, consulting and filling `memory`.
+
+    Args:
+        backend: Object with a `name` and `async translate_batch(segments, lang)` (default: `get_backend()`)
+        memory (TranslationMemory): Translation memory (default: the shared one)
+        workers (int): Batches in flight at once (default: $TRANSLATE_WORKERS or 4)
+    """
+
+    def __init__(self, backend=None, memory: TranslationMemory | None = None, workers: int | None = None):
+        self.backend = backend or get_backend()
+        self.memory = memory or shared_memory()
+        self.workers = workers or WORKERS
+        self.last_stats = None
+
+    def translate(self, text: str, lang: str) -> str:
+        return run_sync(self.atranslate(text, lang))
+
+    async def atranslate(self, text: str, lang: str) -> str:
+        started = time.monotonic()
+        lines = segment(text)
+        unique = list(dict.fromkeys(s for line in lines for s in line))
+        # SQLite calls block; keep them off the event loop the batches run on.
+        translations = await asyncio.to_thread(self.memory.lookup, unique, lang, self.backend.name)
+        missing = [s for s in unique if s not in translations]
+        missed = set(missing)
+        batches = plan_batches(missing, provider=getattr(self.backend, "provider", ""))
+
+        semaphore = asyncio.Semaphore(self.workers)
+
+        async def run(batch):
+            result = dict(zip(batch, await self._translate_batch(batch, lang, semaphore)))
+            await asyncio.to_thread(self.memory.store, result, lang, self.backend.name)
+            translations.update(result)
+
+        await asyncio.gather(*(run(batch) for batch in batches))
+
+        total = sum(len(line) for line in lines)
+        hits = total - sum(1 for line in lines for s in line if s in missed)
+        elapsed = time.monotonic() - started
+        self.last_stats = {
+            "segments": total, "unique": len(unique), "memory_hits": hits, "translated": len(missing),
+            "batches": len(batches), "hit_rate": hits / total if total else 0.0,
+            "seconds": elapsed, "segments_per_second": total / elapsed if elapsed else 0.0,
+        }
+        metrics.incr("translator.segments", lang, total)
+        metrics.incr("translator.memory_hits", lang, hits)
+        metrics.incr("translator.memory_misses", lang, total - hits)
+        metrics.incr("translator.seconds", lang, elapsed)
+        print(f"Translated {total} segments into {lang}: {hits} from memory ({self.last_stats['hit_rate']:.0%}), "
+              f"{len(missing)} in {len(batches)} batch(es), {self.last_stats['segments_per_second']:.1f} segments/s")
+        return "\n".join(" ".join(translations[s] for s in line) for line in lines)
+
+    async def _translate_batch(self, batch: list[str], lang: str, semaphore: asyncio.Semaphore) -> list[str]:
+        """Translate `batch`, halving it until the replies line up.
+
+        Every backend call takes its own `semaphore` slot, so retries count
+        against the same `workers` limit as first attempts.
+        """
+        try:
+            async with semaphore:
+                return await self.backend.translate_batch(batch, lang)
+        except ValueError:
+            # The model lost count of the segments; smaller batches usually line up again.
+            if len(batch) == 1:
+                raise
+            half = len(batch) // 2
+            metrics.incr("translator.batch_splits", lang)
+            first, second = await asyncio.gather(
+                self._translate_batch(batch[:half], lang, semaphore),
+                self._translate_batch(batch[half:], lang, semaphore),
+            )
+            return first + second
+
+
+_shared_memory = None
+_shared_translator = None
+# Pipeline threads of several languages translate at once; reentrant, as Translator() takes it again.
+_shared_lock = threading.RLock()
+
+
+def shared_memory() -> TranslationMemory:
+    """The translation memory every translator uses unless given its own."""
+    global _shared_memory
+    with _shared_lock:
+        if _shared_memory is None:
+            _shared_memory = TranslationMemory()
+        return _shared_memory
+
+
+def translate(text: str, lang: str) -> str:
+    """Translate a transcript into `lang` with the configured backend (unchanged if already in it)."""
+    global _shared_translator
+    if _same_language(lang, SOURCE_LANG):
+        return text
+    with _shared_lock:
+        if _shared_translator is None:
+            _shared_translator = Translator()
+        translator = _shared_translator
+    return translator.translate(text, lang)
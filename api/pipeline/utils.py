@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+import re
+from urllib.parse import urlparse, parse_qs
+
+STORAGE_DIR = os.getenv("VID2POD_STORAGE", "storage")
+
+_VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+_PATH_PREFIXES = ("shorts", "embed", "live", "v")
+
+# Language names (English and native) accepted besides ISO 639-1 codes.
+LANGUAGE_NAMES = {
+    "english": "en", "german": "de", "deutsch": "de", "spanish": "es", "español": "es",
+    "french": "fr", "français": "fr", "vietnamese": "vi", "tiếng việt": "vi",
+    "italian": "it", "italiano": "it", "portuguese": "pt", "português": "pt", "dutch": "nl",
+    "nederlands": "nl", "polish": "pl", "polski": "pl", "russian": "ru", "ukrainian": "uk",
+    "turkish": "tr", "türkçe": "tr", "swedish": "sv", "svenska": "sv", "estonian": "et",
+    "eesti": "et", "finnish": "fi", "suomi": "fi", "greek": "el", "arabic": "ar", "hindi": "hi",
+    "indonesian": "id", "chinese": "zh", "japanese": "ja", "korean": "ko",
+}
+
+
+def sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def stable_hash(obj) -> str:
+    """Hash any JSON-serialisable object independently of dict ordering."""
+    encoded = json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return sha256_text(encoded)
+
+
+def extract_video_id(url: str) -> str:
+    """Return the YouTube video ID for `url`.
+
+    Accepts watch, youtu.be, shorts and embed URLs as well as bare IDs. When no
+    ID can be parsed, a hash of the URL is returned so callers still get a
+    stable identifier.
+    """
+    parsed = urlparse(url)
+    host = parsed.netloc.lower()
+    candidate = ""
+
+    if host.endswith("youtu.be"):
+        candidate = parsed.path.lstrip("/").split("/")[0]
+    elif "youtube" in host:
+        query = parse_qs(parsed.query)
+        if "v" in query:
+            candidate = query["v"][0]
+        else:
+            parts = [p for p in parsed.path.split("/") if p]
+            if len(parts) >= 2 and parts[0] in _PATH_PREFIXES:
+                candidate = parts[1]
+    elif not parsed.scheme:
+        candidate = url
+
+    if _VIDEO_ID_RE.match(candidate):
+        return candidate
+    return "url-" + sha256_text(url)[:16]
+
+
+def is_youtube_id(video_id: str) -> bool:
+    """True for a real YouTube ID, False for the URL hashes extract_video_id falls back to."""
+    return bool(_VIDEO_ID_RE.match(video_id))
+
+
+def language_code(lang: str) -> str:
+    """ISO 639-1 code of `lang`, given as a code ("vi", "pt-BR", "en_US") or a name in LANGUAGE_NAMES.
+
+    Unknown names come back lower-cased as they are, so they never match a real code by accident.
+    """
+    name = lang.strip().lower()
+    return LANGUAGE_NAMES.get(name) or name.split("-")[0].split("_")[0]
+
+
+def physical_cores() -> int:
+    """Number of physical CPU cores, falling back to logical CPUs when unknown."""
+    cores = set()
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            physical_id = None
+            for line in f:
+                key, _, value = line.partition(":")
+                key = key.strip()
+                if key == "physical id":
+                    physical_id = value.strip()
+                elif key == "core id":
+                    cores.add((physical_id, value.strip()))
+    except OSError:
+        pass
+    return len(cores) or os.cpu_count() or 1
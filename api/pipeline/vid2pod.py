@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 import argparse
 import sys
-from src.mistral_client import MistralAIClient
-from src.gemini_client import GeminiClient
+from pipeline import router
+from pipeline.chat_client import ChatClient
+from pipeline.gemini_client import GeminiClient
+from pipeline.llm_cache import ResponseCache
 
 def read_file(file_path):
     """Read the content of a file."""
@@ -25,14 +27,24 @@ def main():
                         help='Name of the podcast host (default: Alex)')
     parser.add_argument('--guest', type=str, default='Dr. Expert', 
                         help='Name of the guest expert (default: Dr. Expert)')
-    parser.add_argument('--model', '-m', type=str, choices=['mistral', 'gemini'], default='mistral',
-                        help='AI model to use (default: mistral)')
+    parser.add_argument('--model', '-m', type=str, choices=['mistral', 'gemini', 'deepseek', 'auto'], default='mistral',
+                        help='AI model to use; "auto" routes across every configured provider '
+                             'with hedging and failover (default: mistral)')
+    
+    parser.add_argument('--stream', action='store_true',
+                        help='Print the dialogue as it is generated (gemini only)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Ignore cached responses, fresh ones are still stored')
+    parser.add_argument('--cache-sampled', action='store_true',
+                        help='Also cache the final sampled (temperature > 0) generation; map-phase notes are always cached')
     
     # Also allow providing text directly
     parser.add_argument('--transcription-text', type=str, help='Transcription text (alternative to file)')
     parser.add_argument('--comments-text', type=str, help='Comments text (alternative to file)')
     
     args = parser.parse_args()
+    if args.stream and args.model != 'gemini':
+        parser.error('--stream is only supported with --model gemini')
     
     # Get transcription from file or direct input
     if args.transcription:
@@ -55,13 +67,36 @@ def main():
         sys.exit(1)
     
     try:
-        if args.model == 'mistral':
-            client = MistralAIClient()
-        else:  # gemini
-            client = GeminiClient()
+        cache = ResponseCache(bypass=args.no_cache or None, allow_sampled=args.cache_sampled or None)
+        if args.model == 'auto':
+            client = router.from_env()
+            for provider in client.providers.values():
+                provider.cache = cache
+        elif args.model == 'gemini':
+            client = GeminiClient(cache=cache)
+        else:
+            client = ChatClient(args.model, cache=cache)
             
-        dialogue = client.generate_dialogue(transcription, comments, args.host, args.guest, args.language)
-        
+        usage = {}
+        if args.stream:
+            parts = []
+            for delta in client.stream_dialogue(transcription, comments, args.host, args.guest, args.language, usage):
+                print(delta, end='', flush=True)
+                parts.append(delta)
+            print()
+            if 'ttft' in usage:
+                print(f"First token after {usage['ttft']:.2f}s", file=sys.stderr)
+            dialogue = ''.join(parts)
+        else:
+            dialogue = client.generate_dialogue(transcription, comments, args.host, args.guest, args.language, usage)
+        if usage:
+            print(f"{usage['mode']}: {usage['calls']} call(s) + {usage['cache_hits']} cached in {usage['seconds']:.1f}s, "
+                  f"{usage['prompt_tokens']} prompt (~{usage['estimated_prompt_tokens']} estimated, {usage['cached_tokens']} cached) + "
+                  f"{usage['output_tokens']} output tokens", file=sys.stderr)
+
+        if args.model == 'auto':
+            print(f"Answered by {usage['provider']}", file=sys.stderr)
+
         if args.output:
             with open(args.output, 'w', encoding='utf-8') as file:
                 file.write(dialogue)
@@ -0,0 +1,166 @@
+"""Resident whisper.cpp engine: a small pool of warm `server` processes.
+
+Each server loads the model once at start-up and then serves every
+transcription sent to it over HTTP on localhost, so short clips no longer pay
+the model load on every job. Unhealthy servers are restarted automatically.
+"""
+
+import os
+import queue
+import socket
+import subprocess
+import threading
+import time
+
+import requests
+
+HEALTH_INTERVAL = 15  # seconds between health checks of idle servers
+STARTUP_TIMEOUT = 120
+REQUEST_TIMEOUT = 1800
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class WhisperServer:
+    """One whisper.cpp `server` process bound to a local port."""
+
+    def __init__(self, server_bin: str, model_path: str, threads: int):
+        self.server_bin = server_bin
+        self.model_path = model_path
+        self.threads = threads
+        self.port = None
+        self.process: subprocess.Popen | None = None
+        self.session = requests.Session()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> None:
+        self.port = _free_port()
+        self.process = subprocess.Popen(
+            [self.server_bin, "-m", self.model_path, "--host", "127.0.0.1", "--port", str(self.port),
+             "-t", str(self.threads)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while not self.healthy():
+            if self.process.poll() is not None:
+                raise RuntimeError(f"whisper server exited with code {self.process.returncode}")
+            if time.monotonic() > deadline:
+                self.stop()
+                raise RuntimeError("whisper server did not become ready in time")
+            time.sleep(0.5)
+
+    def stop(self) -> None:
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+
+    def restart(self) -> None:
+        print(f"Restarting whisper server on port {self.port}")
+        self.stop()
+        self.start()
+
+    def healthy(self) -> bool:
+        if self.process is None or self.process.poll() is not None:
+            return False
+        try:
+            return self.session.get(self.base_url, timeout=2).ok
+        except requests.RequestException:
+            return False
+
+    def transcribe(self, audio_path: str) -> str:
+        """Transcribe a 16 kHz mono WAV file."""
+        with open(audio_path, "rb") as f:
+            resp = self.session.post(
+                f"{self.base_url}/inference",
+                files={"file": (os.path.basename(audio_path), f)},
+                data={"response_format": "json", "temperature": "0.0"},
+                timeout=REQUEST_TIMEOUT,
+            )
+        resp.raise_for_status()
+        return resp.json()["text"]
+
+    def transcribe_segments(self, audio_path: str) -> list[tuple[float, float, str]]:
+        """Transcribe a 16 kHz mono WAV file into (start, end, text) segments in seconds."""
+        with open(audio_path, "rb") as f:
+            resp = self.session.post(
+                f"{self.base_url}/inference",
+                files={"file": (os.path.basename(audio_path), f)},
+                data={"response_format": "verbose_json", "temperature": "0.0"},
+                timeout=REQUEST_TIMEOUT,
+            )
+        resp.raise_for_status()
+        return [
+            (seg["start"], seg["end"], seg["text"].strip())
+            for seg in resp.json().get("segments", [])
+            if seg["text"].strip()
+        ]
+
+
+class WhisperEngine:
+    """A pool of warm whisper servers; `transcribe` blocks until one is free."""
+
+    def __init__(self, server_bin: str, model_path: str, size: int = 1, threads: int = 4):
+        self.servers = [WhisperServer(server_bin, model_path, threads) for _ in range(max(1, size))]
+        self._idle: queue.Queue = queue.Queue()
+        self._stop = threading.Event()
+        self._monitor: threading.Thread | None = None
+
+    def start(self) -> "WhisperEngine":
+        for server in self.servers:
+            server.start()
+            self._idle.put(server)
+        self._monitor = threading.Thread(target=self._watch, daemon=True)
+        self._monitor.start()
+        return self
+
+    def close(self) -> None:
+        self._stop.set()
+        for server in self.servers:
+            server.stop()
+
+    def _watch(self) -> None:
+        """Health-check idle servers and restart the ones that died."""
+        while not self._stop.wait(HEALTH_INTERVAL):
+            for _ in range(self._idle.qsize()):
+                try:
+                    server = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    if not server.healthy():
+                        server.restart()
+                except RuntimeError as e:
+                    print(f"Whisper server restart failed: {e}")
+                finally:
+                    self._idle.put(server)
+
+    def _call(self, method: str, audio_path: str):
+        server = self._idle.get()
+        try:
+            if not server.healthy():
+                server.restart()
+            try:
+                return getattr(server, method)(audio_path)
+            except requests.ConnectionError:
+                # The server died mid-request; give it one more go on a fresh process.
+                server.restart()
+                return getattr(server, method)(audio_path)
+        finally:
+            self._idle.put(server)
+
+    def transcribe(self, audio_path: str) -> str:
+        return self._call("transcribe", audio_path)
+
+    def transcribe_segments(self, audio_path: str) -> list[tuple[float, float, str]]:
+        return self._call("transcribe_segments", audio_path)
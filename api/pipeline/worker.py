@@ -0,0 +1,222 @@
+"""Worker process that pulls jobs from the queue and runs the pipeline.
+
+Start as many of these as the host (or cluster) can take:
+
+    $ python -m pipeline.worker --concurrency 2
+
+With --pipelined each stage gets its own pool instead, so one job can
+download while another transcribes and a third waits on the LLM:
+
+    $ python -m pipeline.worker --pipelined --download-workers 2 --llm-workers 4
+"""
+
+import argparse
+import os
+import socket
+import threading
+import time
+import traceback
+
+from pipeline import jobs, runner, transcriber, utils
+from pipeline.runner import run_languages, run_pipeline
+from pipeline.scheduler import Stage, StagePipeline
+
+HEARTBEAT_SECONDS = 30
+
+
+def _heartbeat(queue: jobs.JobQueue, job_id: str, stop: threading.Event) -> None:
+    while not stop.wait(HEARTBEAT_SECONDS):
+        queue.heartbeat(job_id)
+
+
+class _Progress:
+    """Progress stored on a running job: the partial transcript and the state of each language.
+
+    The runner already limits partial transcripts to one every
+    `runner.PARTIAL_INTERVAL` seconds, so every update is stored straight away.
+    """
+
+    def __init__(self, queue: jobs.JobQueue, job_id: str, languages: list[str] | None = None):
+        self.queue = queue
+        self.job_id = job_id
+        self.state: dict = {}
+        if languages:
+            self.state["languages"] = {lang: {"status": "queued"} for lang in languages}
+        self.lock = threading.Lock()
+
+    def partial(self, partial_transcript: str) -> None:
+        with self.lock:
+            self.state["partial_transcript"] = partial_transcript
+            self.queue.update(self.job_id, self.state)
+
+    def language(self, lang: str, status: str, detail: dict) -> None:
+        with self.lock:
+            self.state.setdefault("languages", {})[lang] = {"status": status, **detail}
+            self.queue.update(self.job_id, self.state)
+
+
+def _languages(payload: dict) -> list[str] | None:
+    """Target languages of a multi-language job, None for a single-language one."""
+    return payload.get("target_langs")
+
+
+def _plan(payload: dict) -> dict:
+    langs = _languages(payload)
+    return runner.plan_languages(payload["url"], langs) if langs else runner.plan(payload["url"], payload["target_lang"])
+
+
+def run_job(queue: jobs.JobQueue, job: dict) -> None:
+    stop = threading.Event()
+    beat = threading.Thread(target=_heartbeat, args=(queue, job["id"], stop), daemon=True)
+    beat.start()
+    try:
+        payload = job["payload"]
+        langs = _languages(payload)
+        progress = _Progress(queue, job["id"], langs)
+        if langs:
+            result = run_languages(payload["url"], langs, on_partial=progress.partial, on_language=progress.language)
+        else:
+            result = run_pipeline(payload["url"], payload["target_lang"], on_partial=progress.partial)
+        queue.complete(job["id"], result)
+        print(f"✔ Job {job['id']} done")
+    except Exception as e:
+        traceback.print_exc()
+        queue.fail(job["id"], f"{type(e).__name__}: {e}")
+    finally:
+        stop.set()
+
+
+def work(worker_id: str, poll_interval: float, stop: threading.Event, queue_url: str | None = None) -> None:
+    queue = jobs.get_queue(queue_url)
+    while not stop.is_set():
+        job = queue.claim(worker_id)
+        if job is None:
+            stop.wait(poll_interval)
+            continue
+        run_job(queue, job)
+
+
+def default_pool_sizes() -> dict:
+    """Stage pool sizes for this host; whisper gets one slot per THREADS physical cores."""
+    return {
+        "download": 2,
+        "transcribe": max(1, utils.physical_cores() // transcriber.THREADS),
+        "translate": 4,
+        "podcast": 1,
+    }
+
+
+def _job_stage(queue: jobs.JobQueue, index: int):
+    def run(item):
+        job, ctx = item
+        if ctx is None:
+            payload = job["payload"]
+            ctx = _plan(payload)
+            progress = _Progress(queue, job["id"], _languages(payload))
+            ctx["on_partial"] = progress.partial
+            if "languages" in ctx:
+                ctx["on_language"] = progress.language
+        funcs = runner.LANGUAGE_STAGE_FUNCS if "languages" in ctx else runner.STAGE_FUNCS
+        try:
+            return job, funcs[index](ctx)
+        except BaseException:
+            # on_error only sees the item this stage was given, which has no ctx yet for the first stage.
+            runner.release(ctx)
+            raise
+    return run
+
+
+def work_pipelined(worker_id: str, sizes: dict, poll_interval: float, stop: threading.Event,
+                   queue_url: str | None = None) -> None:
+    queue = jobs.get_queue(queue_url)
+    in_flight: dict = {}
+
+    def on_done(item):
+        job, ctx = item
+        runner.release(ctx)
+        queue.complete(job["id"], runner.result(ctx))
+        in_flight.pop(job["id"], None)
+        print(f"✔ Job {job['id']} done")
+
+    def on_error(item, exc):
+        job, _ = item
+        traceback.print_exception(exc)
+        queue.fail(job["id"], f"{type(exc).__name__}: {exc}")
+        in_flight.pop(job["id"], None)
+
+    stages = [
+        Stage(name, _job_stage(queue, index), workers=sizes[name])
+        for index, name in enumerate(runner.STAGES)
+    ]
+    pipeline = StagePipeline(stages, on_done=on_done, on_error=on_error).start()
+
+    def heartbeat():
+        while not stop.wait(HEARTBEAT_SECONDS):
+            for job_id in list(in_flight):
+                queue.heartbeat(job_id)
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+
+    while not stop.is_set():
+        if not pipeline.has_capacity():
+            stop.wait(0.2)
+            continue
+        job = queue.claim(worker_id)
+        if job is None:
+            stop.wait(poll_interval)
+            continue
+        in_flight[job["id"]] = job
+        pipeline.submit((job, None))
+
+    pipeline.close()
+    pipeline.join()
+    print("Stage stats:", pipeline.stats())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run pipeline jobs from the vid2pod queue")
+    parser.add_argument("--concurrency", "-c", type=int, default=1,
+                        help="Jobs to run at the same time in this process (default: 1)")
+    parser.add_argument("--poll-interval", type=float, default=1.0,
+                        help="Seconds to wait when the queue is empty (default: 1.0)")
+    parser.add_argument("--queue-url", type=str, default=None,
+                        help="Queue URL (default: $VID2POD_QUEUE_URL or SQLite under storage/)")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="Run stages on separate pools connected by bounded queues")
+    defaults = default_pool_sizes()
+    for stage, flag in (("download", "download"), ("transcribe", "whisper"),
+                        ("translate", "llm"), ("podcast", "tts")):
+        parser.add_argument(f"--{flag}-workers", dest=f"{stage}_workers", type=int, default=defaults[stage],
+                            help=f"Pool size of the {stage} stage with --pipelined (default: %(default)s)")
+    args = parser.parse_args()
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    stop = threading.Event()
+    if args.pipelined:
+        sizes = {stage: getattr(args, f"{stage}_workers") for stage in runner.STAGES}
+        # whisper.cpp threads are split between the transcriptions this process may run at once.
+        transcriber.CONCURRENCY = max(transcriber.CONCURRENCY, sizes["transcribe"])
+        threads = [threading.Thread(target=work_pipelined,
+                                    args=(worker_id, sizes, args.poll_interval, stop, args.queue_url))]
+        print(f"Worker {worker_id} started with stage pools {sizes}")
+    else:
+        transcriber.CONCURRENCY = max(transcriber.CONCURRENCY, args.concurrency)
+        threads = [
+            threading.Thread(target=work, args=(f"{worker_id}:{i}", args.poll_interval, stop, args.queue_url))
+            for i in range(args.concurrency)
+        ]
+        print(f"Worker {worker_id} started with {args.concurrency} slot(s)")
+    for t in threads:
+        t.start()
+    try:
+        while any(t.is_alive() for t in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Stopping after the running jobs finish…")
+        stop.set()
+        for t in threads:
+            t.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# Storage paths are read when the pipeline modules are imported, so point them at a scratch directory first.
+os.environ.setdefault("VID2POD_STORAGE", tempfile.mkdtemp(prefix="vid2pod-tests-"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
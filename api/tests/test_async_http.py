@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+import pytest
+
+from pipeline.async_http import APIError, AsyncHTTPClient
+from pipeline.stub_server import StubServer
+
+PATH = "/chat/completions"
+PAYLOAD = {"messages": [{"role": "user", "content": "hi"}]}
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**kwargs):
+        server = StubServer(**kwargs).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def post(server, client, **kwargs):
+    async def call():
+        try:
+            return await client.post_json(server.url + PATH, PAYLOAD, **kwargs)
+        finally:
+            await client.aclose()
+
+    return asyncio.run(call())
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_retries_transient_statuses(stub, status):
+    server = stub(fail=2, status=status)
+    body = post(server, AsyncHTTPClient(retries=4, backoff_base=0.01))
+    assert body["choices"][0]["message"]["content"] == server.reply
+    assert len(server.requests) == 3
+
+
+def test_does_not_retry_client_errors(stub):
+    server = stub(fail=1, status=400)
+    with pytest.raises(APIError) as error:
+        post(server, AsyncHTTPClient(retries=4, backoff_base=0.01))
+    assert error.value.status_code == 400
+    assert len(server.requests) == 1
+
+
+def test_honours_retry_after(stub):
+    server = stub(fail=1, status=429, retry_after=0.5)
+    started = time.monotonic()
+    post(server, AsyncHTTPClient(retries=1, backoff_base=0))
+    assert time.monotonic() - started >= 0.5
+    assert len(server.requests) == 2
+
+
+def test_gives_up_after_the_retry_limit(stub):
+    server = stub(fail=10, status=503)
+    with pytest.raises(APIError) as error:
+        post(server, AsyncHTTPClient(retries=2, backoff_base=0.01))
+    assert error.value.status_code == 503
+    assert len(server.requests) == 3
+
+
+def test_attempt_timeout_is_retried_then_raised(stub):
+    server = stub(latency=0.5)
+    with pytest.raises(APIError) as error:
+        post(server, AsyncHTTPClient(timeout=0.1, retries=1, backoff_base=0.01))
+    assert error.value.status_code is None
+    assert "Timeout" in str(error.value)
+    assert len(server.requests) == 2
+
+
+def test_deadline_covers_every_retry(stub):
+    server = stub(fail=10, status=503, retry_after=0.3)
+    started = time.monotonic()
+    with pytest.raises(APIError, match="deadline"):
+        post(server, AsyncHTTPClient(retries=10), deadline=0.5)
+    assert time.monotonic() - started < 0.5
+    assert len(server.requests) == 2
@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+from pipeline import runner
+from pipeline.cache import ArtifactCache
+
+
+def put(cache, tmp_path, stage, key, size=10):
+    path = tmp_path / f"{stage}-{key}.bin"
+    path.write_bytes(b"x" * size)
+    return cache.put(stage, key, str(path))
+
+
+def test_caches_keep_their_counters_apart(tmp_path):
+    artifacts = ArtifactCache(str(tmp_path / "artifacts"), metric_prefix="test_artifacts")
+    segments = ArtifactCache(str(tmp_path / "segments"), max_bytes=0, metric_prefix="test_segments")
+    put(artifacts, tmp_path, "download", "a")
+    artifacts.get("download", "a")
+    put(segments, tmp_path, "segment", "s")
+    segments.get("segment", "missing")
+    segments.evict()
+
+    assert set(artifacts.stats()["stages"]) == {"download"}
+    assert artifacts.stats()["stages"]["download"]["hits"] == 1
+    stage = segments.stats()["stages"]["segment"]
+    assert (stage["misses"], stage["evictions"]) == (1, 1)
+
+
+def test_importing_podcaster_writes_nothing(tmp_path):
+    api_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, VID2POD_STORAGE=str(tmp_path / "storage"), PYTHONPATH=os.pathsep.join(sys.path))
+    subprocess.run([sys.executable, "-c", "import pipeline.podcaster"], cwd=api_dir, env=env, check=True)
+    assert not (tmp_path / "storage" / "tts").exists()
+
+
+def test_podcast_key_covers_rendering_settings(monkeypatch):
+    before = runner.stage_params("en")[-1]
+    monkeypatch.setattr(runner.podcaster, "PAUSE_SECONDS", 0.5)
+    assert runner.stage_params("en")[-1] != before
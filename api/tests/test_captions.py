@@ -0,0 +1,29 @@
+import pytest
+import requests
+
+from pipeline import captions
+
+
+class FailingApi:
+    calls = 0
+
+    def list(self, video_id):
+        FailingApi.calls += 1
+        raise requests.ConnectionError("network down")
+
+
+@pytest.fixture
+def api(monkeypatch):
+    FailingApi.calls = 0
+    monkeypatch.setattr(captions, "YouTubeTranscriptApi", FailingApi)
+    return FailingApi
+
+
+def test_network_error_falls_back_to_whisper(api):
+    assert captions.fetch_captions("dQw4w9WgXcQ", policy="auto") is None
+    assert api.calls == 1
+
+
+def test_non_youtube_ids_are_not_looked_up(api):
+    assert captions.fetch_captions("url-0123456789abcdef", policy="auto") is None
+    assert api.calls == 0
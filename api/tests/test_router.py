@@ -0,0 +1,153 @@
+import asyncio
+import sys
+import time
+
+import pytest
+
+from pipeline import router, vid2pod
+from pipeline.async_http import APIError, AsyncHTTPClient
+from pipeline.chat_client import ChatClient
+from pipeline.llm_cache import ResponseCache
+from pipeline.stub_server import StubServer
+
+
+class FakeProvider:
+    """Answers after `delay` seconds, or raises `error`."""
+
+    def __init__(self, reply, delay=0.0, error=None):
+        self.reply = reply
+        self.delay = delay
+        self.error = error
+        self.started = None
+        self.cancelled = False
+
+    async def agenerate_dialogue(self, transcription, comments, host_name, guest_name, language, usage=None):
+        self.started = time.monotonic()
+        usage["calls"] = 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        usage["reply"] = self.reply
+        return self.reply
+
+
+@pytest.fixture(autouse=True)
+def quick_hedge(monkeypatch):
+    monkeypatch.setattr(router, "DEFAULT_HEDGE_AFTER", 0.1)
+
+
+def generate(providers, usage=None, **kwargs):
+    routed = router.Router(providers, **kwargs)
+    return routed, asyncio.run(routed.agenerate_dialogue("transcript", "comments", usage=usage))
+
+
+def test_fast_first_provider_is_not_hedged():
+    first, second = FakeProvider("first"), FakeProvider("second")
+    usage = {}
+    _, dialogue = generate({"a": first, "b": second}, usage)
+    assert dialogue == "first"
+    assert second.started is None
+    assert usage == {"calls": 1, "reply": "first", "provider": "a"}
+
+
+def test_hedge_fires_after_the_delay_and_the_faster_answer_wins():
+    slow, fast = FakeProvider("slow", delay=1.0), FakeProvider("fast", delay=0.05)
+    started = time.monotonic()
+    usage = {}
+    routed, dialogue = generate({"a": slow, "b": fast}, usage)
+    assert dialogue == "fast"
+    # Only the winner's usage is reported, not the cancelled call's.
+    assert usage == {"calls": 1, "reply": "fast", "provider": "b"}
+    assert fast.started - started >= 0.1
+    assert slow.cancelled
+    # A cancelled hedge loser is neither a latency sample nor an error.
+    assert not routed.stats["a"].outcomes
+
+
+def test_first_answer_wins_even_after_hedging():
+    first, hedge = FakeProvider("first", delay=0.2), FakeProvider("hedge", delay=1.0)
+    routed, dialogue = generate({"a": first, "b": hedge})
+    assert dialogue == "first"
+    assert hedge.started is not None and hedge.cancelled
+
+
+def test_no_hedge_when_disabled():
+    slow, other = FakeProvider("slow", delay=0.2), FakeProvider("other")
+    _, dialogue = generate({"a": slow, "b": other}, hedge=False)
+    assert dialogue == "slow"
+    assert other.started is None
+
+
+@pytest.mark.parametrize("error", [APIError(429, "rate limited"), APIError(503, "unavailable"),
+                                   APIError(None, "ReadTimeout"), asyncio.TimeoutError()])
+def test_fails_over_on_retryable_errors(error):
+    broken, backup = FakeProvider("", error=error), FakeProvider("backup")
+    routed, dialogue = generate({"a": broken, "b": backup})
+    assert dialogue == "backup"
+    assert routed.stats["a"].error_rate == 1.0
+    assert routed.ranked() == ["b", "a"]
+
+
+def test_client_errors_are_not_failed_over():
+    broken, backup = FakeProvider("", error=APIError(400, "bad request")), FakeProvider("backup")
+    with pytest.raises(APIError):
+        generate({"a": broken, "b": backup})
+    assert backup.started is None
+
+
+def test_raises_the_last_error_when_every_provider_fails():
+    providers = {"a": FakeProvider("", error=APIError(503, "a down")),
+                 "b": FakeProvider("", error=APIError(502, "b down"))}
+    with pytest.raises(APIError, match="b down"):
+        generate(providers)
+
+
+def test_concurrent_client_calls_report_their_own_usage(tmp_path, monkeypatch):
+    server = StubServer(latency=0.1).start()
+    monkeypatch.setenv("DEEPSEEK_APIKEY", "test")
+    client = ChatClient("deepseek", api_base_url=server.url, http=AsyncHTTPClient(),
+                        cache=ResponseCache(str(tmp_path / "llm.db")))
+
+    async def both(first, second):
+        await asyncio.gather(client.agenerate_dialogue("One talk.", "Nice!", usage=first),
+                             client.agenerate_dialogue("Another talk.", "Cool!", usage=second))
+
+    first, second = {}, {}
+    try:
+        asyncio.run(both(first, second))
+    finally:
+        server.stop()
+    assert first["calls"] == second["calls"] == 1
+    assert first["prompt_tokens"] != second["prompt_tokens"]
+
+
+def run_cli(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["vid2pod", "--transcription-text", "A talk.", "--comments-text", "Nice!",
+                                      "--no-cache", *args])
+    vid2pod.main()
+
+
+@pytest.mark.parametrize("model", ["auto", "deepseek", "mistral"])
+def test_cli_rejects_stream_for_other_backends(monkeypatch, capsys, model):
+    with pytest.raises(SystemExit) as exit:
+        run_cli(monkeypatch, "--model", model, "--stream")
+    assert exit.value.code == 2
+    assert "--stream is only supported with --model gemini" in capsys.readouterr().err
+
+
+def test_cli_streams_gemini(monkeypatch, capsys):
+    server = StubServer(reply="Alex (curious): Hello there, listeners!", stream_delay=0).start()
+    try:
+        monkeypatch.setenv("GEMINI_API_KEY", "test")
+        monkeypatch.setenv("GEMINI_API_BASE", server.url + "/v1beta")
+        run_cli(monkeypatch, "--model", "gemini", "--stream")
+    finally:
+        server.stop()
+    out = capsys.readouterr()
+    assert out.out.startswith("Alex (curious): Hello there, listeners!\n")
+    assert "First token after" in out.err
+    assert server.requests[0][0].endswith(":streamGenerateContent?alt=sse")
@@ -0,0 +1,46 @@
+import wave
+
+from pipeline import transcriber
+
+SECOND = 16000 * 2  # bytes of 16 kHz mono s16le audio
+
+
+def fake_window_transcriber(monkeypatch, calls):
+    # Each window says one word per second of audio it holds.
+    def transcribe_window(wav_path, model_path):
+        with wave.open(wav_path) as w:
+            seconds = w.getnframes() // 16000
+        calls.append(seconds)
+        return [(i, i + 1.0, f"w{len(calls)}.{i}") for i in range(seconds)]
+
+    monkeypatch.setattr(transcriber, "_transcribe_window", transcribe_window)
+
+
+def test_windows_are_transcribed_as_they_arrive(tmp_path, monkeypatch):
+    (tmp_path / transcriber.MODEL_NAME).touch()
+    calls = []
+    fake_window_transcriber(monkeypatch, calls)
+
+    def windows():
+        yield b"\0" * 4 * SECOND
+        # The first window must not wait for the second one.
+        assert calls == [4]
+        yield b"\0" * 4 * SECOND
+
+    stream = transcriber.transcribe_stream(windows(), str(tmp_path), overlap=2.0)
+    first = next(stream)
+    assert first == (0.0, 1.0, "w1.0")
+    segments = [first] + list(stream)
+
+    starts = [start for start, _, _ in segments]
+    assert starts == sorted(starts)
+    assert starts == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0]
+
+
+def test_tail_of_last_window_is_flushed(tmp_path, monkeypatch):
+    (tmp_path / transcriber.MODEL_NAME).touch()
+    fake_window_transcriber(monkeypatch, [])
+
+    segments = list(transcriber.transcribe_stream([b"\0" * 3 * SECOND], str(tmp_path), overlap=2.0))
+
+    assert [text for _, _, text in segments] == ["w1.0", "w1.1", "w1.2"]
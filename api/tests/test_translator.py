@@ -0,0 +1,75 @@
+import asyncio
+import threading
+
+from pipeline import translator, utils
+from pipeline.translator import TranslationMemory, Translator, segment
+
+
+class UpperBackend:
+    name = "upper"
+
+    def __init__(self):
+        self.batches = []
+
+    async def translate_batch(self, segments, lang):
+        self.batches.append(segments)
+        return [s.upper() for s in segments]
+
+
+def test_sentences_run_over_line_breaks():
+    text = "so today we talk about\nthe thing. And then\nwe go home.\n\nA new paragraph"
+    assert segment(text) == [
+        ["so today we talk about the thing."],
+        ["And then we go home."],
+        [],
+        [],
+        ["A new paragraph"],
+    ]
+
+
+def test_blank_lines_and_the_length_cap_end_a_sentence():
+    assert segment("no full stop\n\nhere either") == [["no full stop"], [], ["here either"]]
+    assert segment("a b c\nd e f\ng h i", max_chars=8) == [["a b c d e f"], [], ["g h i"]]
+
+
+def test_language_names_and_codes_are_compared_by_iso_code():
+    assert utils.language_code("Estonian") == "et"
+    assert not translator._same_language("Estonian", "es")
+    assert translator._same_language("es-MX", "spanish")
+    assert translator._same_language("en_US", "English")
+    assert not translator._same_language("esperanto-ish", "es")
+
+
+def test_translation_keeps_lines_and_fills_the_memory(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "memory.db"))
+    backend = UpperBackend()
+    text = "so today we talk about\nthe thing. Thanks\nfor watching."
+
+    result = asyncio.run(Translator(backend, memory).atranslate(text, "xx"))
+    assert result == "SO TODAY WE TALK ABOUT THE THING.\nTHANKS FOR WATCHING.\n"
+
+    again = Translator(backend, memory)
+    assert asyncio.run(again.atranslate(text, "xx")) == result
+    assert again.last_stats["memory_hits"] == 2
+    assert len(backend.batches) == 1
+
+
+def test_memory_is_not_touched_on_the_event_loop_thread(tmp_path, monkeypatch):
+    memory = TranslationMemory(str(tmp_path / "memory.db"))
+    threads = []
+    for name in ("lookup", "store"):
+        method = getattr(memory, name)
+
+        def record(*args, _method=method):
+            threads.append(threading.current_thread())
+            return _method(*args)
+
+        monkeypatch.setattr(memory, name, record)
+
+    async def run():
+        await Translator(UpperBackend(), memory).atranslate("Hello there.", "xx")
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(run())
+    assert len(threads) == 2
+    assert loop_thread not in threads
@@ -0,0 +1,44 @@
+import threading
+
+import pytest
+
+from pipeline import jobs, runner, worker
+from pipeline.cache import ArtifactCache
+from pipeline.scheduler import Stage, StagePipeline
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    monkeypatch.setattr(runner, "artifact_cache", cache)
+    return cache
+
+
+def test_failing_first_stage_releases_pins(tmp_path, monkeypatch, cache):
+    def download_stage(ctx):
+        assert cache.stats()["pins"] == len(runner.STAGES)  # pinned by the plan
+        raise RuntimeError("download failed")
+
+    monkeypatch.setattr(runner, "STAGE_FUNCS", (download_stage,) + runner.STAGE_FUNCS[1:])
+    queue = jobs.SQLiteJobQueue(str(tmp_path / "jobs.db"))
+    queue.enqueue({"url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ", "target_lang": "en"})
+    job = queue.claim("test")
+
+    errors = []
+    failed = threading.Event()
+
+    def on_error(item, exc):
+        errors.append((item, exc))
+        failed.set()
+
+    stages = [Stage(name, worker._job_stage(queue, index)) for index, name in enumerate(runner.STAGES)]
+    pipeline = StagePipeline(stages, on_error=on_error).start()
+    pipeline.submit((job, None))
+    assert failed.wait(10)
+    pipeline.close()
+    pipeline.join()
+
+    (item, exc), = errors
+    assert item == (job, None)
+    assert str(exc) == "download failed"
+    assert cache.stats()["pins"] == 0
@@ -0,0 +1,21 @@
+"""
+_paths.py
+
+Make the API pipeline (``api/pipeline``) importable from these scripts.
+
+The scripts run as ``python questions/<script>.py`` and are not an
+installed package, so every module that imports ``pipeline`` imports this
+one first:
+
+    import _paths  # noqa: F401
+    from pipeline import token_budget
+"""
+
+import sys
+from pathlib import Path
+
+API_DIR = str(Path(__file__).resolve().parent.parent / "api")
+
+# Appended, so api/main.py never shadows questions/main.py.
+if API_DIR not in sys.path:
+    sys.path.append(API_DIR)
@@ -0,0 +1,216 @@
+"""
+comment_reducer.py
+
+Shrink a video's comments to a representative sample before prompting:
+drop low-information comments, cluster near-duplicates with character
+shingles + MinHash/LSH (vectorised with numpy), and keep one representative
+per cluster, weighted by cluster size and likes, within a token budget.
+
+    $ python comment_reducer.py comments.txt --budget 3000 -o reduced.txt
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import re
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+import _paths  # noqa: F401
+from pipeline.token_budget import estimate_tokens
+
+SHINGLE = 5          # characters per shingle
+NUM_HASHES = 64      # MinHash signature length
+BANDS = 16           # LSH bands of NUM_HASHES // BANDS rows each
+THRESHOLD = 0.6      # estimated Jaccard similarity to count as a near-duplicate
+MIN_WORDS = 3
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(1)  # fixed, so the same comments always reduce the same way
+_A = _rng.integers(1, _PRIME, NUM_HASHES, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, NUM_HASHES, dtype=np.uint64)
+
+_URL = re.compile(r"https?://\S+|www\.\S+")
+_NON_WORD = re.compile(r"[^\w\s?]+")
+_SPACE = re.compile(r"\s+")
+# Filler openers followed by at most a few more characters ("first!!", "great video").
+_LOW_INFO = re.compile(
+    r"^(first|second|third|early|here before|who ?s here|anyone (here|watching)|like if|"
+    r"lol|lmao|haha|wow|nice|great|cool|love (this|it)|thanks?( you)?)\b.{0,15}$"
+)
+
+
+def normalise(text: str) -> str:
+    text = _URL.sub(" ", text.lower())
+    text = _NON_WORD.sub(" ", text)
+    return _SPACE.sub(" ", text).strip()
+
+
+def is_low_info(norm: str) -> bool:
+    """Too short, filler like "first!" or "great video", or a single repeated word.
+
+    Short questions ("why?", "source?") are kept; only the filler patterns apply to them.
+    """
+    words = norm.replace("?", " ").split()
+    if not words:
+        return True
+    if not norm.endswith("?") and (len(words) < MIN_WORDS or len(set(words)) <= 1):
+        return True
+    return bool(_LOW_INFO.match(norm))
+
+
+_POWERS = np.array([31 ** k for k in range(SHINGLE)], dtype=np.uint64)
+
+
+def shingles(norm: str) -> np.ndarray:
+    """32-bit hashes of the distinct character SHINGLE-grams of `norm`."""
+    codes = np.frombuffer(f" {norm} ".ljust(SHINGLE).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    windows = np.lib.stride_tricks.sliding_window_view(codes, SHINGLE)
+    # Polynomial hash of each window; uint64 wraps around, then keep 32 bits.
+    return np.unique((windows * _POWERS).sum(axis=1) & 0xFFFFFFFF)
+
+
+def minhash(shingle_sets: List[np.ndarray], batch: int = 1 << 16) -> np.ndarray:
+    """(n, NUM_HASHES) signature matrix; each row is the min over a comment's hashed shingles.
+
+    Shingles of many comments are hashed together, `batch` shingles at a
+    time, and reduced per comment with `np.minimum.reduceat`.
+    """
+    signatures = np.empty((len(shingle_sets), NUM_HASHES), dtype=np.uint64)
+    start = 0
+    while start < len(shingle_sets):
+        end, size = start, 0
+        while end < len(shingle_sets) and (size == 0 or size + len(shingle_sets[end]) <= batch):
+            size += len(shingle_sets[end])
+            end += 1
+        hashes = np.concatenate(shingle_sets[start:end])
+        offsets = np.cumsum([0] + [len(h) for h in shingle_sets[start:end - 1]])
+        # a * h fits in 64 bits as a < 2^31 and h < 2^32.
+        permuted = (np.outer(_A, hashes) + _B[:, None]) % _PRIME
+        signatures[start:end] = np.minimum.reduceat(permuted, offsets, axis=1).T
+        start = end
+    return signatures
+
+
+def cluster(signatures: np.ndarray, threshold: float = THRESHOLD) -> List[int]:
+    """Cluster label per row: LSH band collisions, confirmed by signature agreement."""
+    n = len(signatures)
+    parent = list(range(n))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    rows = NUM_HASHES // BANDS
+    for band in range(BANDS):
+        buckets = defaultdict(list)
+        block = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        for i in range(n):
+            buckets[block[i].tobytes()].append(i)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            head = members[0]
+            agreement = (signatures[members[1:]] == signatures[head]).mean(axis=1)
+            for other, similar in zip(members[1:], agreement):
+                if similar >= threshold:
+                    parent[find(other)] = find(head)
+    return [find(i) for i in range(n)]
+
+
+def reduce_comments(comments: list, token_budget: int = 4000, threshold: float = THRESHOLD,
+                    provider: str = "deepseek") -> tuple[str, dict]:
+    """
+    Pick a representative, de-duplicated sample of comments.
+
+    Parameters
+    ----------
+    comments : list
+        Comment texts, or dicts with ``text`` and optionally ``like_count``.
+    token_budget : int
+        Approximate token budget for the returned text.
+    threshold : float
+        Estimated Jaccard similarity above which two comments are duplicates.
+    provider : str
+        Provider whose tokenizer the budget is estimated for.
+
+    Returns
+    -------
+    (text, stats)
+        The sample, one comment per paragraph, most representative first and
+        prefixed with how many near-duplicates and likes it stands for; and
+        counts of what was dropped.
+    """
+    items = [c if isinstance(c, dict) else {"text": c} for c in comments]
+    items = [c for c in items if c["text"].strip()]
+    norms = [normalise(c["text"]) for c in items]
+    keep = [i for i, norm in enumerate(norms) if not is_low_info(norm)]
+
+    # Exact repeats (after normalising) are common; hash each distinct text once.
+    distinct = list(dict.fromkeys(norms[i] for i in keep))
+    labels = cluster(minhash([shingles(norm) for norm in distinct]), threshold) if distinct else []
+    label_of = dict(zip(distinct, labels))
+    clusters = defaultdict(list)
+    for i in keep:
+        clusters[label_of[norms[i]]].append(i)
+
+    ranked = []
+    for members in clusters.values():
+        likes = sum(items[i].get("like_count", 0) for i in members)
+        # The most liked wording represents the cluster; longer breaks ties.
+        best = max(members, key=lambda i: (items[i].get("like_count", 0), len(items[i]["text"])))
+        weight = len(members) * (1 + math.log1p(likes))
+        if "?" in norms[best]:
+            weight *= 1.5  # audience questions are what the prompts are after
+        ranked.append((weight, best, len(members), likes))
+    ranked.sort(key=lambda r: (-r[0], r[1]))
+
+    chosen, used = [], 0
+    for weight, best, size, likes in ranked:
+        entry = f"[x{size}, {likes} likes] {items[best]['text'].strip()}"
+        cost = estimate_tokens(entry, provider)
+        if used + cost > token_budget:
+            continue
+        chosen.append(entry)
+        used += cost
+
+    stats = {
+        "comments": len(items),
+        "low_info": len(items) - len(keep),
+        "clusters": len(clusters),
+        "selected": len(chosen),
+        "tokens_before": sum(estimate_tokens(c["text"], provider) for c in items),
+        "tokens_after": used,
+    }
+    return "\n\n".join(chosen), stats
+
+
+def split_comments(text: str) -> List[str]:
+    """Comments as saved by `YouTubeCommentFetcher.save` (blank-line separated)."""
+    return [part for part in text.split("\n\n") if part.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="De-duplicate and sample comments to a token budget")
+    parser.add_argument("comments", type=Path, help="comments.txt as saved by get_comments.py")
+    parser.add_argument("-b", "--budget", type=int, default=4000, help="Token budget (default: 4000)")
+    parser.add_argument("-o", "--output", type=Path, default=None, help="Output file (default: stdout)")
+    args = parser.parse_args()
+
+    text, stats = reduce_comments(split_comments(args.comments.read_text(encoding="utf-8")), args.budget)
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    print(f"✔ {stats}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+comment_store.py
+
+Local SQLite store of YouTube comments per video, so comment syncs only
+need to fetch what is new since the last run (see
+`YouTubeCommentFetcher.sync_comments`).
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, List
+
+DEFAULT_PATH = os.path.join(os.getenv("VID2POD_STORAGE", "storage"), "comments.db")
+
+
+class CommentStore:
+    """
+    Comments keyed by (video ID, comment ID) with their publish/update times,
+    plus per-video sync state. Safe to share between threads and processes.
+    """
+
+    def __init__(self, path: str | None = None) -> None:
+        """
+        Parameters
+        ----------
+        path : str | None
+            SQLite file (default: ``$VID2POD_STORAGE/comments.db``).
+        """
+        self.path = path or os.getenv("COMMENTS_DB", DEFAULT_PATH)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._local = threading.local()
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS comments ("
+                " video_id TEXT NOT NULL,"
+                " comment_id TEXT NOT NULL,"
+                " author TEXT,"
+                " text TEXT NOT NULL,"
+                " like_count INTEGER NOT NULL DEFAULT 0,"
+                " published_at TEXT NOT NULL,"
+                " updated_at TEXT NOT NULL,"
+                " PRIMARY KEY (video_id, comment_id))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS comments_by_time ON comments (video_id, published_at)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sync_state ("
+                " video_id TEXT PRIMARY KEY,"
+                " synced_at REAL NOT NULL,"
+                # 1 once a sync has reached the oldest comment; until then
+                # later syncs keep paging past comments they already know.
+                " complete INTEGER NOT NULL DEFAULT 0)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def known(self, video_id: str, comment_ids: Iterable[str]) -> set[str]:
+        """Return the subset of `comment_ids` already stored for `video_id`."""
+        ids = list(comment_ids)
+        if not ids:
+            return set()
+        marks = ",".join("?" * len(ids))
+        rows = self._db().execute(
+            f"SELECT comment_id FROM comments WHERE video_id = ? AND comment_id IN ({marks})",
+            [video_id, *ids],
+        )
+        return {row[0] for row in rows}
+
+    def upsert(self, video_id: str, comments: List[dict]) -> None:
+        """
+        Insert or update comments.
+
+        Parameters
+        ----------
+        comments : list[dict]
+            Each with ``id``, ``author``, ``text``, ``like_count``,
+            ``published_at`` and ``updated_at``.
+        """
+        db = self._db()
+        db.execute("BEGIN")
+        try:
+            db.executemany(
+                "INSERT INTO comments (video_id, comment_id, author, text, like_count, published_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(video_id, comment_id) DO UPDATE SET"
+                " text = excluded.text, like_count = excluded.like_count, updated_at = excluded.updated_at",
+                [
+                    (video_id, c["id"], c.get("author"), c["text"], c.get("like_count", 0),
+                     c["published_at"], c["updated_at"])
+                    for c in comments
+                ],
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def is_complete(self, video_id: str) -> bool:
+        row = self._db().execute(
+            "SELECT complete FROM sync_state WHERE video_id = ?", (video_id,)
+        ).fetchone()
+        return bool(row and row[0])
+
+    def mark_synced(self, video_id: str, complete: bool) -> None:
+        # Once complete, a video stays complete: later syncs only add newer comments.
+        self._db().execute(
+            "INSERT INTO sync_state (video_id, synced_at, complete) VALUES (?, ?, ?)"
+            " ON CONFLICT(video_id) DO UPDATE SET synced_at = excluded.synced_at,"
+            " complete = MAX(complete, excluded.complete)",
+            (video_id, time.time(), int(complete)),
+        )
+
+    def comments(self, video_id: str, limit: int | None = None, order: str = "time") -> List[str]:
+        """
+        Stored comment texts for a video.
+
+        Parameters
+        ----------
+        limit : int | None
+            Return at most this many.
+        order : str
+            ``"time"`` for newest first, ``"likes"`` for most liked first.
+        """
+        order_by = "like_count DESC, published_at DESC" if order == "likes" else "published_at DESC"
+        rows = self._db().execute(
+            f"SELECT text FROM comments WHERE video_id = ? ORDER BY {order_by} LIMIT ?",
+            (video_id, -1 if limit is None else limit),
+        )
+        return [row[0] for row in rows]
+
+    def records(self, video_id: str) -> List[dict]:
+        """Stored comments as dicts with ``text`` and ``like_count``, for `reduce_comments`."""
+        rows = self._db().execute(
+            "SELECT text, like_count FROM comments WHERE video_id = ? ORDER BY published_at DESC", (video_id,)
+        )
+        return [{"text": text, "like_count": likes} for text, likes in rows]
+
+    def count(self, video_id: str) -> int:
+        return self._db().execute(
+            "SELECT COUNT(*) FROM comments WHERE video_id = ?", (video_id,)
+        ).fetchone()[0]
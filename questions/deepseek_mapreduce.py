@@ -0,0 +1,158 @@
+"""
+deepseek_mapreduce.py
+
+Request helpers shared by generate_podcast.py and generate_questions.py:
+fitting transcript and comments to the token budget (map-reduce for
+transcripts too large for one DeepSeek prompt, then trimming), usage
+accounting, and the on-disk response cache. Chunking, the map
+prompts and the cache live in the API pipeline (api/pipeline/) so the Gemini
+and DeepSeek paths behave the same way.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Iterator
+
+import requests
+
+import _paths  # noqa: F401
+from deepseek_stream import iter_chat_deltas
+from pipeline import mapreduce, token_budget
+from pipeline.llm_cache import ResponseCache, shared as shared_cache  # noqa: F401
+from pipeline.token_budget import new_usage  # noqa: F401
+
+# deepseek-chat has a 64K context; leave room for the output.
+INPUT_TOKENS = int(os.getenv("DEEPSEEK_INPUT_TOKENS", "48000"))
+CHUNK_TOKENS = int(os.getenv("DEEPSEEK_CHUNK_TOKENS", "12000"))
+MAP_WORKERS = int(os.getenv("DEEPSEEK_MAP_WORKERS", "4"))
+
+_usage_lock = threading.Lock()  # map calls report usage from several threads
+
+
+def budget(model: str, max_tokens: int | None = None) -> token_budget.Budget:
+    """Token budget of requests to `model`, asking for at most `max_tokens` output tokens."""
+    return token_budget.Budget("deepseek", model, input_tokens=INPUT_TOKENS, output_tokens=max_tokens)
+
+
+def add_usage(totals: dict, data: dict | None, payload: dict, text: str) -> None:
+    """
+    Add one response's ``usage`` to `totals`, estimating when it has none.
+
+    Parameters
+    ----------
+    totals : dict
+        Dict made by `new_usage`.
+    data : dict | None
+        The ``usage`` object of a chat/completions response.
+    payload : dict
+        The request that was sent.
+    text : str
+        The completion text.
+    """
+    data = data or {}
+    estimated = token_budget.estimate_tokens("".join(m["content"] for m in payload["messages"]), "deepseek")
+    if "prompt_tokens" in data:
+        token_budget.record("deepseek", estimated, data["prompt_tokens"])
+    with _usage_lock:
+        totals["calls"] += 1
+        totals["estimated_prompt_tokens"] += estimated
+        totals["prompt_tokens"] += data.get("prompt_tokens", estimated)
+        totals["output_tokens"] += data.get("completion_tokens", token_budget.estimate_tokens(text, "deepseek"))
+        # Prompt tokens DeepSeek served from its context (prefix) cache on disk.
+        totals["cached_tokens"] += data.get("prompt_cache_hit_tokens", 0)
+
+
+def cache_key(cache: ResponseCache, payload: dict) -> str | None:
+    """Response-cache key of a chat/completions request; None if it may not be cached."""
+    params = {name: value for name, value in payload.items()
+              if name not in ("model", "messages", "stream", "stream_options")}
+    return cache.key_for("deepseek", payload["model"], payload["messages"], params)
+
+
+def _cached(cache: ResponseCache, key: str | None, totals: dict) -> str | None:
+    text = cache.get("deepseek", key)
+    if text is not None:
+        with _usage_lock:
+            totals["cache_hits"] += 1
+    return text
+
+
+def post_chat(session: requests.Session, url: str, payload: dict, timeout: int, totals: dict,
+              cache: ResponseCache) -> str:
+    """Send one non-streaming chat/completions request (or answer it from `cache`) and return its text."""
+    key = cache_key(cache, payload)
+    text = _cached(cache, key, totals)
+    if text is not None:
+        return text
+    resp = session.post(url, json=payload, timeout=timeout)
+    resp.raise_for_status()
+    data = resp.json()
+    text = data["choices"][0]["message"]["content"]
+    add_usage(totals, data.get("usage"), payload, text)
+    cache.put("deepseek", key, text)
+    return text
+
+
+def stream_chat(session: requests.Session, url: str, payload: dict, timeout: int, totals: dict,
+                cache: ResponseCache, timer: dict) -> Iterator[str]:
+    """
+    Yield the text deltas of a streaming chat/completions request.
+
+    A cached response is yielded whole. `timer` is passed on to
+    `iter_chat_deltas`, and gets ``"ttft"`` set on a cache hit as well.
+    """
+    key = cache_key(cache, payload)
+    text = _cached(cache, key, totals)
+    if text is not None:
+        timer["ttft"] = time.monotonic() - timer["started"]
+        yield text
+        return
+    parts = []
+    streaming = {**payload, "stream": True, "stream_options": {"include_usage": True}}
+    with session.post(url, json=streaming, timeout=timeout, stream=True) as resp:
+        resp.raise_for_status()
+        for delta in iter_chat_deltas(resp, timer):
+            parts.append(delta)
+            yield delta
+    add_usage(totals, timer.get("usage"), payload, "".join(parts))
+    cache.put("deepseek", key, "".join(parts))
+
+
+def fit(session: requests.Session, url: str, model: str, limits: token_budget.Budget, instructions: str,
+        comments: str, transcript: str, timeout: int, totals: dict, cache: ResponseCache) -> tuple[str, str]:
+    """
+    Return (comments, transcript) fitted to `limits` next to `instructions`.
+
+    A transcript over its share of the budget is first condensed to key-point
+    notes (``totals["mode"]`` becomes ``"map_reduce"``); whatever is still
+    over is trimmed.
+    """
+    def extract(prompt: str) -> str:
+        # Notes are extraction, not writing: decode greedily so ResponseCache stores them by default.
+        payload = {
+            "model": model,
+            "temperature": 0,
+            "max_tokens": limits.output_limit(mapreduce.NOTES_TOKENS),
+            "messages": [{"role": "user", "content": prompt}],
+        }
+        return post_chat(session, url, payload, timeout, totals, cache)
+
+    if limits.over("transcript", instructions, transcript, comments):
+        totals["mode"] = "map_reduce"
+        transcript, comments = mapreduce.condense(extract, transcript, comments, CHUNK_TOKENS, MAP_WORKERS, "deepseek")
+    transcript, comments = limits.fit(instructions, transcript, comments)
+    return comments, transcript
+
+
+def describe(totals: dict) -> str:
+    """One-line summary of a generation's latency and token usage."""
+    return (
+        f"{totals['mode']}: {totals['calls']} call(s) + {totals['cache_hits']} cached in "
+        f"{totals.get('seconds', 0):.1f}s, "
+        f"{totals['prompt_tokens']} prompt (~{totals['estimated_prompt_tokens']} estimated, "
+        f"{totals['cached_tokens']} cached) + "
+        f"{totals['output_tokens']} output tokens"
+    )
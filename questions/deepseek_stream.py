@@ -0,0 +1,45 @@
+"""
+deepseek_stream.py
+
+Helpers for DeepSeek's OpenAI-style streaming chat/completions responses,
+shared by generate_podcast.py and generate_questions.py.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from typing import Iterator
+
+import requests
+
+
+def iter_chat_deltas(response: requests.Response, timer: dict | None = None) -> Iterator[str]:
+    """
+    Yield the text deltas of a `stream: true` chat/completions response.
+
+    Parameters
+    ----------
+    response : requests.Response
+        Response opened with ``stream=True``.
+    timer : dict | None
+        If given, must hold ``"started"`` (a ``time.monotonic()`` value);
+        ``"ttft"`` is set to the seconds until the first text delta, and
+        ``"usage"`` to the usage object if the server sends one (requested
+        with ``stream_options: {"include_usage": true}``).
+    """
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        event = json.loads(data)
+        if timer is not None and event.get("usage"):
+            timer["usage"] = event["usage"]
+        choices = event.get("choices") or [{}]
+        delta = choices[0].get("delta", {}).get("content")
+        if delta:
+            if timer is not None and "ttft" not in timer:
+                timer["ttft"] = time.monotonic() - timer["started"]
+            yield delta
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+generate_batch.py
+
+Generate questions and/or podcast dialogue for many videos in one run.
+
+Jobs come from a JSONL manifest, one per line:
+
+    {"id": "uLsAhwJzQoI", "task": "questions",
+     "transcript": "videos/uLsAhwJzQoI/transcript.txt",
+     "comments": "videos/uLsAhwJzQoI/comments.txt",
+     "options": {"max_questions": 15, "temperature": 0.7}}
+
+``task`` is ``"questions"`` or ``"podcast"``; ``transcript`` and
+``comments`` are paths relative to the manifest (or ``transcript_text`` /
+``comments_text`` inline). Options are the keyword arguments of
+`DeepSeekClient.generate_questions` / `generate_dialogue`, plus
+``comment_budget`` and, for podcasts, ``system_prompt`` / ``user_prompt``
+paths. Alternatively ``--from-dir`` makes one job per task for every video
+folder written by ``main.py --batch``.
+
+DeepSeek has no asynchronous batch endpoint, so jobs fan out over a
+bounded pool of workers. Every finished job is appended to the output
+JSONL straight away; on restart, jobs already there are skipped and failed
+ones retried, so a crash loses at most the jobs in flight.
+
+    $ python generate_batch.py manifest.jsonl -o results.jsonl --workers 8
+    $ python generate_batch.py --from-dir videos --task questions --task podcast -o results.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Iterator
+
+from dotenv import load_dotenv
+
+import deepseek_mapreduce
+import generate_podcast
+import generate_questions
+from comment_reducer import reduce_comments, split_comments
+
+TASKS = ("questions", "podcast")
+
+
+def read_manifest(path: Path) -> Iterator[dict]:
+    """Jobs of a JSONL manifest, with ``transcript``/``comments`` paths resolved against its folder."""
+    with path.open(encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            job = json.loads(line)
+            if job.get("task") not in TASKS or "id" not in job:
+                raise ValueError(f"{path}:{number}: each job needs an id and a task in {TASKS}")
+            for field in ("transcript", "comments"):
+                if field in job:
+                    job[field] = str(path.parent / job[field])
+            yield job
+
+
+def jobs_from_dir(folder: Path, tasks: list[str]) -> Iterator[dict]:
+    """One job per task for every ``<folder>/<video_id>/transcript.txt`` (as `main.py --batch` writes)."""
+    for transcript in sorted(folder.glob("*/transcript.txt")):
+        comments = transcript.with_name("comments.txt")
+        for task in tasks:
+            yield {
+                "id": transcript.parent.name,
+                "task": task,
+                "transcript": str(transcript),
+                "comments": str(comments) if comments.is_file() else None,
+            }
+
+
+def job_key(job: dict) -> str:
+    return f"{job['id']}:{job['task']}"
+
+
+def finished_jobs(output: Path) -> set[str]:
+    """Keys of jobs that already succeeded according to `output` (the checkpoint)."""
+    done = set()
+    if not output.is_file():
+        return done
+    with output.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by a crash
+            if record.get("ok"):
+                done.add(job_key(record))
+    return done
+
+
+class BatchRunner:
+    """
+    Runs jobs on a pool of threads, each with its own DeepSeek clients
+    (HTTP sessions are not shared between threads), and appends results
+    to the output as they finish.
+    """
+
+    def __init__(self, api_key: str, output: Path, cache: deepseek_mapreduce.ResponseCache) -> None:
+        self.api_key = api_key
+        self.output = output
+        self.cache = cache
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+    def _client(self, task: str):
+        clients = getattr(self._local, "clients", None)
+        if clients is None:
+            clients = self._local.clients = {}
+        if task not in clients:
+            module = generate_questions if task == "questions" else generate_podcast
+            clients[task] = module.DeepSeekClient(self.api_key, cache=self.cache)
+        return clients[task]
+
+    def run(self, job: dict) -> dict:
+        """Run one job and return its result record (also on failure)."""
+        started = time.monotonic()
+        record = {"id": job["id"], "task": job["task"]}
+        usage = {}
+        try:
+            client = self._client(job["task"])
+            options = dict(job.get("options") or {})
+            comment_budget = options.pop("comment_budget", 4000)
+            transcript = _text(job, "transcript")
+            comments = _text(job, "comments")
+            if comment_budget:
+                comments, _ = reduce_comments(split_comments(comments), comment_budget)
+            if job["task"] == "questions":
+                record["result"] = client.generate_questions(comments, transcript, usage=usage, **options)
+            else:
+                system_prompt = Path(options.pop("system_prompt", "questions/prompts/system.md"))
+                user_prompt = Path(options.pop("user_prompt", "questions/prompts/prompt.md"))
+                record["result"] = client.generate_dialogue(
+                    comments, transcript,
+                    generate_podcast.read_file(system_prompt), generate_podcast.read_file(user_prompt),
+                    usage=usage, **options,
+                )
+            record["ok"] = True
+            record["usage"] = usage
+        except Exception as e:
+            record["ok"] = False
+            record["error"] = f"{type(e).__name__}: {e}"
+        record["seconds"] = round(time.monotonic() - started, 2)
+        self._append(record)
+        return record
+
+    def _append(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._write_lock:
+            with self.output.open("a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def _text(job: dict, field: str) -> str:
+    if f"{field}_text" in job:
+        return job[f"{field}_text"]
+    if job.get(field):
+        return Path(job[field]).read_text(encoding="utf-8")
+    if field == "comments":
+        return ""
+    raise ValueError(f"job {job_key(job)} has no {field}")
+
+
+def main() -> None:
+    load_dotenv()
+    api_key = os.getenv("DEEPSEEK_APIKEY")
+    if not api_key:
+        raise RuntimeError("Please set DEEPSEEK_APIKEY in your environment or .env file")
+
+    parser = argparse.ArgumentParser(description="Generate questions/dialogues for many videos via DeepSeek")
+    parser.add_argument("manifest", type=Path, nargs="?", help="JSONL manifest of jobs")
+    parser.add_argument("--from-dir", type=Path, help="Make jobs for every video folder written by main.py --batch")
+    parser.add_argument("--task", action="append", choices=TASKS,
+                        help="With --from-dir: task(s) to run per video (default: questions)")
+    parser.add_argument("-o", "--output", type=Path, default=Path("results.jsonl"),
+                        help="Results JSONL, also the checkpoint (default: results.jsonl)")
+    parser.add_argument("-w", "--workers", type=int, default=8, help="Jobs run at the same time (default: 8)")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore cached responses (fresh ones are still stored)")
+    parser.add_argument("--cache-sampled", action="store_true",
+                        help="Also cache the final sampled (temperature > 0) generation; map-phase notes are always cached")
+    args = parser.parse_args()
+    if bool(args.manifest) == bool(args.from_dir):
+        parser.error("give either a manifest or --from-dir")
+
+    jobs = list(read_manifest(args.manifest) if args.manifest else jobs_from_dir(args.from_dir, args.task or ["questions"]))
+    done = finished_jobs(args.output)
+    todo = [job for job in jobs if job_key(job) not in done]
+    print(f"Batch: {len(jobs)} jobs, {len(jobs) - len(todo)} already done, {len(todo)} to go", file=sys.stderr)
+
+    cache = deepseek_mapreduce.ResponseCache(bypass=args.no_cache or None, allow_sampled=args.cache_sampled or None)
+    runner = BatchRunner(api_key, args.output, cache)
+    started = time.monotonic()
+    failed = prompt_tokens = output_tokens = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(runner.run, job) for job in todo]
+        for finished, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            if record["ok"]:
+                prompt_tokens += record["usage"]["prompt_tokens"]
+                output_tokens += record["usage"]["output_tokens"]
+                print(f"✔ [{finished}/{len(todo)}] {job_key(record)} in {record['seconds']}s", file=sys.stderr)
+            else:
+                failed += 1
+                print(f"✘ [{finished}/{len(todo)}] {job_key(record)}: {record['error']}", file=sys.stderr)
+
+    print(f"⏱ {len(todo) - failed} done, {failed} failed in {time.monotonic() - started:.1f}s, "
+          f"{prompt_tokens} prompt + {output_tokens} output tokens → {args.output.resolve()}", file=sys.stderr)
+    if failed:
+        print("Re-run the same command to retry the failed jobs.", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
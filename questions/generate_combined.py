@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+generate_combined.py
+
+Generate the audience questions and the podcast dialogue for a video in
+one DeepSeek request, instead of running generate_questions.py and then
+generate_podcast.py, which send the same transcript and comments twice.
+
+The model answers with a JSON object holding both parts. Each part is
+validated on its own; if one is missing or malformed, only that part is
+asked for again, through the same request the single-purpose script would
+make. The run reports the prompt tokens saved against the two-call path
+(estimated, or measured with ``--compare``, which also runs that path).
+
+Usage:
+    $ python generate_combined.py \
+          --comments comments.txt \
+          --transcript transcript.txt \
+          --questions-out questions.txt \
+          --dialogue-out dialogue.txt
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+import requests
+from dotenv import load_dotenv
+
+import deepseek_mapreduce
+import generate_podcast
+import generate_questions
+from comment_reducer import reduce_comments, split_comments
+from generate_podcast import read_file, save_to_file
+from generate_questions import LIST_MARKER, save_questions
+import _paths  # noqa: F401
+from pipeline.token_budget import estimate_tokens
+
+SYSTEM_PROMPT = Path("questions/prompts/system_combined.md")
+USER_PROMPT = Path("questions/prompts/prompt_combined.md")
+# The hosts prompts/system_combined.md writes for.
+SPEAKERS = ("Alex", "Ben")
+# A dialogue turn of one of them: "Alex:" or "**Ben** (laughing):" at the start of a line.
+TURN = re.compile(
+    rf"^\s*[*_]*({'|'.join(map(re.escape, SPEAKERS))})[*_]*\s*(?:\([^)]*\))?\s*:", re.MULTILINE
+)
+MIN_TURNS = 4
+
+
+class DeepSeekClient(generate_podcast.DeepSeekClient):
+    """
+    DeepSeek client that produces questions and dialogue from one request.
+    """
+
+    def generate_all(
+        self,
+        comments: str,
+        transcript: str,
+        max_questions: int = 10,
+        model: str = "deepseek-chat",
+        temperature: float = 0.7,
+        max_tokens: int = 3000,
+        timeout: int = 120,
+        usage: dict | None = None,
+    ) -> dict:
+        """
+        Generate both artifacts in one request.
+
+        Inputs are fitted to the token budget once, as in the single-purpose
+        scripts. A part that fails validation is regenerated on its own and
+        listed under ``usage["retried"]``.
+
+        Parameters
+        ----------
+        comments, transcript : str
+            The video's material.
+        max_questions : int
+            How many questions to ask for.
+        max_tokens : int
+            Output limit of the combined request (questions and dialogue together).
+        usage : dict, optional
+            Filled with the cost of the whole run, retries included.
+
+        Returns
+        -------
+        dict
+            ``{"questions": list[str], "dialogue": str}``
+        """
+        started = time.monotonic()
+        url = f"{self.base_url}/chat/completions"
+        totals = deepseek_mapreduce.new_usage(usage=usage)
+        totals["retried"] = []
+        system_prompt, user_prompt = read_file(SYSTEM_PROMPT), read_file(USER_PROMPT)
+        limits = deepseek_mapreduce.budget(model, max_tokens)
+        comments, transcript = deepseek_mapreduce.fit(
+            self.session, url, model, limits, system_prompt + user_prompt, comments, transcript,
+            timeout, totals, self.cache
+        )
+        payload = self._combined_payload(comments, transcript, system_prompt, user_prompt, max_questions,
+                                         model, temperature, limits.output_tokens)
+        text = deepseek_mapreduce.post_chat(self.session, url, payload, timeout, totals, self.cache)
+        result, problems = parse_combined(text, max_questions)
+
+        # Regenerate only what came back broken, from the already fitted inputs.
+        if "questions" in problems:
+            print(f"⚠️  Questions invalid ({problems['questions']}), asking for them alone", file=sys.stderr)
+            asker = generate_questions.DeepSeekClient(self.api_key, self.base_url, cache=self.cache)
+            retry = {}
+            result["questions"] = asker.generate_questions(comments, transcript, max_questions, model, temperature,
+                                                           usage=retry)
+            _merge_usage(totals, retry)
+            totals["retried"].append("questions")
+        if "dialogue" in problems:
+            print(f"⚠️  Dialogue invalid ({problems['dialogue']}), asking for it alone", file=sys.stderr)
+            result["dialogue"] = self.generate_dialogue_only(comments, transcript, model, temperature, timeout, totals)
+            totals["retried"].append("dialogue")
+        totals["seconds"] = time.monotonic() - started
+        return result
+
+    def generate_dialogue_only(self, comments, transcript, model, temperature, timeout, totals: dict) -> str:
+        """The request generate_podcast.py makes, with its default prompts; its cost is added to `totals`."""
+        retry = {}
+        dialogue = self.generate_dialogue(
+            comments, transcript,
+            read_file(Path("questions/prompts/system.md")), read_file(Path("questions/prompts/prompt.md")),
+            model=model, temperature=temperature, timeout=timeout, usage=retry,
+        )
+        _merge_usage(totals, retry)
+        return dialogue
+
+    @staticmethod
+    def _combined_payload(comments, transcript, system_prompt, user_prompt, max_questions, model,
+                          temperature, max_tokens) -> dict:
+        # Same layout as the single-purpose scripts: fixed instructions first, the video's material last.
+        return {
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "response_format": {"type": "json_object"},
+            "messages": [
+                {"role": "system", "content": system_prompt.strip()},
+                {
+                    "role": "user",
+                    "content": (
+                        f"{user_prompt.strip()}\n\n"
+                        f"Transcript:\n{transcript}\n\n"
+                        f"Comments:\n{comments}\n\n"
+                        f"Generate up to {max_questions} questions and the dialogue as JSON."
+                    ),
+                },
+            ],
+        }
+
+
+def _merge_usage(totals: dict, extra: dict) -> None:
+    for field in ("calls", "cache_hits", "prompt_tokens", "estimated_prompt_tokens", "cached_tokens", "output_tokens"):
+        totals[field] += extra[field]
+
+
+def parse_combined(text: str, max_questions: int) -> tuple[dict, dict]:
+    """
+    Parse and validate the combined reply.
+
+    Returns
+    -------
+    (result, problems)
+        ``result`` holds each part that passed validation; ``problems``
+        maps each part that did not to the reason.
+    """
+    text = text.strip()
+    # Tolerate a fenced code block around the JSON.
+    if text.startswith("```"):
+        text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        return {}, {"questions": f"not JSON: {e}", "dialogue": f"not JSON: {e}"}
+    if not isinstance(data, dict):
+        return {}, {"questions": "not a JSON object", "dialogue": "not a JSON object"}
+
+    result, problems = {}, {}
+    questions = data.get("questions")
+    if isinstance(questions, list) and all(isinstance(q, str) for q in questions):
+        questions = [LIST_MARKER.sub("", q).strip() for q in questions]
+        if any(questions):
+            result["questions"] = [q for q in questions if q][:max_questions]
+    if "questions" not in result:
+        problems["questions"] = "missing, empty or not a list of strings"
+
+    dialogue = data.get("dialogue")
+    if not isinstance(dialogue, str):
+        problems["dialogue"] = "missing or not a string"
+    elif len(TURN.findall(dialogue)) < MIN_TURNS:
+        problems["dialogue"] = f"fewer than {MIN_TURNS} turns by {' and '.join(SPEAKERS)}"
+    elif set(TURN.findall(dialogue)) != set(SPEAKERS):
+        problems["dialogue"] = f"not every host speaks (found {', '.join(sorted(set(TURN.findall(dialogue))))})"
+    else:
+        result["dialogue"] = dialogue.strip()
+    return result, problems
+
+
+def two_call_tokens(comments: str, transcript: str, max_questions: int, model: str) -> int:
+    """Estimated prompt tokens of generate_questions.py plus generate_podcast.py on the same inputs."""
+    questions = generate_questions.DeepSeekClient._payload(comments, transcript, max_questions, model, 0.7, 1024)
+    dialogue = generate_podcast.DeepSeekClient._payload(
+        comments, transcript,
+        read_file(Path("questions/prompts/system.md")), read_file(Path("questions/prompts/prompt.md")),
+        model, 0.7, 1500,
+    )
+    return sum(
+        estimate_tokens(m["content"], "deepseek")
+        for payload in (questions, dialogue) for m in payload["messages"]
+    )
+
+
+def main() -> None:
+    load_dotenv()
+    api_key = os.getenv("DEEPSEEK_APIKEY")
+    if not api_key:
+        raise RuntimeError("Please set DEEPSEEK_APIKEY in your environment or .env file")
+
+    parser = argparse.ArgumentParser(description="Generate questions and podcast dialogue in one DeepSeek request")
+    parser.add_argument("-c", "--comments", type=Path, default=Path("comments.txt"), help="Path to comments.txt")
+    parser.add_argument("-t", "--transcript", type=Path, default=Path("transcript.txt"), help="Path to transcript.txt")
+    parser.add_argument("--questions-out", type=Path, default=Path("questions.txt"), help="Where to write the questions")
+    parser.add_argument("--dialogue-out", type=Path, default=Path("dialogue.txt"), help="Where to write the dialogue")
+    parser.add_argument("-m", "--max", type=int, default=10, help="Maximum number of questions to generate")
+    parser.add_argument("--max-tokens", type=int, default=3000,
+                        help="Max tokens to generate for both parts together (default: 3000)")
+    parser.add_argument("--timeout", type=int, default=120, help="HTTP timeout in seconds (default: 120)")
+    parser.add_argument("--comment-budget", type=int, default=4000,
+                        help="De-duplicate and sample comments down to about this many tokens; 0 keeps them all (default: 4000)")
+    parser.add_argument("--compare", action="store_true",
+                        help="Also run the two-call path (uncached) and report measured tokens and time saved")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore cached responses (fresh ones are still stored)")
+    parser.add_argument("--cache-sampled", action="store_true",
+                        help="Also cache the final sampled (temperature > 0) generation; map-phase notes are always cached")
+    args = parser.parse_args()
+
+    comments = read_file(args.comments)
+    if args.comment_budget:
+        comments, _ = reduce_comments(split_comments(comments), args.comment_budget)
+    transcript = read_file(args.transcript)
+
+    cache = deepseek_mapreduce.ResponseCache(bypass=args.no_cache or None, allow_sampled=args.cache_sampled or None)
+    client = DeepSeekClient(api_key, cache=cache)
+    usage = {}
+    try:
+        result = client.generate_all(comments, transcript, args.max, max_tokens=args.max_tokens, timeout=args.timeout,
+                                     usage=usage)
+    except requests.exceptions.Timeout:
+        raise RuntimeError(f"Request timed out after {args.timeout}s. Consider increasing --timeout.")
+    retried = f", retried {' and '.join(usage['retried'])}" if usage["retried"] else ""
+    print(f"⏱ {deepseek_mapreduce.describe(usage)}{retried}", file=sys.stderr)
+
+    if args.compare:
+        uncached = deepseek_mapreduce.ResponseCache(bypass=True)
+        asker = generate_questions.DeepSeekClient(api_key, cache=uncached)
+        writer = generate_podcast.DeepSeekClient(api_key, cache=uncached)
+        asked, written = {}, {}
+        asker.generate_questions(comments, transcript, args.max, usage=asked)
+        writer.generate_dialogue(comments, transcript, read_file(Path("questions/prompts/system.md")),
+                                 read_file(Path("questions/prompts/prompt.md")), timeout=args.timeout, usage=written)
+        two_tokens = asked["prompt_tokens"] + written["prompt_tokens"]
+        two_seconds = asked["seconds"] + written["seconds"]
+        print(f"⏱ Two-call path: {two_tokens} prompt tokens in {two_seconds:.1f}s; saved "
+              f"{two_tokens - usage['prompt_tokens']} tokens and {two_seconds - usage['seconds']:.1f}s", file=sys.stderr)
+    else:
+        two_tokens = two_call_tokens(comments, transcript, args.max, "deepseek-chat")
+        print(f"⏱ Two-call path would send ~{two_tokens} prompt tokens; saved "
+              f"~{two_tokens - usage['estimated_prompt_tokens']} (use --compare to measure time too)", file=sys.stderr)
+
+    save_questions(result["questions"], args.questions_out)
+    save_to_file(result["dialogue"], args.dialogue_out)
+
+
+if __name__ == "__main__":
+    main()
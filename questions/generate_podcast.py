@@ -15,19 +15,28 @@ Usage:
           --user-prompt prompts/prompt.md \
           --output dialogue.txt \
           --max 1500
+
+    Add --stream to print the dialogue as it is generated.
 """
 
 import os
+import sys
+import time
 import argparse
 from pathlib import Path
+from typing import Iterator
 import requests
 from dotenv import load_dotenv
 
+import deepseek_mapreduce
+from comment_reducer import reduce_comments, split_comments
+
 class DeepSeekClient:
     """
     Minimal wrapper around DeepSeek's chat/completions API.
     """
-    def __init__(self, api_key: str, base_url: str = "https://api.deepseek.com/v1"):
+    def __init__(self, api_key: str, base_url: str = "https://api.deepseek.com/v1",
+                 cache: deepseek_mapreduce.ResponseCache | None = None):
         self.api_key = api_key
         self.base_url = base_url.rstrip("/")
         self.session = requests.Session()
@@ -35,6 +44,7 @@ class DeepSeekClient:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
         })
+        self.cache = cache or deepseek_mapreduce.shared_cache()
 
     def generate_dialogue(
         self,
@@ -46,35 +56,91 @@ class DeepSeekClient:
         temperature: float = 0.7,
         max_tokens: int = 1500,
         timeout: int = 60,
+        usage: dict | None = None,
     ) -> str:
         """
         Call DeepSeek's /chat/completions endpoint to produce podcast dialogue.
 
+        Inputs are fitted to the model's token budget, a transcript too large
+        for one prompt being condensed chunk by chunk first (map-reduce);
+        `usage`, when given, is filled with which path ran and what it cost.
+        The output is limited to `max_tokens` (capped at the model's maximum).
+
         Returns the generated dialogue text.
         """
+        started = time.monotonic()
+        url = f"{self.base_url}/chat/completions"
+        totals = deepseek_mapreduce.new_usage(usage=usage)
+        limits = deepseek_mapreduce.budget(model, max_tokens)
+        comments, transcript = deepseek_mapreduce.fit(
+            self.session, url, model, limits, system_prompt + user_prompt, comments, transcript,
+            timeout, totals, self.cache
+        )
+        payload = self._payload(comments, transcript, system_prompt, user_prompt, model, temperature,
+                                limits.output_tokens)
+        text = deepseek_mapreduce.post_chat(self.session, url, payload, timeout, totals, self.cache)
+        totals["seconds"] = time.monotonic() - started
+        return text.strip()
+
+    def stream_dialogue(
+        self,
+        comments: str,
+        transcript: str,
+        system_prompt: str,
+        user_prompt: str,
+        model: str = "deepseek-chat",
+        temperature: float = 0.7,
+        max_tokens: int = 1500,
+        timeout: int = 60,
+        usage: dict | None = None,
+    ) -> Iterator[str]:
+        """
+        Same request as `generate_dialogue`, but yields the text as it streams in.
+
+        After the first delta, ``usage["ttft"]`` holds the time to first token
+        in seconds, including any map-reduce step that had to run first.
+        """
+        timer = {"started": time.monotonic()}
         url = f"{self.base_url}/chat/completions"
-        payload = {
+        totals = deepseek_mapreduce.new_usage(usage=usage)
+        limits = deepseek_mapreduce.budget(model, max_tokens)
+        comments, transcript = deepseek_mapreduce.fit(
+            self.session, url, model, limits, system_prompt + user_prompt, comments, transcript,
+            timeout, totals, self.cache
+        )
+        payload = self._payload(comments, transcript, system_prompt, user_prompt, model, temperature,
+                                limits.output_tokens)
+        for delta in deepseek_mapreduce.stream_chat(
+            self.session, url, payload, timeout, totals, self.cache, timer
+        ):
+            totals["ttft"] = timer["ttft"]
+            yield delta
+        totals["seconds"] = time.monotonic() - timer["started"]
+
+    @staticmethod
+    def _payload(comments, transcript, system_prompt, user_prompt, model, temperature, max_tokens) -> dict:
+        # Fixed instructions first and the video's material last, so DeepSeek's
+        # prefix cache can reuse the instructions (and, across the podcast and
+        # questions scripts, the transcript) from earlier requests.
+        return {
             "model": model,
             "temperature": temperature,
+            "max_tokens": max_tokens,
             "messages": [
                 {
                     "role": "system",
-                    "content": system_prompt,
+                    "content": system_prompt.strip(),
                 },
                 {
                     "role": "user",
                     "content": (
-                        f"Comments:\n{comments}\n\n"
+                        f"{user_prompt.strip()}\n\n"
                         f"Transcript:\n{transcript}\n\n"
-                        f"\n\n{user_prompt}"
+                        f"Comments:\n{comments}"
                     )
                 }
             ]
         }
-        resp = self.session.post(url, json=payload, timeout=timeout)
-        resp.raise_for_status()
-        data = resp.json()
-        return data["choices"][0]["message"]["content"].strip()
 
 
 def read_file(path: Path) -> str:
@@ -141,10 +207,35 @@ def main():
         default=60,
         help="HTTP timeout in seconds (default: 60)"
     )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Print the dialogue as it is generated"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore cached responses (fresh ones are still stored)"
+    )
+    parser.add_argument(
+        "--cache-sampled",
+        action="store_true",
+        help="Also cache the final sampled (temperature > 0) generation; map-phase notes are always cached"
+    )
+    parser.add_argument(
+        "--comment-budget",
+        type=int,
+        default=4000,
+        help="De-duplicate and sample comments down to about this many tokens; 0 keeps them all (default: 4000)"
+    )
     args = parser.parse_args()
 
     # Load inputs
     comments = read_file(args.comments)
+    if args.comment_budget:
+        comments, reduced = reduce_comments(split_comments(comments), args.comment_budget)
+        print(f"✔ Comments: {reduced['comments']} → {reduced['selected']} "
+              f"(~{reduced['tokens_before']} → ~{reduced['tokens_after']} tokens)", file=sys.stderr)
     transcript = read_file(args.transcript)
     system_prompt = read_file(args.system_prompt)
     user_template = read_file(args.user_prompt)
@@ -156,16 +247,31 @@ def main():
     )
 
     # Generate dialogue
-    client = DeepSeekClient(api_key)
+    cache = deepseek_mapreduce.ResponseCache(bypass=args.no_cache or None, allow_sampled=args.cache_sampled or None)
+    client = DeepSeekClient(api_key, cache=cache)
+    usage = {}
+    request = dict(
+        comments=comments,
+        transcript=transcript,
+        system_prompt=system_prompt,
+        user_prompt=user_prompt,
+        max_tokens=args.max,
+        timeout=args.timeout,
+        usage=usage
+    )
     try:
-        dialogue = client.generate_dialogue(
-            comments=comments,
-            transcript=transcript,
-            system_prompt=system_prompt,
-            user_prompt=user_prompt,
-            max_tokens=args.max,
-            timeout=args.timeout
-        )
+        if args.stream:
+            parts = []
+            for delta in client.stream_dialogue(**request):
+                print(delta, end="", flush=True)
+                parts.append(delta)
+            print()
+            if "ttft" in usage:
+                print(f"⏱ First token after {usage['ttft']:.2f}s", file=sys.stderr)
+            dialogue = "".join(parts).strip()
+        else:
+            dialogue = client.generate_dialogue(**request)
+        print(f"⏱ {deepseek_mapreduce.describe(usage)}", file=sys.stderr)
     except requests.exceptions.Timeout:
         raise RuntimeError(
             f"Request timed out after {args.timeout}s. "
@@ -14,20 +14,33 @@ Usage:
           --transcript transcript.txt \
           --output questions.txt \
           --max 20
+
+    Add --stream to print the questions as they are generated.
 """
 
 import os
+import re
+import sys
+import time
 import argparse
 from pathlib import Path
+from typing import Iterator
 import requests
 from dotenv import load_dotenv
 
+import deepseek_mapreduce
+from comment_reducer import reduce_comments, split_comments
+
+# A numbering in front of a question: "3. " or "3) ".
+LIST_MARKER = re.compile(r"^\s*\d+[.)]\s+")
+
 class DeepSeekClient:
     """
     Wrapper around DeepSeek's chat/completions API.
     """
 
-    def __init__(self, api_key: str, base_url: str = "https://api.deepseek.com/v1"):
+    def __init__(self, api_key: str, base_url: str = "https://api.deepseek.com/v1",
+                 cache: deepseek_mapreduce.ResponseCache | None = None):
         self.api_key = api_key
         self.base_url = base_url.rstrip("/")
         self.session = requests.Session()
@@ -35,6 +48,7 @@ class DeepSeekClient:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
         })
+        self.cache = cache or deepseek_mapreduce.shared_cache()
 
     def generate_questions(
         self,
@@ -43,10 +57,15 @@ class DeepSeekClient:
         max_questions: int = 10,
         model: str = "deepseek-chat",
         temperature: float = 0.7,
+        max_tokens: int = 1024,
+        usage: dict | None = None,
     ) -> list[str]:
         """
         Calls DeepSeek's /chat/completions to produce audience questions.
 
+        Inputs are fitted to the model's token budget, a transcript too large
+        for one prompt being condensed chunk by chunk first (map-reduce).
+
         Parameters
         ----------
         comments : str
@@ -59,22 +78,87 @@ class DeepSeekClient:
             Which model to use.
         temperature : float
             Sampling temperature.
+        max_tokens : int
+            Output token limit (capped at the model's maximum).
+        usage : dict, optional
+            Filled with which path ran and what it cost: mode, calls,
+            seconds and token counts.
 
         Returns
         -------
         list[str]
             Parsed list of questions.
         """
+        started = time.monotonic()
+        endpoint = f"{self.base_url}/chat/completions"
+        totals = deepseek_mapreduce.new_usage(usage=usage)
+        limits = deepseek_mapreduce.budget(model, max_tokens)
+        comments, transcript = deepseek_mapreduce.fit(
+            self.session, endpoint, model, limits, "".join(self._prompts()), comments, transcript,
+            30, totals, self.cache
+        )
+        payload = self._payload(comments, transcript, max_questions, model, temperature, limits.output_tokens)
+
+        # Expect: { "choices": [ { "message": { "content": "1. ...\n2. ..." } } ], ... }
+        text = deepseek_mapreduce.post_chat(self.session, endpoint, payload, 30, totals, self.cache)
+        totals["seconds"] = time.monotonic() - started
+        return parse_questions(text)
+
+    def stream_questions(
+        self,
+        comments: str,
+        transcript: str,
+        max_questions: int = 10,
+        model: str = "deepseek-chat",
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        usage: dict | None = None,
+    ) -> Iterator[str]:
+        """
+        Same request as `generate_questions`, but yields raw text deltas as
+        they stream in. Join them and pass the result to `parse_questions`.
+
+        After the first delta, ``usage["ttft"]`` holds the time to first token
+        in seconds, including any map-reduce step that had to run first.
+        """
+        timer = {"started": time.monotonic()}
         endpoint = f"{self.base_url}/chat/completions"
+        totals = deepseek_mapreduce.new_usage(usage=usage)
+        limits = deepseek_mapreduce.budget(model, max_tokens)
+        comments, transcript = deepseek_mapreduce.fit(
+            self.session, endpoint, model, limits, "".join(self._prompts()), comments, transcript,
+            30, totals, self.cache
+        )
+        payload = self._payload(comments, transcript, max_questions, model, temperature, limits.output_tokens)
+        for delta in deepseek_mapreduce.stream_chat(
+            self.session, endpoint, payload, 30, totals, self.cache, timer
+        ):
+            totals["ttft"] = timer["ttft"]
+            yield delta
+        totals["seconds"] = time.monotonic() - timer["started"]
+
+    @staticmethod
+    def _prompts() -> tuple[str, str]:
+        """(system prompt, user prompt) templates."""
         with open("questions/prompts/system.md", "r", encoding="utf-8") as f:
             system_prompt = f.read().strip()
 
         with open("questions/prompts/prompt.md", "r", encoding="utf-8") as f:
             user_prompt = f.read().strip()
+        return system_prompt, user_prompt
 
-        payload = {
+    @staticmethod
+    def _payload(comments: str, transcript: str, max_questions: int, model: str, temperature: float,
+                 max_tokens: int) -> dict:
+        system_prompt, user_prompt = DeepSeekClient._prompts()
+
+        # Fixed instructions first and the video's material last, so DeepSeek's
+        # prefix cache can reuse the instructions (and, across the podcast and
+        # questions scripts, the transcript) from earlier requests.
+        return {
             "model": model,
             "temperature": temperature,
+            "max_tokens": max_tokens,
             "messages": [
                 {
                     "role": "system",
@@ -83,28 +167,23 @@ class DeepSeekClient:
                 {
                     "role": "user",
                     "content": (
-                        f"Comments:\n{comments}\n\n"
+                        f"{user_prompt}\n\n"
                         f"Transcript:\n{transcript}\n\n"
+                        f"Comments:\n{comments}\n\n"
                         f"Generate up to {max_questions} numbered questions."
-                        f"\n\n{user_prompt}"
                     )
                 }
             ]
         }
 
-        resp = self.session.post(endpoint, json=payload, timeout=30)
-        resp.raise_for_status()
-        data = resp.json()
 
-        # Expect: { "choices": [ { "message": { "content": "1. ...\n2. ..." } } ], ... }
-        text = data["choices"][0]["message"]["content"]
-        # Split on lines, strip out leading "1. ", etc.
-        questions = [
-            line.strip().lstrip("0123456789. ").strip()
-            for line in text.splitlines()
-            if line.strip()
-        ]
-        return questions
+def parse_questions(text: str) -> list[str]:
+    """Split the model output on lines, stripping leading "1. " etc."""
+    return [
+        LIST_MARKER.sub("", line).strip()
+        for line in text.splitlines()
+        if line.strip()
+    ]
 
 
 def read_file(path: Path) -> str:
@@ -152,17 +231,69 @@ def main() -> None:
         default=10,
         help="Maximum number of questions to generate"
     )
+    parser.add_argument(
+        "--max-tokens",
+        type=int,
+        default=1024,
+        help="Max tokens to generate (default: 1024)"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Print the questions as they are generated"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore cached responses (fresh ones are still stored)"
+    )
+    parser.add_argument(
+        "--cache-sampled",
+        action="store_true",
+        help="Also cache the final sampled (temperature > 0) generation; map-phase notes are always cached"
+    )
+    parser.add_argument(
+        "--comment-budget",
+        type=int,
+        default=4000,
+        help="De-duplicate and sample comments down to about this many tokens; 0 keeps them all (default: 4000)"
+    )
     args = parser.parse_args()
 
     comments_text = read_file(args.comments)
+    if args.comment_budget:
+        comments_text, reduced = reduce_comments(split_comments(comments_text), args.comment_budget)
+        print(f"✔ Comments: {reduced['comments']} → {reduced['selected']} "
+              f"(~{reduced['tokens_before']} → ~{reduced['tokens_after']} tokens)", file=sys.stderr)
     transcript_text = read_file(args.transcript)
 
-    client = DeepSeekClient(api_key)
-    questions = client.generate_questions(
-        comments=comments_text,
-        transcript=transcript_text,
-        max_questions=args.max
-    )
+    cache = deepseek_mapreduce.ResponseCache(bypass=args.no_cache or None, allow_sampled=args.cache_sampled or None)
+    client = DeepSeekClient(api_key, cache=cache)
+    usage = {}
+    if args.stream:
+        parts = []
+        for delta in client.stream_questions(
+            comments=comments_text,
+            transcript=transcript_text,
+            max_questions=args.max,
+            max_tokens=args.max_tokens,
+            usage=usage
+        ):
+            print(delta, end="", flush=True)
+            parts.append(delta)
+        print()
+        if "ttft" in usage:
+            print(f"⏱ First token after {usage['ttft']:.2f}s", file=sys.stderr)
+        questions = parse_questions("".join(parts))
+    else:
+        questions = client.generate_questions(
+            comments=comments_text,
+            transcript=transcript_text,
+            max_questions=args.max,
+            max_tokens=args.max_tokens,
+            usage=usage
+        )
+    print(f"⏱ {deepseek_mapreduce.describe(usage)}", file=sys.stderr)
 
     if not questions:
         print("⚠️  No questions returned by DeepSeek.")
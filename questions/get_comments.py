@@ -16,11 +16,22 @@ from __future__ import annotations
 
 import os
 from pathlib import Path
-from typing import List
+from typing import Callable, List
 
 from googleapiclient.discovery import build
 from dotenv import load_dotenv
 
+from comment_reducer import reduce_comments
+from comment_store import CommentStore
+
+# Partial response: only the parts of each thread we store, instead of the
+# full resource with etags, channel IDs, reply counts and so on.
+FIELDS = (
+    "nextPageToken,"
+    "items(id,snippet/topLevelComment/snippet"
+    "(textDisplay,authorDisplayName,likeCount,publishedAt,updatedAt))"
+)
+
 
 class YouTubeCommentFetcher:
     """
@@ -28,7 +39,8 @@ class YouTubeCommentFetcher:
     top‑level comments. Designed for easy reuse in larger codebases.
     """
 
-    def __init__(self, api_key: str, max_results: int = 100) -> None:
+    def __init__(self, api_key: str, max_results: int = 100,
+                 throttle: Callable[[], None] | None = None) -> None:
         """
         Parameters
         ----------
@@ -36,11 +48,43 @@ class YouTubeCommentFetcher:
             Google API key enabled for YouTube Data API v3.
         max_results : int, default 100
             Max comments to return per API page (allowed range 1‑100).
+        throttle : callable | None
+            Called before every API request, e.g. a rate limiter's ``wait``.
         """
         self.max_results = max_results
+        self.throttle = throttle
         self.service = build("youtube", "v3", developerKey=api_key)
 
-    def fetch_comments(self, video_id: str, limit: int | None = None) -> List[str]:
+    def _pages(self, video_id: str, order: str = "time"):
+        """Yield pages of parsed comments, newest first for ``order="time"``."""
+        request = self.service.commentThreads().list(
+            part="snippet",
+            videoId=video_id,
+            maxResults=self.max_results,
+            textFormat="plainText",
+            order=order,
+            fields=FIELDS,
+        )
+        while request:
+            if self.throttle:
+                self.throttle()
+            response = request.execute()
+            yield [self._parse(item) for item in response.get("items", [])]
+            request = self.service.commentThreads().list_next(request, response)
+
+    @staticmethod
+    def _parse(item: dict) -> dict:
+        snippet = item["snippet"]["topLevelComment"]["snippet"]
+        return {
+            "id": item["id"],
+            "author": snippet.get("authorDisplayName"),
+            "text": snippet["textDisplay"].replace("\u2028", "\n"),  # keep newlines portable
+            "like_count": snippet.get("likeCount", 0),
+            "published_at": snippet["publishedAt"],
+            "updated_at": snippet.get("updatedAt", snippet["publishedAt"]),
+        }
+
+    def fetch_comments(self, video_id: str, limit: int | None = None, order: str = "time") -> List[str]:
         """
         Retrieve top‑level comments.
 
@@ -51,6 +95,8 @@ class YouTubeCommentFetcher:
         limit : int | None
             Hard cap on total comments returned.  None ⇒ fetch all available
             (subject to quota / pagination).
+        order : str
+            ``"time"`` (newest first) or ``"relevance"`` (top comments).
 
         Returns
         -------
@@ -58,27 +104,54 @@ class YouTubeCommentFetcher:
             List of comment bodies in display order.
         """
         comments: List[str] = []
-        request = self.service.commentThreads().list(
-            part="snippet",
-            videoId=video_id,
-            maxResults=self.max_results,
-            textFormat="plainText",
-        )
-
-        while request:
-            response = request.execute()
-            for item in response.get("items", []):
-                comment = (
-                    item["snippet"]["topLevelComment"]["snippet"]["textDisplay"]
-                    .replace("\u2028", "\n")  # keep newlines portable
-                )
-                comments.append(comment)
+        for page in self._pages(video_id, order):
+            for comment in page:
+                comments.append(comment["text"])
                 if limit and len(comments) >= limit:
                     return comments
+        return comments
 
-            request = self.service.commentThreads().list_next(request, response)
+    def sync_comments(self, video_id: str, store: CommentStore, limit: int | None = None) -> int:
+        """
+        Bring `store` up to date with the video's comments.
 
-        return comments
+        Pages newest first and stops at the first comment already in the
+        store, so a re-sync costs one page or two. Until a sync has reached
+        the oldest comment, later syncs keep paging to backfill.
+
+        Parameters
+        ----------
+        video_id : str
+            The 11‑character YouTube video ID.
+        store : CommentStore
+            Where comments are kept between runs.
+        limit : int | None
+            Stop after this many new comments (the sync then stays incomplete).
+
+        Returns
+        -------
+        int
+            Number of comments added.
+        """
+        backfill = not store.is_complete(video_id)
+        added = pages = 0
+        reached_end = True
+        for page in self._pages(video_id, order="time"):
+            pages += 1
+            known = store.known(video_id, (c["id"] for c in page))
+            new = [c for c in page if c["id"] not in known]
+            if limit is not None:
+                new = new[: max(0, limit - added)]
+            store.upsert(video_id, new)
+            added += len(new)
+            if known and not backfill:
+                break
+            if limit is not None and added >= limit:
+                reached_end = False
+                break
+        store.mark_synced(video_id, complete=reached_end)
+        print(f"✔ Synced {video_id}: {added} new comments in {pages} page(s), {store.count(video_id)} stored")
+        return added
 
     @staticmethod
     def save(comments: List[str], outfile: Path | str) -> None:
@@ -92,6 +165,15 @@ class YouTubeCommentFetcher:
         print(f"✔ Saved {len(comments)} comments → {path.resolve()}")
 
 
+def save_sample(comments: list, budget: int, outfile: Path | str) -> None:
+    """Write a de-duplicated, representative sample of `comments` (see `reduce_comments`)."""
+    sample, stats = reduce_comments(comments, budget)
+    path = Path(outfile)
+    path.write_text(sample, encoding="utf-8")
+    print(f"✔ Saved {stats['selected']} of {stats['comments']} comments "
+          f"({stats['low_info']} low-information, {stats['clusters']} clusters) → {path.resolve()}")
+
+
 def main() -> None:
     # 1️⃣  Load config
     load_dotenv()  # optional .env file
@@ -133,13 +215,38 @@ def main() -> None:
         action="store_true",
         help="Fetch relevance‑ranked (top) comments instead of most recent"
     )
+
+    parser.add_argument(
+        "-s", "--sync",
+        action="store_true",
+        help="Sync into the local comment store and save from there (only new comments are fetched)"
+    )
+    parser.add_argument(
+        "-b", "--budget",
+        type=int,
+        default=None,
+        help="Save a de-duplicated, representative sample of about this many tokens instead"
+    )
     args = parser.parse_args()
 
     # 3️⃣  Run
     fetcher = YouTubeCommentFetcher(api_key)
-    comments = fetcher.fetch_comments(args.video_id, limit=args.limit)
+    order = "relevance" if args.top_comments else "time"
+    if args.sync:
+        store = CommentStore()
+        fetcher.sync_comments(args.video_id, store)
+        if args.budget:
+            # Likes from the store weigh in on which comments represent the rest.
+            save_sample(store.records(args.video_id), args.budget, args.outfile)
+            return
+        comments = store.comments(args.video_id, limit=args.limit,
+                                  order="likes" if args.top_comments else "time")
+    else:
+        comments = fetcher.fetch_comments(args.video_id, limit=args.limit, order=order)
+        if args.budget:
+            save_sample(comments, args.budget, args.outfile)
+            return
 
-    
     fetcher.save(comments, args.outfile)
 
 
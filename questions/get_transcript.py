@@ -12,6 +12,23 @@ Usage:
 
 from youtube_transcript_api import YouTubeTranscriptApi
 
+import _paths  # noqa: F401
+from pipeline.transcript import Transcript
+
+
+def fetch_transcript(video_id: str, languages: list[str] = ['en']) -> Transcript:
+    """
+    Fetch the timestamped transcript for `video_id` in the given language(s).
+
+    Returns
+    -------
+    Transcript
+        One segment per caption snippet, with its start and end time.
+        ``.save(path)`` writes it in the pipeline's ``.v2pt`` format.
+    """
+    api = YouTubeTranscriptApi()
+    return Transcript.from_snippets(api.fetch(video_id, languages=languages))
+
 
 def get_transcript(video_id: str, languages: list[str] = ['en']) -> str:
     """
@@ -23,10 +40,7 @@ def get_transcript(video_id: str, languages: list[str] = ['en']) -> str:
         The full transcript as one string, with each caption snippet
         on its own line.
     """
-    api = YouTubeTranscriptApi()
-    fetched = api.fetch(video_id, languages=languages)
-    # Each `snippet` has a `.text` attribute
-    return "\n".join(snippet.text for snippet in fetched)
+    return fetch_transcript(video_id, languages).text()
 
 
 if __name__ == "__main__":
@@ -3,18 +3,191 @@
 main.py
 
 Fetch both the transcript and top‑level comments for a YouTube video,
-and save them to separate text files.
+and save them to separate text files. The two are fetched concurrently.
+
+Batch mode reads video IDs (or watch URLs), one per line, from a file or
+stdin and fetches them with a bounded pool of workers, under a rate limit
+per API. Each video is saved to its own directory under ``--out-dir``;
+videos whose files already exist are skipped, so an interrupted run picks
+up where it stopped:
+
+    $ python main.py --batch channel_ids.txt --out-dir videos --workers 8
+    $ cat ids.txt | python main.py --batch -
 """
 
 import os
+import re
+import sys
+import threading
+import time
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from dotenv import load_dotenv
 
 # Import the pieces from your other scripts:
-from youtube_transcript_api import YouTubeTranscriptApi
+from comment_store import CommentStore
 from get_comments import YouTubeCommentFetcher
-from get_transcript import get_transcript
+from get_transcript import fetch_transcript
+import _paths  # noqa: F401
+from pipeline.transcript import Transcript
+
+# An 11-character ID on its own or in a watch/short/youtu.be URL.
+VIDEO_ID = re.compile(r"(?:v=|youtu\.be/|shorts/|^)([\w-]{11})(?![\w-])")
+
+
+class RateLimiter:
+    """
+    Space calls at least ``1 / rate`` seconds apart, across all threads.
+    """
+
+    def __init__(self, rate: float | None) -> None:
+        """
+        Parameters
+        ----------
+        rate : float | None
+            Calls per second; None or 0 for no limit.
+        """
+        self.interval = 1 / rate if rate else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self) -> None:
+        """Block until the caller may make its next call."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class VideoFetcher:
+    """
+    Fetches a video's transcript and comments at the same time. Safe to
+    use from several threads; the rate limits are shared between them.
+    """
+
+    def __init__(self, api_key: str, args: argparse.Namespace) -> None:
+        self.api_key = api_key
+        self.args = args
+        self.transcript_limiter = RateLimiter(args.transcript_rate)
+        self.comments_limiter = RateLimiter(args.comments_rate)
+        self.store = CommentStore() if args.sync else None
+        self._local = threading.local()
+        # Transcripts are fetched here while the calling thread pages comments.
+        self._transcripts = ThreadPoolExecutor(max_workers=args.workers)
+
+    def _comment_fetcher(self) -> YouTubeCommentFetcher:
+        # The API client's HTTP connection must not be shared between threads.
+        fetcher = getattr(self._local, "fetcher", None)
+        if fetcher is None:
+            fetcher = self._local.fetcher = YouTubeCommentFetcher(self.api_key, throttle=self.comments_limiter.wait)
+        return fetcher
+
+    def transcript(self, video_id: str) -> Transcript:
+        self.transcript_limiter.wait()
+        return fetch_transcript(video_id, languages=self.args.languages)
+
+    def comments(self, video_id: str) -> list[str]:
+        fetcher = self._comment_fetcher()
+        if self.store is not None:
+            fetcher.sync_comments(video_id, self.store)
+            return self.store.comments(video_id, limit=self.args.limit,
+                                       order="likes" if self.args.top_comments else "time")
+        return fetcher.fetch_comments(
+            video_id=video_id,
+            limit=self.args.limit,
+            order="relevance" if self.args.top_comments else "time",
+        )
+
+    def fetch(self, video_id: str) -> tuple[Transcript, list[str]]:
+        """Return (transcript, comments) of `video_id`, fetched concurrently."""
+        transcript = self._transcripts.submit(self.transcript, video_id)
+        try:
+            comments = self.comments(video_id)
+        except BaseException:
+            transcript.cancel()
+            raise
+        return transcript.result(), comments
+
+    def close(self) -> None:
+        self._transcripts.shutdown(cancel_futures=True)
+
+
+def read_video_ids(source: str) -> list[str]:
+    """
+    Video IDs listed in `source` (a path, or ``-`` for stdin), in order and
+    without duplicates. Blank lines and ``#`` comments are skipped.
+    """
+    text = sys.stdin.read() if source == "-" else Path(source).read_text(encoding="utf-8")
+    ids = []
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        match = VIDEO_ID.search(line)
+        if not match:
+            print(f"⚠️  Skipping unrecognised line: {line}", file=sys.stderr)
+            continue
+        ids.append(match.group(1))
+    return list(dict.fromkeys(ids))
+
+
+def write_atomic(path: Path, text: str) -> None:
+    """Write `path` via a temporary file, so a killed run never leaves a partial output behind."""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def run_batch(fetcher: VideoFetcher, video_ids: list[str], out_dir: Path, workers: int) -> int:
+    """
+    Fetch every video into ``out_dir/<video_id>/{transcript,comments}.txt``,
+    plus the timestamped ``transcript.v2pt`` (see `pipeline.transcript`).
+
+    Returns
+    -------
+    int
+        Number of videos that failed (they are retried on the next run).
+    """
+    def done(video_id: str) -> bool:
+        folder = out_dir / video_id
+        return (folder / "transcript.txt").is_file() and (folder / "comments.txt").is_file()
+
+    todo = [video_id for video_id in video_ids if not done(video_id)]
+    print(f"Batch: {len(video_ids)} videos, {len(video_ids) - len(todo)} already fetched, {len(todo)} to go")
+
+    def process(video_id: str) -> int:
+        transcript, comments = fetcher.fetch(video_id)
+        folder = out_dir / video_id
+        folder.mkdir(parents=True, exist_ok=True)
+        write_atomic(folder / "comments.txt", "\n\n".join(comments))
+        transcript.save(str(folder / "transcript.v2pt"))
+        # Written last: its presence marks the video as done.
+        write_atomic(folder / "transcript.txt", transcript.text())
+        return len(comments)
+
+    started = time.monotonic()
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process, video_id): video_id for video_id in todo}
+        for finished, future in enumerate(as_completed(futures), 1):
+            video_id = futures[future]
+            try:
+                count = future.result()
+            except Exception as e:
+                failed.append(video_id)
+                print(f"✘ [{finished}/{len(todo)}] {video_id}: {e}", file=sys.stderr)
+            else:
+                print(f"✔ [{finished}/{len(todo)}] {video_id}: transcript + {count} comments")
+
+    print(f"Batch finished in {time.monotonic() - started:.1f}s: "
+          f"{len(todo) - len(failed)} fetched, {len(failed)} failed → {out_dir.resolve()}")
+    if failed:
+        print("Failed (re-run to retry): " + " ".join(failed), file=sys.stderr)
+    return len(failed)
+
 
 def main():
     # 1️⃣ Load config
@@ -29,6 +202,7 @@ def main():
     )
     parser.add_argument(
         "video_id",
+        nargs="?",
         help="YouTube video ID (e.g. dQw4w9WgXcQ)"
     )
     parser.add_argument(
@@ -36,6 +210,10 @@ def main():
         default="transcript.txt",
         help="Path to save the transcript (default: transcript.txt)"
     )
+    parser.add_argument(
+        "--segments-out",
+        help="Also save the timestamped transcript (.v2pt, see api/pipeline/transcript.py)"
+    )
     parser.add_argument(
         "-c", "--comments-out",
         default="comments.txt",
@@ -58,22 +236,62 @@ def main():
         action="store_true",
         help="Fetch relevance‑ranked (top) comments instead of most recent"
     )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="Sync comments into the local store and only fetch the new ones"
+    )
+    parser.add_argument(
+        "-b", "--batch",
+        metavar="FILE",
+        help="Fetch every video ID (or URL) listed in FILE, one per line; '-' reads stdin"
+    )
+    parser.add_argument(
+        "-o", "--out-dir",
+        type=Path,
+        default=Path("videos"),
+        help="Batch mode: directory for the per-video folders (default: videos)"
+    )
+    parser.add_argument(
+        "-w", "--workers",
+        type=int,
+        default=4,
+        help="Batch mode: videos fetched at the same time (default: 4)"
+    )
+    parser.add_argument(
+        "--transcript-rate",
+        type=float,
+        default=2.0,
+        help="Max transcript requests per second, 0 for no limit (default: 2)"
+    )
+    parser.add_argument(
+        "--comments-rate",
+        type=float,
+        default=10.0,
+        help="Max YouTube Data API requests per second, 0 for no limit (default: 10)"
+    )
     args = parser.parse_args()
+    if bool(args.video_id) == bool(args.batch):
+        parser.error("give either a video ID or --batch FILE")
 
-    # 3️⃣ Fetch transcript
-    print(f"Fetching transcript for video {args.video_id} …")
-    transcript = get_transcript(args.video_id, languages=args.languages)
-    Path(args.transcript_out).write_text(transcript, encoding="utf-8")
-    print(f"✔ Saved transcript → {Path(args.transcript_out).resolve()}")
-
-    # 4️⃣ Fetch comments
-    print(f"Fetching comments for video {args.video_id} …")
-    fetcher = YouTubeCommentFetcher(api_key)
-    comments = fetcher.fetch_comments(
-        video_id=args.video_id,
-        limit=args.limit,
-    )
-    fetcher.save(comments, args.comments_out)
+    fetcher = VideoFetcher(api_key, args)
+    try:
+        # 3️⃣ Batch: many videos, one folder each
+        if args.batch:
+            failed = run_batch(fetcher, read_video_ids(args.batch), args.out_dir, args.workers)
+            sys.exit(1 if failed else 0)
+
+        # 4️⃣ Single video: transcript and comments at the same time
+        print(f"Fetching transcript and comments for video {args.video_id} …")
+        transcript, comments = fetcher.fetch(args.video_id)
+        Path(args.transcript_out).write_text(transcript.text(), encoding="utf-8")
+        print(f"✔ Saved transcript → {Path(args.transcript_out).resolve()}")
+        if args.segments_out:
+            transcript.save(args.segments_out)
+            print(f"✔ Saved {len(transcript)} timestamped segments → {Path(args.segments_out).resolve()}")
+        YouTubeCommentFetcher.save(comments, args.comments_out)
+    finally:
+        fetcher.close()
 
 if __name__ == "__main__":
     main()